@@ -6,13 +6,167 @@ Uses intelligent chunking to create logical, sequential analysis guides.
 
 import re
 import json
-from typing import List, Dict, Any, Optional
+from bisect import bisect_left, bisect_right
+from typing import TYPE_CHECKING, Callable, List, Dict, Any, Tuple, Iterable, Iterator, Optional
 from dataclasses import dataclass
 from enum import Enum
+from functools import lru_cache, partial
 
-# Import our SQL formatters
-from sql_formatter import SQLFormatter, FormatSettings
-from simple_sql_formatter import SimpleSQLFormatter
+from sql_batch import map_ordered
+from sql_line_model import LineModel, build_line_model
+from sql_watch import add_watch_arguments, watch_and_regenerate
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+
+# SQL pattern recognition tables, shared by every analyzer instance
+SQL_KEYWORDS = {
+    'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'MERGE', 'EXEC', 'EXECUTE',
+    'CREATE', 'ALTER', 'DROP', 'TRUNCATE', 'BULK'
+}
+
+# Stored procedure and function call patterns
+PROC_FUNCTION_PATTERNS = {
+    'STORED_PROCEDURES': [
+        r'EXEC(?:UTE)?\s+([a-zA-Z_][a-zA-Z0-9_]*\.?[a-zA-Z_][a-zA-Z0-9_]*)',  # EXEC sp_name
+        r'EXEC(?:UTE)?\s+(\[?[a-zA-Z_][a-zA-Z0-9_]*\]?\.\[?[a-zA-Z_][a-zA-Z0-9_]*\]?)',  # EXEC [schema].[sp_name]
+        r'EXEC(?:UTE)?\s*\(\s*([^)]+)\s*\)',  # EXEC dynamic SQL
+        r'(sp_executesql)',  # Dynamic SQL execution
+        r'EXEC(?:UTE)?\s+(sp_[a-zA-Z_][a-zA-Z0-9_]*)',  # EXEC sp_procedurename
+        r'EXEC(?:UTE)?\s+(usp_[a-zA-Z_][a-zA-Z0-9_]*)',  # EXEC usp_procedurename
+        r'EXEC(?:UTE)?\s+(proc_[a-zA-Z_][a-zA-Z0-9_]*)',  # EXEC proc_procedurename
+        r'CALL\s+([a-zA-Z_][a-zA-Z0-9_]*\.?[a-zA-Z_][a-zA-Z0-9_]*)',  # CALL procedure (MySQL/PostgreSQL style)
+    ],
+    'SYSTEM_FUNCTIONS': [
+        r'(GETDATE|GETUTCDATE|SYSDATETIME|CURRENT_TIMESTAMP)\s*\(?',
+        r'(NEWID|NEWSEQUENTIALID)\s*\(',
+        r'(SCOPE_IDENTITY|@@IDENTITY|@@ROWCOUNT|@@ERROR|@@TRANCOUNT)\b',
+        r'(USER_NAME|SUSER_NAME|SYSTEM_USER|ORIGINAL_LOGIN)\s*\(?',
+    ],
+    'AGGREGATE_FUNCTIONS': [
+        r'(SUM|COUNT|MAX|MIN|AVG|STDEV|VAR|VARP|STDEVP)\s*\(',
+        r'(COUNT_BIG|GROUPING|GROUPING_ID)\s*\(',
+    ],
+    'STRING_FUNCTIONS': [
+        r'(LEN|DATALENGTH|SUBSTRING|LEFT|RIGHT|CHARINDEX|PATINDEX)\s*\(',
+        r'(REPLACE|STUFF|REVERSE|UPPER|LOWER|LTRIM|RTRIM|TRIM)\s*\(',
+        r'(CONCAT|FORMAT|STRING_AGG|STRING_SPLIT)\s*\(',
+    ],
+    'DATE_FUNCTIONS': [
+        r'(DATEADD|DATEDIFF|DATEDIFF_BIG|DATEPART|DATENAME)\s*\(',
+        r'(YEAR|MONTH|DAY|DATETRUNC|EOMONTH|ISDATE)\s*\(',
+    ],
+    'MATH_FUNCTIONS': [
+        r'(ABS|CEILING|FLOOR|ROUND|POWER|SQRT|LOG|LOG10|EXP)\s*\(',
+        r'(SIN|COS|TAN|ASIN|ACOS|ATAN|ATN2|DEGREES|RADIANS)\s*\(',
+        r'(RAND|SIGN|PI)\s*\(?',
+    ],
+    'CONVERSION_FUNCTIONS': [
+        r'(CAST|CONVERT|TRY_CAST|TRY_CONVERT|PARSE|TRY_PARSE)\s*\(',
+        r'(ISNULL|COALESCE|NULLIF|IIF|CHOOSE)\s*\(',
+    ],
+    'WINDOW_FUNCTIONS': [
+        r'(ROW_NUMBER|RANK|DENSE_RANK|NTILE)\s*\(',
+        r'(LAG|LEAD|FIRST_VALUE|LAST_VALUE)\s*\(',
+        r'(CUME_DIST|PERCENT_RANK|PERCENTILE_CONT|PERCENTILE_DISC)\s*\(',
+    ],
+    'LOGICAL_FUNCTIONS': [
+        r'(EXISTS|NOT\s+EXISTS)\s*\(',
+        r'(CASE\s+WHEN|IIF)\s*\(',
+    ],
+    'USER_DEFINED': [
+        r'([a-zA-Z_][a-zA-Z0-9_]*\.[a-zA-Z_][a-zA-Z0-9_]*)\s*\(',  # schema.function_name()
+        r'(dbo\.[a-zA-Z_][a-zA-Z0-9_]*)\s*\(',  # dbo.function_name()
+        r'(\[dbo\]\.\[[a-zA-Z_][a-zA-Z0-9_]*\])\s*\(',  # [dbo].[function_name]()
+        r'([a-zA-Z_][a-zA-Z0-9_]*\.\[[a-zA-Z_][a-zA-Z0-9_]*\])\s*\(',  # schema.[function_name]()
+        r'(\[[a-zA-Z_][a-zA-Z0-9_]*\]\.\[[a-zA-Z_][a-zA-Z0-9_]*\])\s*\(',  # [schema].[function_name]()
+        r'(fn_[a-zA-Z_][a-zA-Z0-9_]*)\s*\(',  # fn_function_name() - common UDF naming
+        r'(udf_[a-zA-Z_][a-zA-Z0-9_]*)\s*\(',  # udf_function_name() - common UDF naming
+        r'(func_[a-zA-Z_][a-zA-Z0-9_]*)\s*\(',  # func_function_name() - common UDF naming
+    ]
+}
+
+CONTROL_KEYWORDS = {
+    'IF', 'ELSE', 'WHILE', 'FOR', 'BEGIN', 'END', 'TRY', 'CATCH',
+    'GOTO', 'RETURN', 'BREAK', 'CONTINUE', 'CASE', 'WHEN'
+}
+
+TRANSACTION_KEYWORDS = {
+    'BEGIN TRANSACTION', 'COMMIT', 'ROLLBACK', 'SAVE TRANSACTION'
+}
+
+# Business function patterns
+BUSINESS_FUNCTION_PATTERNS = {
+    'CUSTOMER_VALIDATION': [r'customer.*valid', r'@customer.*check', r'customer.*exist'],
+    'INVENTORY_MANAGEMENT': [r'inventory', r'stock', r'warehouse', r'allocation'],
+    'PAYMENT_PROCESSING': [r'payment', r'transaction', r'authorize', r'charge'],
+    'TAX_CALCULATION': [r'tax', r'rate.*calculate', r'tax.*amount'],
+    'SHIPPING_LOGISTICS': [r'shipping', r'delivery', r'freight', r'carrier'],
+    'LOYALTY_REWARDS': [r'loyalty', r'points', r'reward', r'tier'],
+    'PROMOTION_DISCOUNT': [r'promo', r'discount', r'coupon', r'offer'],
+    'AUDIT_LOGGING': [r'audit', r'log', r'track', r'history'],
+    'NOTIFICATION': [r'notification', r'alert', r'email', r'message'],
+    'REPORTING': [r'report', r'summary', r'analytics', r'statistics']
+}
+
+# Text a line must contain (any one of) before a category's call patterns can
+# match it; categories without an entry are always tried
+PROC_FUNCTION_PATTERN_KEYWORDS = {
+    'STORED_PROCEDURES': ('EXEC', 'CALL', 'sp_executesql'),
+    'SYSTEM_FUNCTIONS': ('GETDATE', 'GETUTCDATE', 'SYSDATETIME', 'CURRENT_TIMESTAMP', 'NEWID',
+                         'NEWSEQUENTIALID', 'SCOPE_IDENTITY', '@@', 'USER_NAME', 'SYSTEM_USER',
+                         'ORIGINAL_LOGIN'),
+    'AGGREGATE_FUNCTIONS': ('(',),
+    'STRING_FUNCTIONS': ('(',),
+    'DATE_FUNCTIONS': ('(',),
+    'MATH_FUNCTIONS': ('(', 'RAND', 'SIGN', 'PI'),
+    'CONVERSION_FUNCTIONS': ('(',),
+    'WINDOW_FUNCTIONS': ('(',),
+    'LOGICAL_FUNCTIONS': ('(',),
+    'USER_DEFINED': ('(',),
+}
+
+def _leading_literal(pattern: str) -> str:
+    """The literal text a pattern starts with, which every match contains"""
+    literal = re.match(r'[@\w]*', pattern).group()
+    if pattern[len(literal):len(literal) + 1] in ('?', '*', '{'):
+        literal = literal[:-1]      # the last character is optional
+    return literal
+
+@dataclass
+class LinePatterns:
+    """The tables above with every pattern compiled, in table order
+
+    Keyword and business patterns carry the literal text a line needs before they
+    are worth searching for; call pattern categories carry their keyword gate.
+    """
+    sql_keywords: List[Tuple[str, 're.Pattern']]
+    proc_functions: List[Tuple[str, Tuple[str, ...], List['re.Pattern']]]
+    control_keywords: List[Tuple[str, 're.Pattern']]
+    business_functions: List[Tuple[str, List[Tuple[str, 're.Pattern']]]]
+    declaration: 're.Pattern'
+    cursor: 're.Pattern'
+    dynamic_exec: 're.Pattern'
+    error_raise: 're.Pattern'
+    section_rule: 're.Pattern'
+
+@lru_cache(maxsize=None)
+def line_patterns() -> LinePatterns:
+    """Compiled line-analysis patterns, built on first use and then shared"""
+    return LinePatterns(
+        sql_keywords=[(keyword, re.compile(rf'\b{keyword}\b')) for keyword in sorted(SQL_KEYWORDS)],
+        proc_functions=[(category, PROC_FUNCTION_PATTERN_KEYWORDS.get(category, ('',)),
+                         [re.compile(pattern) for pattern in patterns])
+                        for category, patterns in PROC_FUNCTION_PATTERNS.items()],
+        control_keywords=[(keyword, re.compile(rf'\b{keyword}\b')) for keyword in sorted(CONTROL_KEYWORDS)],
+        business_functions=[(name, [(_leading_literal(pattern), re.compile(pattern)) for pattern in patterns])
+                            for name, patterns in BUSINESS_FUNCTION_PATTERNS.items()],
+        declaration=re.compile(r'DECLARE\s+(@\w+|\w+)'),
+        cursor=re.compile(r'CURSOR\s+FOR'),
+        dynamic_exec=re.compile(r'EXEC\s*\(|EXECUTE\s*\('),
+        error_raise=re.compile(r'RAISERROR|THROW'),
+        section_rule=re.compile(r'={3,}|_{3,}|-{3,}'),
+    )
 
 class ChunkType(Enum):
     """Generic chunk types based on SQL patterns"""
@@ -35,6 +189,48 @@ class ChunkStrategy(Enum):
     SIZE_CONSTRAINED = "size_constrained"  # Break large blocks with context
     FUNCTIONAL = "functional"              # Group by business purpose
     HYBRID = "hybrid"                      # Smart combination
+    TOKEN_BUDGET = "token_budget"          # Fewest chunks within a model-token budget
+
+# Default budget of the token_budget strategy, in estimated model tokens per chunk
+DEFAULT_MAX_CHUNK_TOKENS = 2000
+
+# Average characters per token of code for the default estimator
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(line: str) -> int:
+    """Fast estimate of one line's model tokens: about CHARS_PER_TOKEN characters per
+    token of the stripped text, plus one for indentation and the line break"""
+    return -(-len(line.strip()) // CHARS_PER_TOKEN) + 1
+
+class TiktokenEstimator:
+    """Exact per-line token counts from a tiktoken encoding (optional dependency)
+
+    Pickles by encoding name, so analyzers using it still work with process pools.
+    """
+    def __init__(self, encoding_name: str = 'cl100k_base'):
+        import tiktoken
+        self.encoding_name = encoding_name
+        self._encode = tiktoken.get_encoding(encoding_name).encode
+
+    def __reduce__(self):
+        return TiktokenEstimator, (self.encoding_name,)
+
+    def __call__(self, line: str) -> int:
+        return len(self._encode(line + '\n'))
+
+def make_token_estimator(name: str) -> Callable[[str], int]:
+    """Estimator by command line name: 'estimate' or 'tiktoken[:encoding]'"""
+    if name == 'estimate':
+        return estimate_tokens
+    if name.split(':')[0] == 'tiktoken':
+        try:
+            return TiktokenEstimator(*name.split(':')[1:2])
+        except ImportError:
+            raise ValueError("the tiktoken tokenizer needs the tiktoken package (pip install tiktoken)")
+    raise ValueError(f"unknown tokenizer {name!r} (use 'estimate' or 'tiktoken[:encoding]')")
+
+# A CREATE/ALTER PROCEDURE or FUNCTION; token-budget chunks never pack across one
+_DEFINITION_START_RE = re.compile(r'^(?:CREATE|ALTER)\s+(?:OR\s+ALTER\s+)?(?:PROC|PROCEDURE|FUNCTION)\b')
 
 @dataclass
 class SubChunkInfo:
@@ -67,15 +263,36 @@ class CodeChunk:
     continuation_from: Optional[int] = None  # Previous chunk ID if subdivided
     continuation_to: Optional[int] = None    # Next chunk ID if subdivided
     business_functions: List[str] = None     # Business functions performed
+    content_hash: str = ""                   # chunk_content_hash of lines
+    token_count: int = 0                     # estimated model tokens of lines
+    original_start_line: Optional[int] = None  # start/end in the original text when
+    original_end_line: Optional[int] = None    # over-long lines were split
+
+def chunk_content_hash(lines: List[str]) -> str:
+    """sha256 of a chunk's code after whitespace normalization
+
+    Runs of spaces and tabs collapse to one space, lines are stripped and blank
+    lines dropped, so chunks that differ only in indentation or spacing - the usual
+    difference between variants of a procedure - share a hash. Case and comments
+    are kept: they can carry meaning (string literals, review markers).
+    """
+    import hashlib
+    normalized = '\n'.join(' '.join(line.split()) for line in lines if line.strip())
+    return hashlib.sha256(normalized.encode('utf-8', errors='surrogatepass')).hexdigest()
 
 class AdaptiveSQLAnalyzer:
+    """Keeps only configuration on the instance (pattern tables are module-level and
+    read-only), so one analyzer can chunk many procedures concurrently"""
+    
     def __init__(self, 
                  strategy: ChunkStrategy = ChunkStrategy.HYBRID,
                  target_chunk_size: int = 60,
                  min_chunk_size: int = 10,
                  max_chunk_size: int = 120,
                  force_subdivision_threshold: int = 200,
-                 max_complexity_per_chunk: int = 50):
+                 max_complexity_per_chunk: int = 50,
+                 max_chunk_tokens: int = DEFAULT_MAX_CHUNK_TOKENS,
+                 token_estimator: Callable[[str], int] = estimate_tokens):
         
         self.strategy = strategy
         self.target_chunk_size = target_chunk_size
@@ -83,105 +300,30 @@ class AdaptiveSQLAnalyzer:
         self.max_chunk_size = max_chunk_size
         self.force_subdivision_threshold = force_subdivision_threshold
         self.max_complexity_per_chunk = max_complexity_per_chunk
-        self.chunks = []
-        
-        # SQL pattern recognition
-        self.sql_keywords = {
-            'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'MERGE', 'EXEC', 'EXECUTE',
-            'CREATE', 'ALTER', 'DROP', 'TRUNCATE', 'BULK'
-        }
-        
-        # Stored procedure and function call patterns
-        self.proc_function_patterns = {
-            'STORED_PROCEDURES': [
-                r'EXEC(?:UTE)?\s+([a-zA-Z_][a-zA-Z0-9_]*\.?[a-zA-Z_][a-zA-Z0-9_]*)',  # EXEC sp_name
-                r'EXEC(?:UTE)?\s+(\[?[a-zA-Z_][a-zA-Z0-9_]*\]?\.\[?[a-zA-Z_][a-zA-Z0-9_]*\]?)',  # EXEC [schema].[sp_name]
-                r'EXEC(?:UTE)?\s*\(\s*([^)]+)\s*\)',  # EXEC dynamic SQL
-                r'(sp_executesql)',  # Dynamic SQL execution
-                r'EXEC(?:UTE)?\s+(sp_[a-zA-Z_][a-zA-Z0-9_]*)',  # EXEC sp_procedurename
-                r'EXEC(?:UTE)?\s+(usp_[a-zA-Z_][a-zA-Z0-9_]*)',  # EXEC usp_procedurename
-                r'EXEC(?:UTE)?\s+(proc_[a-zA-Z_][a-zA-Z0-9_]*)',  # EXEC proc_procedurename
-                r'CALL\s+([a-zA-Z_][a-zA-Z0-9_]*\.?[a-zA-Z_][a-zA-Z0-9_]*)',  # CALL procedure (MySQL/PostgreSQL style)
-            ],
-            'SYSTEM_FUNCTIONS': [
-                r'(GETDATE|GETUTCDATE|SYSDATETIME|CURRENT_TIMESTAMP)\s*\(?',
-                r'(NEWID|NEWSEQUENTIALID)\s*\(',
-                r'(SCOPE_IDENTITY|@@IDENTITY|@@ROWCOUNT|@@ERROR|@@TRANCOUNT)\b',
-                r'(USER_NAME|SUSER_NAME|SYSTEM_USER|ORIGINAL_LOGIN)\s*\(?',
-            ],
-            'AGGREGATE_FUNCTIONS': [
-                r'(SUM|COUNT|MAX|MIN|AVG|STDEV|VAR|VARP|STDEVP)\s*\(',
-                r'(COUNT_BIG|GROUPING|GROUPING_ID)\s*\(',
-            ],
-            'STRING_FUNCTIONS': [
-                r'(LEN|DATALENGTH|SUBSTRING|LEFT|RIGHT|CHARINDEX|PATINDEX)\s*\(',
-                r'(REPLACE|STUFF|REVERSE|UPPER|LOWER|LTRIM|RTRIM|TRIM)\s*\(',
-                r'(CONCAT|FORMAT|STRING_AGG|STRING_SPLIT)\s*\(',
-            ],
-            'DATE_FUNCTIONS': [
-                r'(DATEADD|DATEDIFF|DATEDIFF_BIG|DATEPART|DATENAME)\s*\(',
-                r'(YEAR|MONTH|DAY|DATETRUNC|EOMONTH|ISDATE)\s*\(',
-            ],
-            'MATH_FUNCTIONS': [
-                r'(ABS|CEILING|FLOOR|ROUND|POWER|SQRT|LOG|LOG10|EXP)\s*\(',
-                r'(SIN|COS|TAN|ASIN|ACOS|ATAN|ATN2|DEGREES|RADIANS)\s*\(',
-                r'(RAND|SIGN|PI)\s*\(?',
-            ],
-            'CONVERSION_FUNCTIONS': [
-                r'(CAST|CONVERT|TRY_CAST|TRY_CONVERT|PARSE|TRY_PARSE)\s*\(',
-                r'(ISNULL|COALESCE|NULLIF|IIF|CHOOSE)\s*\(',
-            ],
-            'WINDOW_FUNCTIONS': [
-                r'(ROW_NUMBER|RANK|DENSE_RANK|NTILE)\s*\(',
-                r'(LAG|LEAD|FIRST_VALUE|LAST_VALUE)\s*\(',
-                r'(CUME_DIST|PERCENT_RANK|PERCENTILE_CONT|PERCENTILE_DISC)\s*\(',
-            ],
-            'LOGICAL_FUNCTIONS': [
-                r'(EXISTS|NOT\s+EXISTS)\s*\(',
-                r'(CASE\s+WHEN|IIF)\s*\(',
-            ],
-            'USER_DEFINED': [
-                r'([a-zA-Z_][a-zA-Z0-9_]*\.[a-zA-Z_][a-zA-Z0-9_]*)\s*\(',  # schema.function_name()
-                r'(dbo\.[a-zA-Z_][a-zA-Z0-9_]*)\s*\(',  # dbo.function_name()
-                r'(\[dbo\]\.\[[a-zA-Z_][a-zA-Z0-9_]*\])\s*\(',  # [dbo].[function_name]()
-                r'([a-zA-Z_][a-zA-Z0-9_]*\.\[[a-zA-Z_][a-zA-Z0-9_]*\])\s*\(',  # schema.[function_name]()
-                r'(\[[a-zA-Z_][a-zA-Z0-9_]*\]\.\[[a-zA-Z_][a-zA-Z0-9_]*\])\s*\(',  # [schema].[function_name]()
-                r'(fn_[a-zA-Z_][a-zA-Z0-9_]*)\s*\(',  # fn_function_name() - common UDF naming
-                r'(udf_[a-zA-Z_][a-zA-Z0-9_]*)\s*\(',  # udf_function_name() - common UDF naming
-                r'(func_[a-zA-Z_][a-zA-Z0-9_]*)\s*\(',  # func_function_name() - common UDF naming
-            ]
-        }
+        self.max_chunk_tokens = max_chunk_tokens
+        self.token_estimator = token_estimator
+    
+    def chunk_procedure(self, sql_content: str, auto_format: bool = True,
+                        model: Optional[LineModel] = None) -> List[CodeChunk]:
+        """Main chunking method implementing adaptive strategy
         
-        self.control_keywords = {
-            'IF', 'ELSE', 'WHILE', 'FOR', 'BEGIN', 'END', 'TRY', 'CATCH',
-            'GOTO', 'RETURN', 'BREAK', 'CONTINUE', 'CASE', 'WHEN'
-        }
+        model is sql_content's LineModel when another analyzer has already built
+        it; without auto-formatting its lines are chunked as they are.
+        """
         
-        self.transaction_keywords = {
-            'BEGIN TRANSACTION', 'COMMIT', 'ROLLBACK', 'SAVE TRANSACTION'
-        }
-        
-        # Business function patterns
-        self.business_function_patterns = {
-            'CUSTOMER_VALIDATION': [r'customer.*valid', r'@customer.*check', r'customer.*exist'],
-            'INVENTORY_MANAGEMENT': [r'inventory', r'stock', r'warehouse', r'allocation'],
-            'PAYMENT_PROCESSING': [r'payment', r'transaction', r'authorize', r'charge'],
-            'TAX_CALCULATION': [r'tax', r'rate.*calculate', r'tax.*amount'],
-            'SHIPPING_LOGISTICS': [r'shipping', r'delivery', r'freight', r'carrier'],
-            'LOYALTY_REWARDS': [r'loyalty', r'points', r'reward', r'tier'],
-            'PROMOTION_DISCOUNT': [r'promo', r'discount', r'coupon', r'offer'],
-            'AUDIT_LOGGING': [r'audit', r'log', r'track', r'history'],
-            'NOTIFICATION': [r'notification', r'alert', r'email', r'message'],
-            'REPORTING': [r'report', r'summary', r'analytics', r'statistics']
-        }
-    
-    def chunk_procedure(self, sql_content: str, auto_format: bool = True) -> List[CodeChunk]:
-        """Main chunking method implementing adaptive strategy"""
+        # Minified / generated SQL: one statement per line before anything else
+        model = model or build_line_model(sql_content)
+        source = model.source
+        if source.was_split:
+            sql_content = source.text
+            print(f"✓ Split {source.split_line_count} over-long line(s) into {len(source.lines)} virtual lines")
         
         # Step 0: Auto-formatting for consistent indentation (default behavior)
         if auto_format:
             try:
-                # Use SimpleSQLFormatter for clean, consistent indentation
+                # Use SimpleSQLFormatter for clean, consistent indentation (imported
+                # here so runs without auto-format never load it)
+                from simple_sql_formatter import SimpleSQLFormatter
                 formatter = SimpleSQLFormatter(indent_size=4)
                 sql_content = formatter.format_sql(sql_content)
                 print("✓ SQL content automatically formatted for consistent indentation")
@@ -189,8 +331,23 @@ class AdaptiveSQLAnalyzer:
                 print(f"Warning: Could not format SQL content: {e}")
                 # Continue with original content if formatting fails
         
-        lines = sql_content.split('\n')
-        analyzed_lines = self._analyze_lines(lines)
+        if auto_format:
+            lines = sql_content.split('\n')
+            analyzed_lines = self._analyze_lines(lines)
+        else:
+            analyzed_lines = self._analyze_lines(source.lines, model.upper_lines)
+        
+        chunks = self._chunk_analyzed_lines(analyzed_lines)
+        if source.was_split:
+            # Line numbers are virtual (the formatter keeps one line per line, so
+            # also with auto-formatting); keep the way back to the original text
+            for chunk in chunks:
+                chunk.original_start_line = source.origin(chunk.start_line)[0]
+                chunk.original_end_line = source.origin(chunk.end_line)[0]
+        return chunks
+    
+    def _chunk_analyzed_lines(self, analyzed_lines: List[Dict[str, Any]]) -> List[CodeChunk]:
+        """Chunks of lines already run through _analyze_lines"""
         
         # Step 1: Identify logical boundaries (complete blocks)
         logical_boundaries = self._identify_logical_boundaries(analyzed_lines)
@@ -199,7 +356,11 @@ class AdaptiveSQLAnalyzer:
         logical_chunks = self._create_chunks_from_boundaries(analyzed_lines, logical_boundaries)
         
         # Step 3: Apply adaptive subdivision based on strategy
-        final_chunks = self._apply_adaptive_subdivision(logical_chunks, analyzed_lines)
+        token_counts = self._line_token_counts(analyzed_lines)
+        if self.strategy == ChunkStrategy.TOKEN_BUDGET:
+            final_chunks = self._apply_token_budget(logical_chunks, analyzed_lines, token_counts)
+        else:
+            final_chunks = self._apply_adaptive_subdivision(logical_chunks, analyzed_lines)
         
         # Step 4: Add context and cross-references
         self._add_context_and_references(final_chunks)
@@ -207,15 +368,34 @@ class AdaptiveSQLAnalyzer:
         # Step 5: Analyze dependencies to ensure sequential flow
         self._analyze_chunk_dependencies(final_chunks)
         
+        # Step 6: Fingerprint each chunk's code for deduplication across procedures,
+        # and size it in model tokens
+        for chunk in final_chunks:
+            chunk.content_hash = chunk_content_hash(chunk.lines)
+            chunk.token_count = sum(token_counts[chunk.start_line - 1:chunk.end_line])
+        
         return final_chunks
     
-    def _analyze_lines(self, lines: List[str]) -> List[Dict[str, Any]]:
-        """Comprehensive line analysis with business function detection"""
+    def analyze_many(self, sql_contents: Iterable[str], auto_format: bool = True,
+                     executor: Optional['Executor'] = None, max_pending: int = None) -> Iterator[List[CodeChunk]]:
+        """Chunk many procedures, yielding each chunk list lazily in input order
+
+        See sql_batch.map_ordered for how executor and max_pending are used.
+        """
+        return map_ordered(partial(self.chunk_procedure, auto_format=auto_format), sql_contents,
+                           executor, max_pending)
+    
+    def _analyze_lines(self, lines: List[str], upper_lines: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Comprehensive line analysis with business function detection
+        
+        upper_lines are the lines already stripped and upper-cased, if known.
+        """
+        patterns = line_patterns()
         analyzed = []
         
         for i, line in enumerate(lines, 1):
             clean_line = line.strip()
-            line_upper = clean_line.upper()
+            line_upper = upper_lines[i - 1] if upper_lines is not None else clean_line.upper()
             
             analysis = {
                 'line_number': i,
@@ -236,15 +416,17 @@ class AdaptiveSQLAnalyzer:
             
             if not analysis['is_empty'] and not analysis['is_comment']:
                 # Analyze SQL operations
-                for keyword in self.sql_keywords:
-                    if re.search(rf'\b{keyword}\b', line_upper):
+                for keyword, keyword_re in patterns.sql_keywords:
+                    if keyword in line_upper and keyword_re.search(line_upper):
                         analysis['sql_operations'].append(keyword)
                         analysis['complexity'] += 1
                 
                 # Analyze stored procedure and function calls
-                for category, patterns in self.proc_function_patterns.items():
-                    for pattern in patterns:
-                        matches = re.findall(pattern, line_upper)
+                for category, gate, category_patterns in patterns.proc_functions:
+                    if not any(keyword in line_upper for keyword in gate):
+                        continue
+                    for pattern in category_patterns:
+                        matches = pattern.findall(line_upper)
                         for match in matches:
                             if isinstance(match, tuple):
                                 # For patterns with groups, take the first non-empty group
@@ -266,40 +448,46 @@ class AdaptiveSQLAnalyzer:
                                     analysis['sql_operations'].append(f'{func_type}:{proc_func_name}')
                                     analysis['complexity'] += 1
                 
-                # Analyze control structures
-                for keyword in self.control_keywords:
-                    if re.search(rf'\b{keyword}\b', line_upper):
-                        analysis['control_structures'].append(keyword)
-                        if keyword in ['BEGIN', 'IF', 'WHILE', 'TRY', 'CASE']:
-                            analysis['nesting_change'] += 1
-                            analysis['complexity'] += 2
-                        elif keyword in ['END', 'END IF', 'END WHILE']:
-                            analysis['nesting_change'] -= 1
+                # Analyze control structures, in the order they appear on the line
+                # (END ELSE BEGIN closes one block before opening the next)
+                found = []
+                for keyword, keyword_re in patterns.control_keywords:
+                    if keyword in line_upper:
+                        match = keyword_re.search(line_upper)
+                        if match:
+                            found.append((match.start(), keyword))
+                for _, keyword in sorted(found):
+                    analysis['control_structures'].append(keyword)
+                    if keyword in ['BEGIN', 'IF', 'WHILE', 'TRY', 'CASE']:
+                        analysis['nesting_change'] += 1
+                        analysis['complexity'] += 2
+                    elif keyword in ['END', 'END IF', 'END WHILE']:
+                        analysis['nesting_change'] -= 1
                 
                 # Analyze business functions
-                for func_name, patterns in self.business_function_patterns.items():
-                    for pattern in patterns:
-                        if re.search(pattern, line_upper):
+                for func_name, function_patterns in patterns.business_functions:
+                    for literal, pattern in function_patterns:
+                        if literal in line_upper and pattern.search(line_upper):
                             analysis['business_functions'].append(func_name)
                             break
                 
                 # Identify declarations
-                var_decl = re.findall(r'DECLARE\s+(@\w+|\w+)', line_upper)
+                var_decl = patterns.declaration.findall(line_upper)
                 analysis['declarations'].extend(var_decl)
                 
                 # Additional complexity factors
-                if re.search(r'CURSOR\s+FOR', line_upper):
+                if patterns.cursor.search(line_upper):
                     analysis['complexity'] += 3
-                if re.search(r'EXEC\s*\(|EXECUTE\s*\(', line_upper):
+                if patterns.dynamic_exec.search(line_upper):
                     analysis['complexity'] += 3
                 if '@@' in line:
                     analysis['complexity'] += 1
-                if re.search(r'RAISERROR|THROW', line_upper):
+                if patterns.error_raise.search(line_upper):
                     analysis['complexity'] += 2
             
             # Check for section comments (potential subdivision points)
             elif analysis['is_comment'] and len(clean_line) > 20:
-                if re.search(r'={3,}|_{3,}|-{3,}', clean_line):
+                if patterns.section_rule.search(clean_line):
                     analysis['is_section_comment'] = True
             
             analyzed.append(analysis)
@@ -312,45 +500,15 @@ class AdaptiveSQLAnalyzer:
         i = 0
         
         while i < len(analyzed_lines):
-            line_analysis = analyzed_lines[i]
-            
-            if line_analysis['is_empty'] or line_analysis['is_comment']:
-                i += 1
+            end_line = self._logical_block_end(analyzed_lines, i)
+            if end_line is not None:
+                if i > 0 and boundaries[-1] != i:
+                    boundaries.append(i)
+                if end_line + 1 < len(analyzed_lines):
+                    boundaries.append(end_line + 1)
+                i = end_line + 1
                 continue
             
-            # Look for complete logical blocks
-            if self._is_control_flow_start(line_analysis):
-                end_line = self._find_complete_block_end(analyzed_lines, i)
-                if end_line is not None:
-                    if i > 0 and boundaries[-1] != i:
-                        boundaries.append(i)
-                    if end_line + 1 < len(analyzed_lines):
-                        boundaries.append(end_line + 1)
-                    i = end_line + 1
-                    continue
-            
-            # Look for declaration blocks
-            elif line_analysis['declarations']:
-                end_line = self._find_declaration_block_end(analyzed_lines, i)
-                if end_line is not None and end_line > i:
-                    if i > 0 and boundaries[-1] != i:
-                        boundaries.append(i)
-                    if end_line + 1 < len(analyzed_lines):
-                        boundaries.append(end_line + 1)
-                    i = end_line + 1
-                    continue
-            
-            # Look for major SQL statements
-            elif line_analysis['sql_operations']:
-                end_line = self._find_sql_statement_end(analyzed_lines, i)
-                if end_line is not None and end_line > i:
-                    if i > 0 and boundaries[-1] != i:
-                        boundaries.append(i)
-                    if end_line + 1 < len(analyzed_lines):
-                        boundaries.append(end_line + 1)
-                    i = end_line + 1
-                    continue
-            
             i += 1
         
         if boundaries[-1] != len(analyzed_lines):
@@ -358,6 +516,34 @@ class AdaptiveSQLAnalyzer:
         
         return boundaries
     
+    def _logical_block_end(self, analyzed_lines: List[Dict], i: int) -> Optional[int]:
+        """Last line of the complete logical block starting at line i, None if none starts there
+        
+        Only lines from i onwards are examined, which lets the boundary scan be
+        resumed part-way through a document.
+        """
+        line_analysis = analyzed_lines[i]
+        
+        if line_analysis['is_empty'] or line_analysis['is_comment']:
+            return None
+        
+        # Look for complete logical blocks
+        if self._is_control_flow_start(line_analysis):
+            return self._find_complete_block_end(analyzed_lines, i)
+        
+        # Look for declaration blocks
+        elif line_analysis['declarations']:
+            end_line = self._find_declaration_block_end(analyzed_lines, i)
+        
+        # Look for major SQL statements
+        elif line_analysis['sql_operations']:
+            end_line = self._find_sql_statement_end(analyzed_lines, i)
+        
+        else:
+            return None
+        
+        return end_line if end_line is not None and end_line > i else None
+    
     def _is_control_flow_start(self, line_analysis: Dict) -> bool:
         """Check if line starts a control flow block"""
         line_upper = line_analysis['upper']
@@ -503,6 +689,80 @@ class AdaptiveSQLAnalyzer:
         
         return chunks
 
+    def _line_token_counts(self, analyzed_lines: List[Dict]) -> List[int]:
+        """Estimated tokens of every line; repeated lines (END, BEGIN, blanks) are estimated once"""
+        cache = {}
+        counts = []
+        for line_data in analyzed_lines:
+            text = line_data['original']
+            count = cache.get(text)
+            if count is None:
+                count = cache[text] = self.token_estimator(text)
+            counts.append(count)
+        return counts
+    
+    def _apply_token_budget(self, logical_chunks: List[CodeChunk], analyzed_lines: List[Dict],
+                            token_counts: List[int]) -> List[CodeChunk]:
+        """Fewest consecutive chunks of at most max_chunk_tokens each
+        
+        Logical chunks are cut where a procedure or function starts (keeping the
+        comments right above it with it) and at the last statement boundary that fits
+        the budget, then neighbours are packed together while they fit. A piece that
+        holds the start of a definition is never packed onto the piece before it.
+        Only a single line over the budget yields a larger chunk.
+        """
+        budget = self.max_chunk_tokens
+        prefix = [0]
+        for count in token_counts:
+            prefix.append(prefix[-1] + count)
+        definition_starts = [i for i, line_data in enumerate(analyzed_lines)
+                             if _DEFINITION_START_RE.match(line_data['upper'])]
+        
+        def definitions_in(start: int, end: int) -> List[int]:
+            return definition_starts[bisect_left(definition_starts, start):bisect_left(definition_starts, end)]
+        
+        # 0-based [start, end) line ranges that each fit the budget
+        pieces = []
+        for chunk in logical_chunks:
+            start, end = chunk.start_line - 1, chunk.end_line
+            ranges = []
+            for definition in definitions_in(start + 1, end):
+                cut = definition
+                while cut > start and (analyzed_lines[cut - 1]['is_comment'] or
+                                       analyzed_lines[cut - 1]['is_empty']):
+                    cut -= 1
+                if cut > start:
+                    ranges.append((start, cut))
+                    start = cut
+            ranges.append((start, end))
+            for start, end in ranges:
+                while prefix[end] - prefix[start] > budget:
+                    limit = max(bisect_right(prefix, prefix[start] + budget) - 1, start + 1)
+                    cut = next((i for i in range(limit, start, -1) if self._is_token_break(analyzed_lines, i)), limit)
+                    pieces.append((start, cut))
+                    start = cut
+                pieces.append((start, end))
+        
+        packed = []
+        for start, end in pieces:
+            if packed and prefix[end] - prefix[packed[-1][0]] <= budget and not definitions_in(start, end):
+                packed[-1] = (packed[-1][0], end)
+            else:
+                packed.append((start, end))
+        
+        return [self._create_chunk(analyzed_lines[start:end], chunk_id, start + 1)
+                for chunk_id, (start, end) in enumerate(packed, 1)]
+    
+    def _is_token_break(self, analyzed_lines: List[Dict], i: int) -> bool:
+        """Whether a token-budget chunk may start at line i: after a finished statement,
+        a blank line or a block keyword, or where a comment starts"""
+        previous = analyzed_lines[i - 1]
+        if previous['is_empty'] or previous['clean'].endswith(';'):
+            return True
+        if analyzed_lines[i]['is_comment'] and not previous['is_comment']:
+            return True
+        return previous['upper'].rstrip(';') in ('BEGIN', 'END', 'GO')
+    
     def _merge_comment_only_chunks(self, chunks: List[CodeChunk]) -> List[CodeChunk]:
         """Merge comment-only chunks with the next chunk for better context"""
         if not chunks:
@@ -545,7 +805,11 @@ class AdaptiveSQLAnalyzer:
 
     def _is_comment_only_chunk(self, chunk: CodeChunk) -> bool:
         """Check if chunk contains only comments and empty lines"""
-        for line in chunk.lines:
+        return self._is_comment_only_lines(chunk.lines)
+
+    def _is_comment_only_lines(self, lines: List[str]) -> bool:
+        """Check if lines are only comments and empty lines"""
+        for line in lines:
             stripped = line.strip()
             if stripped and not (stripped.startswith('--') or 
                                stripped.startswith('/*') or 
@@ -586,12 +850,12 @@ class AdaptiveSQLAnalyzer:
             total_complexity += chunk.complexity_score
         
         # Remove duplicates
-        all_sql_operations = list(set(all_sql_operations))
-        all_control_structures = list(set(all_control_structures))
-        all_variables_declared = list(set(all_variables_declared))
-        all_variables_used = list(set(all_variables_used))
-        all_tables_accessed = list(set(all_tables_accessed))
-        all_business_functions = list(set(all_business_functions))
+        all_sql_operations = list(dict.fromkeys(all_sql_operations))
+        all_control_structures = list(dict.fromkeys(all_control_structures))
+        all_variables_declared = list(dict.fromkeys(all_variables_declared))
+        all_variables_used = list(dict.fromkeys(all_variables_used))
+        all_tables_accessed = list(dict.fromkeys(all_tables_accessed))
+        all_business_functions = list(dict.fromkeys(all_business_functions))
         
         # Create merged chunk
         merged_chunk = CodeChunk(
@@ -638,12 +902,12 @@ class AdaptiveSQLAnalyzer:
                 tables_accessed.extend(tables_in_line)
         
         # Remove duplicates
-        sql_operations = list(set(sql_operations))
-        control_structures = list(set(control_structures))
-        variables_declared = list(set(variables_declared))
-        variables_used = list(set(variables_used))
-        tables_accessed = list(set(tables_accessed))
-        business_functions = list(set(business_functions))
+        sql_operations = list(dict.fromkeys(sql_operations))
+        control_structures = list(dict.fromkeys(control_structures))
+        variables_declared = list(dict.fromkeys(variables_declared))
+        variables_used = list(dict.fromkeys(variables_used))
+        tables_accessed = list(dict.fromkeys(tables_accessed))
+        business_functions = list(dict.fromkeys(business_functions))
         
         chunk_type = self._determine_chunk_type(sql_operations, control_structures, variables_declared, lines)
         title = self._generate_chunk_title(chunk_type, sql_operations, control_structures, business_functions, chunk_id)
@@ -857,12 +1121,12 @@ class AdaptiveSQLAnalyzer:
                     prev_chunk.lines = combined_lines
                     prev_chunk.end_line = sub_chunk.end_line
                     prev_chunk.complexity_score += sub_chunk.complexity_score
-                    prev_chunk.sql_operations = list(set(prev_chunk.sql_operations + sub_chunk.sql_operations))
-                    prev_chunk.control_structures = list(set(prev_chunk.control_structures + sub_chunk.control_structures))
-                    prev_chunk.variables_declared = list(set(prev_chunk.variables_declared + sub_chunk.variables_declared))
-                    prev_chunk.variables_used = list(set(prev_chunk.variables_used + sub_chunk.variables_used))
-                    prev_chunk.tables_accessed = list(set(prev_chunk.tables_accessed + sub_chunk.tables_accessed))
-                    prev_chunk.business_functions = list(set(prev_chunk.business_functions + sub_chunk.business_functions))
+                    prev_chunk.sql_operations = list(dict.fromkeys(prev_chunk.sql_operations + sub_chunk.sql_operations))
+                    prev_chunk.control_structures = list(dict.fromkeys(prev_chunk.control_structures + sub_chunk.control_structures))
+                    prev_chunk.variables_declared = list(dict.fromkeys(prev_chunk.variables_declared + sub_chunk.variables_declared))
+                    prev_chunk.variables_used = list(dict.fromkeys(prev_chunk.variables_used + sub_chunk.variables_used))
+                    prev_chunk.tables_accessed = list(dict.fromkeys(prev_chunk.tables_accessed + sub_chunk.tables_accessed))
+                    prev_chunk.business_functions = list(dict.fromkeys(prev_chunk.business_functions + sub_chunk.business_functions))
                     i += 1
                     merged = True
                 
@@ -1875,12 +2139,16 @@ class AdaptiveSQLAnalyzer:
     
     def _analyze_chunk_dependencies(self, chunks: List[CodeChunk]):
         """Analyze dependencies to ensure sequential flow"""
+        # Declarations are recorded upper-cased and uses as written; T-SQL variable
+        # names are case-insensitive, so compare them upper-cased
+        declared = [{var.upper() for var in chunk.variables_declared} for chunk in chunks]
         for i, chunk in enumerate(chunks):
             dependencies = []
+            used = {var.upper() for var in chunk.variables_used}
             
             # Check variable dependencies
             for j, prev_chunk in enumerate(chunks[:i]):
-                if any(var in chunk.variables_used for var in prev_chunk.variables_declared):
+                if not used.isdisjoint(declared[j]):
                     dependencies.append(prev_chunk.chunk_id)
             
             # Check continuation dependencies
@@ -1890,6 +2158,64 @@ class AdaptiveSQLAnalyzer:
             
             chunk.dependencies = dependencies
 
+def format_chunk_section(chunk: CodeChunk) -> List[str]:
+    """Markdown lines of one chunk's detailed analysis section, code and questions"""
+    section = []
+    section.append(f"### Chunk {chunk.chunk_id}: {chunk.title}")
+    section.append(f"**Type**: {chunk.chunk_type.value}")
+    section.append(f"**Complexity Score**: {chunk.complexity_score}")
+    section.append(f"**Lines**: {format_line_range(chunk)}")
+    section.append(f"**Context**: {chunk.context_summary}")
+    
+    if chunk.sql_operations:
+        section.append(f"**SQL Operations**: {', '.join(chunk.sql_operations)}")
+    
+    if chunk.control_structures:
+        section.append(f"**Control Structures**: {', '.join(chunk.control_structures)}")
+    
+    if chunk.business_functions:
+        section.append(f"**Business Functions**: {', '.join(chunk.business_functions).replace('_', ' ').title()}")
+    
+    if chunk.variables_declared:
+        section.append(f"**Variables Declared**: {', '.join(chunk.variables_declared[:10])}")
+        if len(chunk.variables_declared) > 10:
+            section.append(f"   (and {len(chunk.variables_declared) - 10} more...)")
+    
+    if chunk.tables_accessed:
+        section.append(f"**Tables/Views**: {', '.join(chunk.tables_accessed)}")
+    
+    if chunk.dependencies:
+        section.append(f"**Sequential Dependencies**: Chunks {', '.join(map(str, chunk.dependencies))}")
+    
+    if chunk.sub_chunk_info:
+        info = chunk.sub_chunk_info
+        section.append(f"**Subdivision Info**: Part {info.sub_chunk_index} of {info.total_sub_chunks}")
+        section.append(f"**Parent Block**: {info.parent_block_type} (lines {info.parent_block_start}-{info.parent_block_end})")
+    
+    section.append("")
+    section.append("**Code:**")
+    section.append("```sql")
+    for line in chunk.lines:
+        section.append(line)
+    section.append("```")
+    section.append("")
+    
+    section.append("**Sequential Analysis Questions:**")
+    section.append("1. How does this chunk build upon the previous chunks?")
+    section.append("2. What specific business logic or data processing occurs here?")
+    section.append("3. What variables or data from previous chunks are used?")
+    section.append("4. What outputs or state changes prepare for subsequent chunks?")
+    section.append("5. What error conditions or edge cases are handled?")
+    section.append("6. How does this contribute to the overall procedure workflow?")
+    
+    if chunk.continuation_to:
+        section.append("7. How does this chunk connect to its continuation in the next chunk?")
+    
+    section.append("")
+    section.append("---")
+    section.append("")
+    return section
+
 def generate_adaptive_analysis_guide(chunks: List[CodeChunk], strategy: ChunkStrategy, config: Dict) -> str:
     """Generate comprehensive analysis guide with adaptive chunking details"""
     guide = []
@@ -1900,6 +2226,8 @@ def generate_adaptive_analysis_guide(chunks: List[CodeChunk], strategy: ChunkStr
     guide.append(f"**Chunking Strategy**: {strategy.value.replace('_', ' ').title()}")
     guide.append(f"**Target Chunk Size**: {config.get('target_chunk_size', 60)} lines")
     guide.append(f"**Max Chunk Size**: {config.get('max_chunk_size', 120)} lines")
+    if 'max_chunk_tokens' in config:
+        guide.append(f"**Max Chunk Tokens**: {config['max_chunk_tokens']} ({config.get('tokenizer', 'estimate')})")
     guide.append("")
     
     # Enhanced statistics
@@ -1943,7 +2271,9 @@ def generate_adaptive_analysis_guide(chunks: List[CodeChunk], strategy: ChunkStr
         guide.append(f"{i}. **Chunk {chunk.chunk_id}**: {chunk.title}")
         guide.append(f"   - Type: {chunk.chunk_type.value}")
         guide.append(f"   - Complexity: {chunk.complexity_score}")
-        guide.append(f"   - Lines: {chunk.start_line}-{chunk.end_line}")
+        guide.append(f"   - Lines: {format_line_range(chunk)}")
+        if 'max_chunk_tokens' in config:
+            guide.append(f"   - Tokens: {chunk.token_count}")
         guide.append(f"   - Context: {chunk.context_summary}")
         
         if chunk.dependencies:
@@ -1963,85 +2293,88 @@ def generate_adaptive_analysis_guide(chunks: List[CodeChunk], strategy: ChunkStr
     guide.append("")
     
     for chunk in chunks:
-        guide.append(f"### Chunk {chunk.chunk_id}: {chunk.title}")
-        guide.append(f"**Type**: {chunk.chunk_type.value}")
-        guide.append(f"**Complexity Score**: {chunk.complexity_score}")
-        guide.append(f"**Lines**: {chunk.start_line}-{chunk.end_line}")
-        guide.append(f"**Context**: {chunk.context_summary}")
-        
-        if chunk.sql_operations:
-            guide.append(f"**SQL Operations**: {', '.join(chunk.sql_operations)}")
-        
-        if chunk.control_structures:
-            guide.append(f"**Control Structures**: {', '.join(chunk.control_structures)}")
-        
-        if chunk.business_functions:
-            guide.append(f"**Business Functions**: {', '.join(chunk.business_functions).replace('_', ' ').title()}")
-        
-        if chunk.variables_declared:
-            guide.append(f"**Variables Declared**: {', '.join(chunk.variables_declared[:10])}")
-            if len(chunk.variables_declared) > 10:
-                guide.append(f"   (and {len(chunk.variables_declared) - 10} more...)")
-        
-        if chunk.tables_accessed:
-            guide.append(f"**Tables/Views**: {', '.join(chunk.tables_accessed)}")
-        
-        if chunk.dependencies:
-            guide.append(f"**Sequential Dependencies**: Chunks {', '.join(map(str, chunk.dependencies))}")
-        
-        if chunk.sub_chunk_info:
-            info = chunk.sub_chunk_info
-            guide.append(f"**Subdivision Info**: Part {info.sub_chunk_index} of {info.total_sub_chunks}")
-            guide.append(f"**Parent Block**: {info.parent_block_type} (lines {info.parent_block_start}-{info.parent_block_end})")
-        
-        guide.append("")
-        guide.append("**Code:**")
-        guide.append("```sql")
-        for line in chunk.lines:
-            guide.append(line)
-        guide.append("```")
-        guide.append("")
-        
-        guide.append("**Sequential Analysis Questions:**")
-        guide.append("1. How does this chunk build upon the previous chunks?")
-        guide.append("2. What specific business logic or data processing occurs here?")
-        guide.append("3. What variables or data from previous chunks are used?")
-        guide.append("4. What outputs or state changes prepare for subsequent chunks?")
-        guide.append("5. What error conditions or edge cases are handled?")
-        guide.append("6. How does this contribute to the overall procedure workflow?")
-        
-        if chunk.continuation_to:
-            guide.append("7. How does this chunk connect to its continuation in the next chunk?")
-        
-        guide.append("")
-        guide.append("---")
-        guide.append("")
+        guide.extend(format_chunk_section(chunk))
     
     return "\n".join(guide)
 
+def format_line_range(chunk: CodeChunk) -> str:
+    """start-end of a chunk, with its original lines when they differ"""
+    line_range = f"{chunk.start_line}-{chunk.end_line}"
+    if chunk.original_start_line is not None:
+        line_range += f" (original {chunk.original_start_line}-{chunk.original_end_line})"
+    return line_range
+
+def chunk_to_dict(chunk: CodeChunk) -> Dict[str, Any]:
+    """JSON-serializable form of a chunk"""
+    chunk_dict = {
+        'chunk_id': chunk.chunk_id,
+        'title': chunk.title,
+        'lines': chunk.lines,
+        'start_line': chunk.start_line,
+        'end_line': chunk.end_line,
+        'chunk_type': chunk.chunk_type.value,
+        'complexity_score': chunk.complexity_score,
+        'sql_operations': chunk.sql_operations,
+        'variables_declared': chunk.variables_declared,
+        'variables_used': chunk.variables_used,
+        'tables_accessed': chunk.tables_accessed,
+        'control_structures': chunk.control_structures,
+        'dependencies': chunk.dependencies,
+        'context_summary': chunk.context_summary,
+        'business_functions': chunk.business_functions,
+        'content_hash': chunk.content_hash,
+        'token_count': chunk.token_count
+    }
+    
+    if chunk.original_start_line is not None:
+        chunk_dict['original_start_line'] = chunk.original_start_line
+        chunk_dict['original_end_line'] = chunk.original_end_line
+    
+    if chunk.sub_chunk_info:
+        chunk_dict['sub_chunk_info'] = {
+            'parent_block_type': chunk.sub_chunk_info.parent_block_type,
+            'parent_block_start': chunk.sub_chunk_info.parent_block_start,
+            'parent_block_end': chunk.sub_chunk_info.parent_block_end,
+            'sub_chunk_index': chunk.sub_chunk_info.sub_chunk_index,
+            'total_sub_chunks': chunk.sub_chunk_info.total_sub_chunks,
+            'subdivision_reason': chunk.sub_chunk_info.subdivision_reason
+        }
+    
+    return chunk_dict
+
 def main():
     """Main function for command line usage"""
     import argparse
     
     parser = argparse.ArgumentParser(description='Adaptive SQL stored procedure chunking analyzer with automatic formatting')
-    parser.add_argument('sql_file', help='Path to SQL file to analyze')
-    parser.add_argument('--strategy', choices=['strict_logical', 'size_constrained', 'functional', 'hybrid'], 
+    parser.add_argument('sql_file', nargs='?', help='Path to SQL file to analyze')
+    parser.add_argument('--strategy', choices=[strategy.value for strategy in ChunkStrategy], 
                        default='hybrid', help='Chunking strategy')
     parser.add_argument('--target-size', type=int, default=60, help='Target lines per chunk')
     parser.add_argument('--min-size', type=int, default=10, help='Minimum lines per chunk')
     parser.add_argument('--max-size', type=int, default=120, help='Maximum lines per chunk')
     parser.add_argument('--force-subdivision', type=int, default=200, help='Force subdivision threshold')
     parser.add_argument('--max-complexity', type=int, default=50, help='Maximum complexity per chunk before forced subdivision')
+    parser.add_argument('--max-tokens', type=int, default=DEFAULT_MAX_CHUNK_TOKENS,
+                        help='Maximum model tokens per chunk (token_budget strategy)')
+    parser.add_argument('--tokenizer', default='estimate',
+                        help="Token counter of the token_budget strategy: 'estimate' or 'tiktoken[:encoding]'")
     parser.add_argument('--output', '-o', help='Output file for analysis guide')
     parser.add_argument('--format', choices=['markdown', 'json'], default='markdown', help='Output format')
+    parser.add_argument('--split', metavar='DIR',
+                        help='Write one file per chunk and a manifest.json into DIR instead of one guide')
     parser.add_argument('--auto-format', type=lambda x: x.lower() != 'false', default=True, 
                        help='Automatically format SQL before chunking for consistent indentation (default: true, use --auto-format=false to disable)')
+    add_watch_arguments(parser)
     
     args = parser.parse_args()
+    if not args.sql_file and not args.watch:
+        parser.error('sql_file is required unless --watch is given')
     
-    # Read SQL file
-    with open(args.sql_file, 'r', encoding='utf-8', errors='ignore') as f:
-        sql_content = f.read()
+    try:
+        estimator = make_token_estimator(args.tokenizer)
+    except ValueError as e:
+        parser.error(str(e))
     
     # Create analyzer with specified strategy
     strategy = ChunkStrategy(args.strategy)
@@ -2051,59 +2384,65 @@ def main():
         min_chunk_size=args.min_size,
         max_chunk_size=args.max_size,
         force_subdivision_threshold=args.force_subdivision,
-        max_complexity_per_chunk=args.max_complexity
+        max_complexity_per_chunk=args.max_complexity,
+        max_chunk_tokens=args.max_tokens,
+        token_estimator=estimator
     )
     
-    chunks = analyzer.chunk_procedure(sql_content, auto_format=args.auto_format)
-    
-    # Generate output
     config = {
         'target_chunk_size': args.target_size,
         'max_chunk_size': args.max_size,
         'min_chunk_size': args.min_size,
         'force_subdivision_threshold': args.force_subdivision
     }
+    if strategy == ChunkStrategy.TOKEN_BUDGET:
+        config.update(max_chunk_tokens=args.max_tokens, tokenizer=args.tokenizer)
     
-    if args.format == 'json':
-        chunks_data = []
-        for chunk in chunks:
-            chunk_dict = {
-                'chunk_id': chunk.chunk_id,
-                'title': chunk.title,
-                'lines': chunk.lines,
-                'start_line': chunk.start_line,
-                'end_line': chunk.end_line,
-                'chunk_type': chunk.chunk_type.value,
-                'complexity_score': chunk.complexity_score,
-                'sql_operations': chunk.sql_operations,
-                'variables_declared': chunk.variables_declared,
-                'variables_used': chunk.variables_used,
-                'tables_accessed': chunk.tables_accessed,
-                'control_structures': chunk.control_structures,
-                'dependencies': chunk.dependencies,
-                'context_summary': chunk.context_summary,
-                'business_functions': chunk.business_functions
-            }
-            
-            if chunk.sub_chunk_info:
-                chunk_dict['sub_chunk_info'] = {
-                    'parent_block_type': chunk.sub_chunk_info.parent_block_type,
-                    'parent_block_start': chunk.sub_chunk_info.parent_block_start,
-                    'parent_block_end': chunk.sub_chunk_info.parent_block_end,
-                    'sub_chunk_index': chunk.sub_chunk_info.sub_chunk_index,
-                    'total_sub_chunks': chunk.sub_chunk_info.total_sub_chunks,
-                    'subdivision_reason': chunk.sub_chunk_info.subdivision_reason
-                }
-            
-            chunks_data.append(chunk_dict)
+    def render(sql_content: str):
+        """Chunk SQL content and generate the requested output"""
+        if args.watch:
+            # The chunker reports its preprocessing steps; keep them off stdout while watching
+            import sys
+            import contextlib
+            with contextlib.redirect_stdout(sys.stderr):
+                chunks = analyzer.chunk_procedure(sql_content, auto_format=args.auto_format)
+        else:
+            chunks = analyzer.chunk_procedure(sql_content, auto_format=args.auto_format)
         
-        output = json.dumps({
-            'strategy': strategy.value,
-            'config': config,
-            'chunks': chunks_data
-        }, indent=2)
-    else:
-        output = generate_adaptive_analysis_guide(chunks, strategy, config)
+        if args.format == 'json':
+            chunks_data = [chunk_to_dict(chunk) for chunk in chunks]
+            
+            output = json.dumps({
+                'strategy': strategy.value,
+                'config': config,
+                'chunks': chunks_data
+            }, indent=2)
+        else:
+            output = generate_adaptive_analysis_guide(chunks, strategy, config)
+        return chunks, output
+    
+    if args.watch:
+        # --output names a directory here; guides go next to each file by default
+        suffix = 'adaptive_analysis.json' if args.format == 'json' else 'adaptive_analysis.md'
+        signature = json.dumps(['adaptive', strategy.value, config, args.max_complexity, args.auto_format])
+        watch_and_regenerate(args.watch, lambda sql_content: render(sql_content)[1], suffix,
+                             output_dir=args.output, signature=signature, poll_interval=args.poll_interval,
+                             debounce=args.debounce, once=args.once)
+        return
+    
+    # Read SQL file
+    with open(args.sql_file, 'r', encoding='utf-8', errors='ignore') as f:
+        sql_content = f.read()
+    
+    if args.split:
+        from sql_chunk_files import write_chunk_files
+        chunks = analyzer.chunk_procedure(sql_content, auto_format=args.auto_format)
+        result = write_chunk_files(chunks, args.split, args.sql_file, strategy.value, config)
+        print(f"{len(chunks)} chunks in {args.split}: {len(result.written)} file(s) written, "
+              f"{len(result.unchanged)} unchanged, {len(result.removed)} removed")
+        return
+    
+    chunks, output = render(sql_content)
     
     # Write output
     if args.output:
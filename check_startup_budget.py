@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Check the cold-start budget of the command line entry points
+Hooks run the analyzers once per file, so start-up time matters as much as analysis
+speed. For every CLI module this measures `python -X importtime` for its import, the
+wall time of full runs on a small procedure, and verifies that heavy modules that are
+only needed by optional features (process pools, formatters, hashing) stay unloaded.
+The adaptive analyzer is timed both with its default auto-formatting, as hooks run
+it, and without. A module over budget is measured again before it counts as a
+failure, so a noisy machine does not fail the check.
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+from typing import List, Tuple
+
+# Entry points and the arguments of typical per-file runs
+CLI_MODULES = {
+    'sql_analyzer': [[]],
+    'chunked_analyzer': [[]],
+    'adaptive_chunked_analyzer': [[], ['--auto-format', 'false']],
+    'decision_points_analyzer': [[]],
+    'sqlanalyze': [['decisions'], ['chunks']],
+}
+
+# Best-of-N budgets; a bare interpreter start takes about 10 ms
+DEFAULT_IMPORT_BUDGET_MS = 40.0
+DEFAULT_RUN_BUDGET_MS = 100.0
+
+# Extra rounds of measurements before a module over budget counts as a failure, so
+# a burst of load on the machine is not reported as a regression
+DEFAULT_RETRIES = 2
+
+# Modules that must not be imported just to analyze one file
+DEFERRED_MODULES = (
+    'concurrent.futures', 'multiprocessing', 'hashlib', 'tempfile', 'pathlib',
+    'sql_formatter', 'simple_sql_formatter', 'sql_format_parallel', 'sql_triage',
+)
+
+SMALL_PROCEDURE = """CREATE PROCEDURE dbo.usp_StartupCheck @Id INT
+AS
+BEGIN
+    SET NOCOUNT ON;
+    DECLARE @Count INT = 0;
+    IF @Id IS NULL
+    BEGIN
+        RAISERROR('Id is required', 16, 1);
+        RETURN;
+    END
+    SELECT @Count = COUNT(*) FROM dbo.Orders WHERE CustomerId = @Id AND Status = 1;
+    UPDATE dbo.Customers SET OrderCount = @Count WHERE Id = @Id;
+END
+"""
+
+_IMPORTTIME_RE = re.compile(r'import time:\s*(\d+)\s*\|\s*(\d+)\s*\|\s*(\S+)')
+
+def import_time_ms(module: str, cwd: str) -> Tuple[float, List[str]]:
+    """Cumulative import time of module in a fresh interpreter, and every module it loaded"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=cwd, capture_output=True, text=True, check=True)
+    cumulative = 0.0
+    loaded = []
+    for match in _IMPORTTIME_RE.finditer(result.stderr):
+        loaded.append(match.group(3))
+        if match.group(3) == module:
+            cumulative = int(match.group(2)) / 1000
+    return cumulative, loaded
+
+def run_time_ms(module: str, args: List[str], sql_file: str, cwd: str) -> float:
+    """Wall time of one complete CLI run"""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(cwd, f'{module}.py')] + args + [sql_file],
+                   cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    return (time.perf_counter() - start) * 1000
+
+def fastest_ms(measure, repeat: int, budget_ms: float, retries: int) -> float:
+    """Fastest of repeat measurements, measuring up to retries more rounds while over budget"""
+    best = min(measure() for _ in range(repeat))
+    for _ in range(retries):
+        if best <= budget_ms:
+            break
+        best = min([best] + [measure() for _ in range(repeat)])
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description='Check CLI start-up time against a budget')
+    parser.add_argument('--import-budget-ms', type=float, default=DEFAULT_IMPORT_BUDGET_MS,
+                        help='Maximum cumulative import time per CLI module')
+    parser.add_argument('--run-budget-ms', type=float, default=DEFAULT_RUN_BUDGET_MS,
+                        help='Maximum wall time of a run on a small procedure')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Measurements per module; the fastest one counts')
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES,
+                        help='Extra rounds of measurements for a module over budget')
+    args = parser.parse_args()
+
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    failures = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        sql_file = os.path.join(temp_dir, 'startup_check.sql')
+        with open(sql_file, 'w', encoding='utf-8') as f:
+            f.write(SMALL_PROCEDURE)
+
+        print(f"{'module':<28} {'import ms':>10} {'run ms':>8}  arguments")
+        for module, runs in CLI_MODULES.items():
+            loaded = import_time_ms(module, cwd)[1]
+            import_ms = fastest_ms(lambda: import_time_ms(module, cwd)[0], args.repeat,
+                                   args.import_budget_ms, args.retries)
+            if import_ms > args.import_budget_ms:
+                failures.append(f"{module}: import takes {import_ms:.1f} ms (budget {args.import_budget_ms:.0f} ms)")
+            for cli_args in runs:
+                run_ms = fastest_ms(lambda: run_time_ms(module, cli_args, sql_file, cwd), args.repeat,
+                                    args.run_budget_ms, args.retries)
+                print(f"{module:<28} {import_ms:>10.1f} {run_ms:>8.1f}  {' '.join(cli_args)}")
+                if run_ms > args.run_budget_ms:
+                    failures.append(f"{module} {' '.join(cli_args)}: run takes {run_ms:.1f} ms "
+                                    f"(budget {args.run_budget_ms:.0f} ms)")
+            eager = sorted(set(loaded) & set(DEFERRED_MODULES))
+            if eager:
+                failures.append(f"{module}: imports {', '.join(eager)} at start-up")
+
+    print()
+    if failures:
+        print(f'❌ {len(failures)} start-up budget violation(s):')
+        for failure in failures:
+            print(f'   {failure}')
+        sys.exit(1)
+    print('✅ All entry points are within the start-up budget')
+
+if __name__ == "__main__":
+    main()
@@ -6,10 +6,67 @@ Works across all business domains and SQL variants.
 """
 
 import re
-from typing import List, Dict, Any, Tuple, Optional
+from typing import TYPE_CHECKING, List, Dict, Any, Tuple, Iterable, Iterator, Optional
 from dataclasses import dataclass
 import json
 from enum import Enum
+from functools import lru_cache
+
+from sql_batch import map_ordered
+from sql_line_splitter import split_long_lines
+from sql_watch import add_watch_arguments, watch_and_regenerate
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+
+# Generic SQL patterns - work for any domain
+SQL_KEYWORDS = {
+    'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'MERGE', 'EXEC', 'EXECUTE',
+    'CREATE', 'ALTER', 'DROP', 'TRUNCATE', 'BULK'
+}
+
+CONTROL_KEYWORDS = {
+    'IF', 'ELSE', 'WHILE', 'FOR', 'BEGIN', 'END', 'TRY', 'CATCH',
+    'GOTO', 'RETURN', 'BREAK', 'CONTINUE', 'CASE', 'WHEN'
+}
+
+TRANSACTION_KEYWORDS = {
+    'BEGIN TRANSACTION', 'COMMIT', 'ROLLBACK', 'SAVE TRANSACTION'
+}
+
+# Additional control flow pattern detection for chunking
+CONTROL_FLOW_STARTS = [
+    r'\bIF\s+.*\s+BEGIN\b',           # IF condition BEGIN
+    r'\bELSE\s+BEGIN\b',              # ELSE BEGIN  
+    r'\bELSE\s+IF\s+.*\s+BEGIN\b',    # ELSE IF condition BEGIN
+    r'\bWHILE\s+.*\s+BEGIN\b',        # WHILE condition BEGIN
+    r'\bBEGIN\s+TRY\b',               # BEGIN TRY
+    r'\bBEGIN\s+CATCH\b',             # BEGIN CATCH
+]
+
+@dataclass
+class LinePatterns:
+    """The tables above with every pattern compiled, in table order"""
+    sql_keywords: List[Tuple[str, 're.Pattern']]
+    control_keywords: List[Tuple[str, 're.Pattern']]
+    control_flow_starts: List['re.Pattern']
+    declaration: 're.Pattern'
+    cursor: 're.Pattern'
+    dynamic_exec: 're.Pattern'
+    error_raise: 're.Pattern'
+
+@lru_cache(maxsize=None)
+def line_patterns() -> LinePatterns:
+    """Compiled line-analysis patterns, built on first use and then shared"""
+    return LinePatterns(
+        sql_keywords=[(keyword, re.compile(rf'\b{keyword}\b')) for keyword in SQL_KEYWORDS],
+        control_keywords=[(keyword, re.compile(rf'\b{keyword}\b')) for keyword in CONTROL_KEYWORDS],
+        control_flow_starts=[re.compile(pattern) for pattern in CONTROL_FLOW_STARTS],
+        declaration=re.compile(r'DECLARE\s+(@\w+|\w+)'),
+        cursor=re.compile(r'CURSOR\s+FOR'),
+        dynamic_exec=re.compile(r'EXEC\s*\(|EXECUTE\s*\('),
+        error_raise=re.compile(r'RAISERROR|THROW'),
+    )
 
 class ChunkType(Enum):
     """Generic chunk types based on SQL patterns, not business logic"""
@@ -44,29 +101,17 @@ class CodeChunk:
     dependencies: List[int]  # Other chunk IDs this depends on
     
 class UniversalSQLAnalyzer:
+    """Keeps only configuration on the instance (pattern tables are module-level and
+    read-only), so one analyzer can chunk many procedures concurrently"""
+    
     def __init__(self, max_chunk_size: int = 50, min_chunk_size: int = 5):
         self.max_chunk_size = max_chunk_size
         self.min_chunk_size = min_chunk_size
-        self.chunks = []
-        
-        # Generic SQL patterns - work for any domain
-        self.sql_keywords = {
-            'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'MERGE', 'EXEC', 'EXECUTE',
-            'CREATE', 'ALTER', 'DROP', 'TRUNCATE', 'BULK'
-        }
-        
-        self.control_keywords = {
-            'IF', 'ELSE', 'WHILE', 'FOR', 'BEGIN', 'END', 'TRY', 'CATCH',
-            'GOTO', 'RETURN', 'BREAK', 'CONTINUE', 'CASE', 'WHEN'
-        }
-        
-        self.transaction_keywords = {
-            'BEGIN TRANSACTION', 'COMMIT', 'ROLLBACK', 'SAVE TRANSACTION'
-        }
         
     def chunk_procedure(self, sql_content: str) -> List[CodeChunk]:
         """Break any stored procedure into logical, manageable chunks"""
-        lines = sql_content.split('\n')
+        # Over-long (minified) lines become one virtual line per statement
+        lines = split_long_lines(sql_content).lines
         
         # Clean and analyze lines
         analyzed_lines = self._analyze_lines(lines)
@@ -82,8 +127,17 @@ class UniversalSQLAnalyzer:
         
         return chunks
     
+    def analyze_many(self, sql_contents: Iterable[str], executor: Optional['Executor'] = None,
+                     max_pending: int = None) -> Iterator[List[CodeChunk]]:
+        """Chunk many procedures, yielding each chunk list lazily in input order
+
+        See sql_batch.map_ordered for how executor and max_pending are used.
+        """
+        return map_ordered(self.chunk_procedure, sql_contents, executor, max_pending)
+    
     def _analyze_lines(self, lines: List[str]) -> List[Dict[str, Any]]:
         """Analyze each line for SQL patterns and structure"""
+        patterns = line_patterns()
         analyzed = []
         
         for i, line in enumerate(lines, 1):
@@ -107,14 +161,14 @@ class UniversalSQLAnalyzer:
             
             if not analysis['is_empty'] and not analysis['is_comment']:
                 # Identify SQL operations
-                for keyword in self.sql_keywords:
-                    if re.search(rf'\b{keyword}\b', line_upper):
+                for keyword, keyword_re in patterns.sql_keywords:
+                    if keyword_re.search(line_upper):
                         analysis['sql_operations'].append(keyword)
                         analysis['complexity'] += 1
                 
                 # Identify control structures
-                for keyword in self.control_keywords:
-                    if re.search(rf'\b{keyword}\b', line_upper):
+                for keyword, keyword_re in patterns.control_keywords:
+                    if keyword_re.search(line_upper):
                         analysis['control_structures'].append(keyword)
                         if keyword in ['BEGIN', 'IF', 'WHILE', 'TRY', 'CASE']:
                             analysis['nesting_change'] += 1
@@ -123,38 +177,29 @@ class UniversalSQLAnalyzer:
                             analysis['nesting_change'] -= 1
                 
                 # Additional control flow pattern detection for chunking
-                control_flow_starts = [
-                    r'\bIF\s+.*\s+BEGIN\b',           # IF condition BEGIN
-                    r'\bELSE\s+BEGIN\b',              # ELSE BEGIN  
-                    r'\bELSE\s+IF\s+.*\s+BEGIN\b',    # ELSE IF condition BEGIN
-                    r'\bWHILE\s+.*\s+BEGIN\b',        # WHILE condition BEGIN
-                    r'\bBEGIN\s+TRY\b',               # BEGIN TRY
-                    r'\bBEGIN\s+CATCH\b',             # BEGIN CATCH
-                ]
-                
-                for pattern in control_flow_starts:
-                    if re.search(pattern, line_upper):
+                for pattern in patterns.control_flow_starts:
+                    if pattern.search(line_upper):
                         analysis['control_structures'].append('CONTROL_FLOW_START')
                         break
                 
                 # Identify transaction operations
-                for keyword in self.transaction_keywords:
+                for keyword in TRANSACTION_KEYWORDS:
                     if keyword in line_upper:
                         analysis['transaction_operations'].append(keyword)
                         analysis['complexity'] += 2
                 
                 # Identify variable declarations
-                var_decl = re.findall(r'DECLARE\s+(@\w+|\w+)', line_upper)
+                var_decl = patterns.declaration.findall(line_upper)
                 analysis['declarations'].extend(var_decl)
                 
                 # Additional complexity factors
-                if re.search(r'CURSOR\s+FOR', line_upper):
+                if patterns.cursor.search(line_upper):
                     analysis['complexity'] += 3
-                if re.search(r'EXEC\s*\(|EXECUTE\s*\(', line_upper):  # Dynamic SQL
+                if patterns.dynamic_exec.search(line_upper):  # Dynamic SQL
                     analysis['complexity'] += 3
                 if '@@' in line:  # System variables
                     analysis['complexity'] += 1
-                if re.search(r'RAISERROR|THROW', line_upper):
+                if patterns.error_raise.search(line_upper):
                     analysis['complexity'] += 2
             
             analyzed.append(analysis)
@@ -768,48 +813,65 @@ def main():
     import argparse
     
     parser = argparse.ArgumentParser(description='Universal SQL stored procedure chunking analyzer')
-    parser.add_argument('sql_file', help='Path to SQL file to analyze')
+    parser.add_argument('sql_file', nargs='?', help='Path to SQL file to analyze')
     parser.add_argument('--max-chunk-size', type=int, default=50, help='Maximum lines per chunk')
     parser.add_argument('--min-chunk-size', type=int, default=5, help='Minimum lines per chunk')
     parser.add_argument('--output', '-o', help='Output file for analysis guide')
     parser.add_argument('--format', choices=['markdown', 'json'], default='markdown', help='Output format')
+    add_watch_arguments(parser)
     
     args = parser.parse_args()
+    if not args.sql_file and not args.watch:
+        parser.error('sql_file is required unless --watch is given')
     
-    # Read SQL file
-    with open(args.sql_file, 'r', encoding='utf-8', errors='ignore') as f:
-        sql_content = f.read()
-    
-    # Create analyzer and chunk the procedure
+    # Create analyzer
     analyzer = UniversalSQLAnalyzer(
         max_chunk_size=args.max_chunk_size,
         min_chunk_size=args.min_chunk_size
     )
-    chunks = analyzer.chunk_procedure(sql_content)
-    
-    # Generate output
-    if args.format == 'json':
-        # Convert chunks to serializable format
-        chunks_data = []
-        for chunk in chunks:
-            chunks_data.append({
-                'chunk_id': chunk.chunk_id,
-                'title': chunk.title,
-                'lines': chunk.lines,
-                'start_line': chunk.start_line,
-                'end_line': chunk.end_line,
-                'chunk_type': chunk.chunk_type.value,
-                'complexity_score': chunk.complexity_score,
-                'sql_operations': chunk.sql_operations,
-                'variables_declared': chunk.variables_declared,
-                'variables_used': chunk.variables_used,
-                'tables_accessed': chunk.tables_accessed,
-                'control_structures': chunk.control_structures,
-                'dependencies': chunk.dependencies
-            })
-        output = json.dumps(chunks_data, indent=2)
-    else:
-        output = generate_universal_analysis_guide(chunks)
+    
+    def render(sql_content: str):
+        """Chunk SQL content and generate the requested output"""
+        chunks = analyzer.chunk_procedure(sql_content)
+        
+        if args.format == 'json':
+            # Convert chunks to serializable format
+            chunks_data = []
+            for chunk in chunks:
+                chunks_data.append({
+                    'chunk_id': chunk.chunk_id,
+                    'title': chunk.title,
+                    'lines': chunk.lines,
+                    'start_line': chunk.start_line,
+                    'end_line': chunk.end_line,
+                    'chunk_type': chunk.chunk_type.value,
+                    'complexity_score': chunk.complexity_score,
+                    'sql_operations': chunk.sql_operations,
+                    'variables_declared': chunk.variables_declared,
+                    'variables_used': chunk.variables_used,
+                    'tables_accessed': chunk.tables_accessed,
+                    'control_structures': chunk.control_structures,
+                    'dependencies': chunk.dependencies
+                })
+            output = json.dumps(chunks_data, indent=2)
+        else:
+            output = generate_universal_analysis_guide(chunks)
+        return chunks, output
+    
+    if args.watch:
+        # --output names a directory here; guides go next to each file by default
+        suffix = 'chunked_analysis.json' if args.format == 'json' else 'chunked_analysis.md'
+        signature = json.dumps(['chunked', args.max_chunk_size, args.min_chunk_size])
+        watch_and_regenerate(args.watch, lambda sql_content: render(sql_content)[1], suffix,
+                             output_dir=args.output, signature=signature, poll_interval=args.poll_interval,
+                             debounce=args.debounce, once=args.once)
+        return
+    
+    # Read SQL file
+    with open(args.sql_file, 'r', encoding='utf-8', errors='ignore') as f:
+        sql_content = f.read()
+    
+    chunks, output = render(sql_content)
     
     # Write output
     if args.output:
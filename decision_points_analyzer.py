@@ -8,11 +8,226 @@ all decision points (branching logic) that affect control flow and complexity.
 Universal approach works across all business domains and SQL variants.
 """
 
+import os
 import re
 import sys
-from typing import List, Dict, Tuple, Any
+from typing import TYPE_CHECKING, List, Dict, Tuple, Any, Callable, Iterable, Iterator, Optional
 from dataclasses import dataclass
-from pathlib import Path
+from functools import lru_cache
+
+from sql_batch import map_ordered
+from sql_line_model import LineModel, build_line_model
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+
+# Literal keywords each decision pattern needs on the (upper-cased) line before it
+# can possibly match. Consecutive patterns sharing a first keyword are gated
+# together, so a line without e.g. WHERE never reaches the WHERE patterns.
+# Patterns without an entry are always tried.
+DECISION_PATTERN_KEYWORDS = {
+    'if_statement': ('IF', 'BEGIN'),
+    'if_else': ('IF', 'ELSE'),
+    'else_if': ('ELSE', 'IF'),
+    'case_when': ('CASE', 'WHEN', 'THEN'),
+    'case_expression': ('CASE', 'WHEN'),
+    'while_loop': ('WHILE', 'BEGIN'),
+    'where_and': ('WHERE', 'AND'),
+    'where_or': ('WHERE', 'OR'),
+    'where_in': ('WHERE', 'IN'),
+    'where_exists': ('WHERE', 'EXISTS'),
+    'where_not_exists': ('WHERE', 'NOT', 'EXISTS'),
+    'exists_condition': ('EXISTS',),
+    'not_exists_condition': ('EXISTS', 'NOT'),
+    'having_clause': ('HAVING',),
+    'inner_join': ('JOIN', 'INNER', 'ON'),
+    'left_join': ('JOIN', 'LEFT', 'ON'),
+    'right_join': ('JOIN', 'RIGHT', 'ON'),
+    'try_catch': ('TRY', 'BEGIN'),
+    'raiserror': ('RAISERROR',),
+    'dynamic_sql': ('EXEC', '@'),
+    'subquery': ('SELECT', 'WHERE', '('),
+    'goto_statement': ('GOTO',),
+}
+
+# Clause keywords that make comparison operators count as decision points
+COMPARISON_CONTEXT_KEYWORDS = ('IF ', 'WHERE ', 'HAVING ', ' ON ', 'WHEN ')
+
+_PROCEDURE_START_RE = re.compile(r'\b(CREATE|ALTER)\s+(PROCEDURE|FUNCTION)\b')
+_PROCEDURE_NAME_RE = re.compile(r'\b(PROCEDURE|FUNCTION)\s+(\w+)')
+_END_RE = re.compile(r'\bEND\b')
+
+# Decision point patterns with complexity weights
+DECISION_PATTERNS = {
+    # IF statements and conditionals
+    'if_statement': {
+        'pattern': r'\bIF\s+([^B]+?)\s+BEGIN',
+        'weight': 2,
+        'description': 'IF conditional block'
+    },
+    'if_else': {
+        'pattern': r'\bIF\s+([^B]+?)\s+ELSE',
+        'weight': 1,
+        'description': 'IF-ELSE branch'
+    },
+    'else_if': {
+        'pattern': r'\bELSE\s+IF\s+([^B]+?)',
+        'weight': 1,
+        'description': 'ELSE IF branch'
+    },
+
+    # CASE statements
+    'case_when': {
+        'pattern': r'\bCASE\s+.*?\bWHEN\s+([^T]+?)\s+THEN',
+        'weight': 1,
+        'description': 'CASE WHEN condition'
+    },
+    'case_expression': {
+        'pattern': r'\bCASE\s+(\w+)\s+WHEN',
+        'weight': 2,
+        'description': 'CASE expression'
+    },
+
+    # WHILE and loop conditions
+    'while_loop': {
+        'pattern': r'\bWHILE\s+([^B]+?)\s+BEGIN',
+        'weight': 3,
+        'description': 'WHILE loop condition'
+    },
+
+    # Complex WHERE clauses
+    'where_and': {
+        'pattern': r'\bWHERE\s+.*?\bAND\b',
+        'weight': 1,
+        'description': 'WHERE clause with AND'
+    },
+    'where_or': {
+        'pattern': r'\bWHERE\s+.*?\bOR\b',
+        'weight': 2,
+        'description': 'WHERE clause with OR'
+    },
+    'where_in': {
+        'pattern': r'\bWHERE\s+.*?\bIN\s*\(',
+        'weight': 1,
+        'description': 'WHERE IN condition'
+    },
+    'where_exists': {
+        'pattern': r'\bWHERE\s+.*?\bEXISTS\s*\(',
+        'weight': 2,
+        'description': 'WHERE EXISTS condition'
+    },
+    'where_not_exists': {
+        'pattern': r'\bWHERE\s+.*?\bNOT\s+EXISTS\s*\(',
+        'weight': 2,
+        'description': 'WHERE NOT EXISTS condition'
+    },
+
+    # EXISTS patterns (standalone)
+    'exists_condition': {
+        'pattern': r'\bEXISTS\s*\(',
+        'weight': 2,
+        'description': 'EXISTS condition'
+    },
+    'not_exists_condition': {
+        'pattern': r'\bNOT\s+EXISTS\s*\(',
+        'weight': 2,
+        'description': 'NOT EXISTS condition'
+    },
+
+    # HAVING clauses
+    'having_clause': {
+        'pattern': r'\bHAVING\s+([^G;]+)',
+        'weight': 2,
+        'description': 'HAVING condition'
+    },
+
+    # JOIN conditions
+    'inner_join': {
+        'pattern': r'\bINNER\s+JOIN\s+.*?\bON\s+([^W;]+)',
+        'weight': 1,
+        'description': 'INNER JOIN condition'
+    },
+    'left_join': {
+        'pattern': r'\bLEFT\s+JOIN\s+.*?\bON\s+([^W;]+)',
+        'weight': 1,
+        'description': 'LEFT JOIN condition'
+    },
+    'right_join': {
+        'pattern': r'\bRIGHT\s+JOIN\s+.*?\bON\s+([^W;]+)',
+        'weight': 1,
+        'description': 'RIGHT JOIN condition'
+    },
+
+    # Exception handling
+    'try_catch': {
+        'pattern': r'\bBEGIN\s+TRY\b',
+        'weight': 2,
+        'description': 'TRY-CATCH block'
+    },
+    'raiserror': {
+        'pattern': r'\bRAISERROR\s*\(',
+        'weight': 1,
+        'description': 'Error raising condition'
+    },
+
+    # Dynamic conditions
+    'dynamic_sql': {
+        'pattern': r'\bEXEC\s*\(\s*@',
+        'weight': 3,
+        'description': 'Dynamic SQL execution'
+    },
+
+    # Subquery conditions
+    'subquery': {
+        'pattern': r'\(\s*SELECT\s+.*?\bWHERE\b',
+        'weight': 2,
+        'description': 'Subquery with condition'
+    },
+
+    # GOTO statements
+    'goto_statement': {
+        'pattern': r'\bGOTO\s+(\w+)',
+        'weight': 2,
+        'description': 'GOTO statement'
+    },
+
+    # Comparison operators in conditions
+    'comparison_operators': {
+        'pattern': r'\b(=|<>|!=|>|<|>=|<=)\s',
+        'weight': 1,
+        'description': 'Comparison operation'
+    }
+}
+
+# Logical operators that increase condition complexity
+LOGICAL_OPERATORS = ['AND', 'OR', 'NOT', 'BETWEEN', 'LIKE', 'IN', 'EXISTS']
+
+@lru_cache(maxsize=None)
+def decision_pattern_groups() -> List[Tuple[Optional[str], List[Tuple[str, Dict[str, Any], 're.Pattern', Tuple[str, ...]]]]]:
+    """DECISION_PATTERNS compiled on first use and grouped behind keyword prefilters
+
+    Returns [(gate_keyword, [(name, info, regex, extra_keywords)])].
+    """
+    groups = []
+    for pattern_name, pattern_info in DECISION_PATTERNS.items():
+        if pattern_name == 'comparison_operators':
+            flags = re.IGNORECASE
+        else:
+            flags = re.IGNORECASE | re.DOTALL
+        keywords = DECISION_PATTERN_KEYWORDS.get(pattern_name, ())
+        gate = keywords[0] if keywords else None
+        entry = (pattern_name, pattern_info, re.compile(pattern_info['pattern'], flags), keywords[1:])
+        
+        if groups and gate is not None and groups[-1][0] == gate:
+            groups[-1][1].append(entry)
+        else:
+            groups.append((gate, [entry]))
+    return groups
+
+@lru_cache(maxsize=None)
+def logical_operator_re() -> 're.Pattern':
+    """One alternation matching any LOGICAL_OPERATORS word"""
+    return re.compile(r'\b(?:' + '|'.join(re.escape(op) for op in LOGICAL_OPERATORS) + r')\b')
 
 @dataclass
 class DecisionPoint:
@@ -28,152 +243,6 @@ class DecisionPoint:
 class DecisionPointsAnalyzer:
     """Analyzes SQL code to identify and categorize decision points"""
     
-    def __init__(self):
-        # Decision point patterns with complexity weights
-        self.decision_patterns = {
-            # IF statements and conditionals
-            'if_statement': {
-                'pattern': r'\bIF\s+([^B]+?)\s+BEGIN',
-                'weight': 2,
-                'description': 'IF conditional block'
-            },
-            'if_else': {
-                'pattern': r'\bIF\s+([^B]+?)\s+ELSE',
-                'weight': 1,
-                'description': 'IF-ELSE branch'
-            },
-            'else_if': {
-                'pattern': r'\bELSE\s+IF\s+([^B]+?)',
-                'weight': 1,
-                'description': 'ELSE IF branch'
-            },
-            
-            # CASE statements
-            'case_when': {
-                'pattern': r'\bCASE\s+.*?\bWHEN\s+([^T]+?)\s+THEN',
-                'weight': 1,
-                'description': 'CASE WHEN condition'
-            },
-            'case_expression': {
-                'pattern': r'\bCASE\s+(\w+)\s+WHEN',
-                'weight': 2,
-                'description': 'CASE expression'
-            },
-            
-            # WHILE and loop conditions
-            'while_loop': {
-                'pattern': r'\bWHILE\s+([^B]+?)\s+BEGIN',
-                'weight': 3,
-                'description': 'WHILE loop condition'
-            },
-            
-            # Complex WHERE clauses
-            'where_and': {
-                'pattern': r'\bWHERE\s+.*?\bAND\b',
-                'weight': 1,
-                'description': 'WHERE clause with AND'
-            },
-            'where_or': {
-                'pattern': r'\bWHERE\s+.*?\bOR\b',
-                'weight': 2,
-                'description': 'WHERE clause with OR'
-            },
-            'where_in': {
-                'pattern': r'\bWHERE\s+.*?\bIN\s*\(',
-                'weight': 1,
-                'description': 'WHERE IN condition'
-            },
-            'where_exists': {
-                'pattern': r'\bWHERE\s+.*?\bEXISTS\s*\(',
-                'weight': 2,
-                'description': 'WHERE EXISTS condition'
-            },
-            'where_not_exists': {
-                'pattern': r'\bWHERE\s+.*?\bNOT\s+EXISTS\s*\(',
-                'weight': 2,
-                'description': 'WHERE NOT EXISTS condition'
-            },
-            
-            # EXISTS patterns (standalone)
-            'exists_condition': {
-                'pattern': r'\bEXISTS\s*\(',
-                'weight': 2,
-                'description': 'EXISTS condition'
-            },
-            'not_exists_condition': {
-                'pattern': r'\bNOT\s+EXISTS\s*\(',
-                'weight': 2,
-                'description': 'NOT EXISTS condition'
-            },
-            
-            # HAVING clauses
-            'having_clause': {
-                'pattern': r'\bHAVING\s+([^G;]+)',
-                'weight': 2,
-                'description': 'HAVING condition'
-            },
-            
-            # JOIN conditions
-            'inner_join': {
-                'pattern': r'\bINNER\s+JOIN\s+.*?\bON\s+([^W;]+)',
-                'weight': 1,
-                'description': 'INNER JOIN condition'
-            },
-            'left_join': {
-                'pattern': r'\bLEFT\s+JOIN\s+.*?\bON\s+([^W;]+)',
-                'weight': 1,
-                'description': 'LEFT JOIN condition'
-            },
-            'right_join': {
-                'pattern': r'\bRIGHT\s+JOIN\s+.*?\bON\s+([^W;]+)',
-                'weight': 1,
-                'description': 'RIGHT JOIN condition'
-            },
-            
-            # Exception handling
-            'try_catch': {
-                'pattern': r'\bBEGIN\s+TRY\b',
-                'weight': 2,
-                'description': 'TRY-CATCH block'
-            },
-            'raiserror': {
-                'pattern': r'\bRAISERROR\s*\(',
-                'weight': 1,
-                'description': 'Error raising condition'
-            },
-            
-            # Dynamic conditions
-            'dynamic_sql': {
-                'pattern': r'\bEXEC\s*\(\s*@',
-                'weight': 3,
-                'description': 'Dynamic SQL execution'
-            },
-            
-            # Subquery conditions
-            'subquery': {
-                'pattern': r'\(\s*SELECT\s+.*?\bWHERE\b',
-                'weight': 2,
-                'description': 'Subquery with condition'
-            },
-            
-            # GOTO statements
-            'goto_statement': {
-                'pattern': r'\bGOTO\s+(\w+)',
-                'weight': 2,
-                'description': 'GOTO statement'
-            },
-            
-            # Comparison operators in conditions
-            'comparison_operators': {
-                'pattern': r'\b(=|<>|!=|>|<|>=|<=)\s',
-                'weight': 1,
-                'description': 'Comparison operation'
-            }
-        }
-        
-        # Logical operators that increase condition complexity
-        self.logical_operators = ['AND', 'OR', 'NOT', 'BETWEEN', 'LIKE', 'IN', 'EXISTS']
-    
     def analyze_file(self, file_path: str) -> Dict[str, Any]:
         """Analyze a SQL file for decision points"""
         try:
@@ -184,9 +253,45 @@ class DecisionPointsAnalyzer:
         
         return self.analyze_content(content, file_path)
     
-    def analyze_content(self, content: str, source_name: str = 'SQL Content') -> Dict[str, Any]:
-        """Analyze SQL content for decision points"""
-        lines = content.split('\n')
+    def analyze_content(self, content: str, source_name: str = 'SQL Content',
+                        model: Optional[LineModel] = None) -> Dict[str, Any]:
+        """Analyze SQL content for decision points
+        
+        model is content's LineModel when another analyzer has already built it.
+        """
+        model = model or build_line_model(content)
+        source = model.source
+        decision_points = self.scan_lines(source.lines, upper_lines=model.upper_lines)
+        
+        report = self._generate_analysis_report(decision_points, source_name)
+        if source.was_split:
+            # Line numbers are virtual; keep the way back to the original text
+            report['split_line_count'] = source.split_line_count
+            for point in report['detailed_points']:
+                point['original_line'], point['original_column'] = source.origin(point['line'])
+        return report
+    
+    def analyze_many(self, contents: Iterable[str], executor: Optional['Executor'] = None,
+                     max_pending: int = None) -> Iterator[Dict[str, Any]]:
+        """Analyze many SQL texts, yielding each report lazily in input order
+
+        See sql_batch.map_ordered for how executor and max_pending are used.
+        """
+        return map_ordered(self.analyze_content, contents, executor, max_pending)
+    
+    def scan_lines(self, lines: List[str],
+                   match_line: Callable[[str], List[Tuple[str, int, int]]] = None,
+                   upper_lines: Optional[List[str]] = None) -> List[DecisionPoint]:
+        """Decision points of a list of lines, tracking procedure boundaries and nesting
+        
+        match_line(upper-cased stripped line) -> [(type, weight, condition_count)]
+        defaults to self.match_line; callers re-scanning edited text can pass a
+        cached version, since the result depends on the line alone. upper_lines
+        are the lines already stripped and upper-cased, if the caller has them.
+        """
+        match_line = match_line or self.match_line
+        if upper_lines is None:
+            upper_lines = [line.strip().upper() for line in lines]
         decision_points = []
         
         # Track nesting levels
@@ -195,14 +300,13 @@ class DecisionPointsAnalyzer:
         current_procedure = None
         procedure_nesting_start = 0
         
-        for line_num, line in enumerate(lines, 1):
-            line_clean = line.strip().upper()
-            original_line = line.strip()
+        for line_num, (line, line_clean) in enumerate(zip(lines, upper_lines), 1):
             
             # Track procedure boundaries
-            if re.search(r'\b(CREATE|ALTER)\s+(PROCEDURE|FUNCTION)\b', line_clean):
+            if (('CREATE' in line_clean or 'ALTER' in line_clean) and
+                    _PROCEDURE_START_RE.search(line_clean)):
                 in_procedure = True
-                proc_match = re.search(r'\b(PROCEDURE|FUNCTION)\s+(\w+)', line_clean)
+                proc_match = _PROCEDURE_NAME_RE.search(line_clean)
                 current_procedure = proc_match.group(2) if proc_match else 'Unknown'
                 nesting_level = 0
                 procedure_nesting_start = 0
@@ -213,7 +317,7 @@ class DecisionPointsAnalyzer:
                 if in_procedure and procedure_nesting_start == 0:
                     procedure_nesting_start = nesting_level
             
-            if re.search(r'\bEND\b', line_clean):
+            if 'END' in line_clean and _END_RE.search(line_clean):
                 if nesting_level > 0:
                     nesting_level -= 1
                 # Only exit procedure if we're back to the procedure's starting level
@@ -226,46 +330,52 @@ class DecisionPointsAnalyzer:
             if not in_procedure:
                 continue
             
-            # Find decision points
-            for pattern_name, pattern_info in self.decision_patterns.items():
-                # Special handling for comparison operators to avoid too many matches
-                if pattern_name == 'comparison_operators':
-                    # Only count comparisons in IF, WHERE, HAVING, ON clauses
-                    if any(keyword in line_clean for keyword in ['IF ', 'WHERE ', 'HAVING ', ' ON ', 'WHEN ']):
-                        matches = re.finditer(pattern_info['pattern'], line_clean, re.IGNORECASE)
-                    else:
-                        continue
-                else:
-                    matches = re.finditer(pattern_info['pattern'], line_clean, re.IGNORECASE | re.DOTALL)
+            original_line = None
+            for pattern_name, weight, condition_count in match_line(line_clean):
+                if original_line is None:
+                    original_line = line.strip()
+                decision_points.append(DecisionPoint(
+                    type=pattern_name,
+                    line_number=line_num,
+                    content=original_line,
+                    complexity_weight=weight,
+                    condition_count=condition_count,
+                    nesting_level=nesting_level,
+                    context=current_procedure or 'Global'
+                ))
+        
+        return decision_points
+    
+    def match_line(self, line_clean: str) -> List[Tuple[str, int, int]]:
+        """(type, weight, condition_count) for every decision point on an upper-cased stripped line"""
+        matches = []
+        # Only try patterns whose keywords are on the line
+        for gate, group in decision_pattern_groups():
+            if gate is not None and gate not in line_clean:
+                continue
+            
+            for pattern_name, pattern_info, regex, extra_keywords in group:
+                if extra_keywords and not all(keyword in line_clean for keyword in extra_keywords):
+                    continue
+                
+                # Special handling for comparison operators to avoid too many matches:
+                # only count comparisons in IF, WHERE, HAVING, ON clauses
+                if (pattern_name == 'comparison_operators' and
+                        not any(keyword in line_clean for keyword in COMPARISON_CONTEXT_KEYWORDS)):
+                    continue
                 
-                for match in matches:
+                for match in regex.finditer(line_clean):
                     condition = match.group(1) if match.groups() else match.group(0)
-                    condition_count = self._count_conditions(condition)
-                    
-                    decision_point = DecisionPoint(
-                        type=pattern_name,
-                        line_number=line_num,
-                        content=original_line,
-                        complexity_weight=pattern_info['weight'],
-                        condition_count=condition_count,
-                        nesting_level=nesting_level,
-                        context=current_procedure or 'Global'
-                    )
-                    
-                    decision_points.append(decision_point)
-        
-        return self._generate_analysis_report(decision_points, source_name)
+                    matches.append((pattern_name, pattern_info['weight'], self._count_conditions(condition)))
+        return matches
     
     def _count_conditions(self, condition_text: str) -> int:
         """Count the number of logical conditions in a condition string"""
         if not condition_text:
             return 1
         
-        count = 1  # Base condition
-        for operator in self.logical_operators:
-            count += len(re.findall(rf'\b{operator}\b', condition_text.upper()))
-        
-        return count
+        # Whole-word operators never overlap, so one alternation counts them all
+        return 1 + len(logical_operator_re().findall(condition_text.upper()))
     
     def _generate_analysis_report(self, decision_points: List[DecisionPoint], source_name: str) -> Dict[str, Any]:
         """Generate comprehensive analysis report"""
@@ -320,7 +430,7 @@ class DecisionPointsAnalyzer:
         # Generate detailed breakdown
         type_summary = {}
         for dp_type, points in by_type.items():
-            pattern_info = self.decision_patterns[dp_type]
+            pattern_info = DECISION_PATTERNS[dp_type]
             type_summary[dp_type] = {
                 'count': len(points),
                 'description': pattern_info['description'],
@@ -357,7 +467,7 @@ class DecisionPointsAnalyzer:
                 {
                     'line': dp.line_number,
                     'type': dp.type,
-                    'description': self.decision_patterns[dp.type]['description'],
+                    'description': DECISION_PATTERNS[dp.type]['description'],
                     'content': dp.content,
                     'condition_count': dp.condition_count,
                     'nesting_level': dp.nesting_level,
@@ -383,52 +493,62 @@ class DecisionPointsAnalyzer:
         else:
             return 'Very High'
     
-    def print_analysis(self, analysis: Dict[str, Any], show_details: bool = False):
-        """Print formatted analysis results"""
+    def format_analysis(self, analysis: Dict[str, Any], show_details: bool = False) -> str:
+        """Analysis results as printable text"""
         if 'error' in analysis:
-            print(f"ERROR: {analysis['error']}")
-            return
+            return f"ERROR: {analysis['error']}"
         
-        print("=" * 80)
-        print(f"DECISION POINTS ANALYSIS: {analysis['source']}")
-        print("=" * 80)
+        lines = []
+        out = lines.append
+        out("=" * 80)
+        out(f"DECISION POINTS ANALYSIS: {analysis['source']}")
+        out("=" * 80)
         
-        print(f"\n📊 SUMMARY:")
-        print(f"  Total Decision Points: {analysis['total_decision_points']}")
-        print(f"  Complexity Score: {analysis['complexity_score']}")
-        print(f"  Complexity Rating: {analysis['complexity_rating']}")
+        out(f"\n📊 SUMMARY:")
+        out(f"  Total Decision Points: {analysis['total_decision_points']}")
+        out(f"  Complexity Score: {analysis['complexity_score']}")
+        out(f"  Complexity Rating: {analysis['complexity_rating']}")
+        if analysis.get('split_line_count'):
+            out(f"  Long Lines Split: {analysis['split_line_count']} (line numbers are virtual)")
         
         metrics = analysis['metrics']
-        print(f"\n📈 METRICS:")
-        print(f"  Max Nesting Level: {metrics['max_nesting_level']}")
-        print(f"  Avg Nesting Level: {metrics['avg_nesting_level']}")
-        print(f"  Avg Conditions per Point: {metrics['avg_conditions_per_point']}")
-        print(f"  Unique Decision Types: {metrics['unique_decision_types']}")
-        print(f"  Procedures Analyzed: {metrics['procedures_analyzed']}")
+        out(f"\n📈 METRICS:")
+        out(f"  Max Nesting Level: {metrics['max_nesting_level']}")
+        out(f"  Avg Nesting Level: {metrics['avg_nesting_level']}")
+        out(f"  Avg Conditions per Point: {metrics['avg_conditions_per_point']}")
+        out(f"  Unique Decision Types: {metrics['unique_decision_types']}")
+        out(f"  Procedures Analyzed: {metrics['procedures_analyzed']}")
         
-        print(f"\n🏷️  DECISION POINT TYPES:")
+        out(f"\n🏷️  DECISION POINT TYPES:")
         for dp_type, info in analysis['decision_point_types'].items():
-            print(f"  {dp_type.upper()}: {info['count']} occurrences")
-            print(f"    └─ {info['description']}")
-            print(f"    └─ Complexity: {info['total_complexity']:.1f} | Lines: {info['lines'][:5]}{'...' if len(info['lines']) > 5 else ''}")
+            out(f"  {dp_type.upper()}: {info['count']} occurrences")
+            out(f"    └─ {info['description']}")
+            out(f"    └─ Complexity: {info['total_complexity']:.1f} | Lines: {info['lines'][:5]}{'...' if len(info['lines']) > 5 else ''}")
         
-        print(f"\n🔧 BY PROCEDURE/FUNCTION:")
+        out(f"\n🔧 BY PROCEDURE/FUNCTION:")
         for context, info in analysis['by_procedure'].items():
-            print(f"  {context}:")
-            print(f"    └─ Decision Points: {info['decision_points']}")
-            print(f"    └─ Complexity Score: {info['complexity_score']}")
-            print(f"    └─ Max Nesting: {info['max_nesting']}")
-            print(f"    └─ Types: {', '.join(info['types_used'])}")
+            out(f"  {context}:")
+            out(f"    └─ Decision Points: {info['decision_points']}")
+            out(f"    └─ Complexity Score: {info['complexity_score']}")
+            out(f"    └─ Max Nesting: {info['max_nesting']}")
+            out(f"    └─ Types: {', '.join(info['types_used'])}")
         
         if show_details:
-            print(f"\n📋 DETAILED BREAKDOWN:")
+            out(f"\n📋 DETAILED BREAKDOWN:")
             for point in analysis['detailed_points']:
-                print(f"  Line {point['line']:3d}: {point['type'].upper()}")
-                print(f"    └─ {point['description']}")
-                print(f"    └─ Context: {point['context']} | Nesting: {point['nesting_level']} | Conditions: {point['condition_count']}")
-                print(f"    └─ Code: {point['content'][:80]}{'...' if len(point['content']) > 80 else ''}")
-                print(f"    └─ Complexity Contribution: {point['complexity_contribution']}")
-                print()
+                origin = f" (original {point['original_line']}:{point['original_column']})" if 'original_line' in point else ''
+                out(f"  Line {point['line']:3d}{origin}: {point['type'].upper()}")
+                out(f"    └─ {point['description']}")
+                out(f"    └─ Context: {point['context']} | Nesting: {point['nesting_level']} | Conditions: {point['condition_count']}")
+                out(f"    └─ Code: {point['content'][:80]}{'...' if len(point['content']) > 80 else ''}")
+                out(f"    └─ Complexity Contribution: {point['complexity_contribution']}")
+                out('')
+        
+        return '\n'.join(lines)
+    
+    def print_analysis(self, analysis: Dict[str, Any], show_details: bool = False):
+        """Print formatted analysis results"""
+        print(self.format_analysis(analysis, show_details))
 
 def main():
     """Main CLI interface"""
@@ -445,7 +565,7 @@ def main():
     file_path = sys.argv[1]
     show_details = '--details' in sys.argv
     
-    if not Path(file_path).exists():
+    if not os.path.exists(file_path):
         print(f"ERROR: File '{file_path}' not found.")
         sys.exit(1)
     
@@ -4,151 +4,144 @@ Simple SQL Formatter that resets indentation from scratch rather than building o
 Formats SQL code with clean, consistent indentation starting from zero while preserving original line spacing.
 """
 
-import re
-from typing import List
+import sys
+from typing import Tuple, Iterable, Iterator, TextIO
+
+from sql_line_classifier import CREATE_PROCEDURE, classify_line, simple_indent_deltas
 
 class SimpleSQLFormatter:
-    """Simple SQL formatter that resets all indentation while preserving original spacing"""
+    """Simple SQL formatter that resets all indentation while preserving original spacing
+
+    Keeps no per-input state on the instance, so it is safe to share between threads.
+    """
     
     def __init__(self, indent_size: int = 4):
         self.indent_size = indent_size
-        self.indent_level = 0
         
     def format_sql(self, sql_content: str) -> str:
         """Format SQL content with clean indentation while preserving original spacing"""
-        lines = sql_content.split('\n')
-        formatted_lines = []
-        self.indent_level = 0
+        return '\n'.join(self.format_stream(sql_content.split('\n')))
+    
+    def format_stream(self, lines: Iterable[str]) -> Iterator[str]:
+        """Format an iterable of lines, yielding formatted lines (without newlines)
+
+        Runs in constant memory: only a count of pending empty lines is buffered,
+        so empty lines at the very end are dropped exactly like format_sql does.
+        """
+        indent_level = 0
+        pending_empty = 0
         
         for line in lines:
-            # Preserve empty lines as they were in the original
+            line = line.rstrip('\r\n')
+            # Preserve empty lines as they were in the original, once we know
+            # more content follows them
             if not line.strip():
-                formatted_lines.append('')
-            else:
-                formatted_line = self._format_line(line.strip())
-                formatted_lines.append(formatted_line)
-        
-        # Only remove trailing empty lines, but preserve all internal spacing
-        while formatted_lines and not formatted_lines[-1].strip():
-            formatted_lines.pop()
-        
-        return '\n'.join(formatted_lines)
+                pending_empty += 1
+                continue
+            
+            while pending_empty:
+                pending_empty -= 1
+                yield ''
+            formatted_line, indent_level = self._format_line(line.strip(), indent_level)
+            yield formatted_line
     
-    def _format_line(self, line: str) -> str:
-        """Format a single line"""
+    # Lines after a shard that its formatting may depend on (the next non-empty line
+    # decides whether trailing empty lines are kept)
+    shard_context_lines = 1
+    
+    def resets_indentation(self, line: str) -> bool:
+        """True if formatting restarts from scratch at this line (CREATE PROCEDURE)"""
+        line = line.strip()
+        if not line or line.startswith('--') or line.startswith('/*') or '*/' in line:
+            return False
+        return bool(classify_line(line) & CREATE_PROCEDURE)
+    
+    def _format_line(self, line: str, indent_level: int) -> Tuple[str, int]:
+        """Format a single line at indent_level; returns it with the level for the next line"""
         if not line:
-            return ''
+            return '', indent_level
+        
+        flags = classify_line(line)
         
         # Handle comments
         if line.startswith('--') or line.startswith('/*') or '*/' in line:
-            return self._indent(line)
+            return (line if flags & CREATE_PROCEDURE else self._indent(line, indent_level)), indent_level
         
         # Handle CREATE PROCEDURE - no indentation
-        if re.search(r'\bCREATE\s+PROCEDURE\b', line, re.IGNORECASE):
-            self.indent_level = 0
-            return line
+        if flags & CREATE_PROCEDURE:
+            return line, 0
         
         # Calculate indentation changes
-        pre_decrease = self._should_decrease_before(line)
-        post_increase = self._should_increase_after(line)
+        pre_change, post_change = simple_indent_deltas(flags)
         
         # Apply pre-decrease (for END, ELSE, etc.)
-        if pre_decrease:
-            self.indent_level -= 1
-            if self.indent_level < 0:
-                self.indent_level = 0
+        if pre_change:
+            indent_level -= 1
+            if indent_level < 0:
+                indent_level = 0
         
         # Format the line with current indentation
-        formatted_line = self._indent(line)
+        formatted_line = self._indent(line, indent_level)
         
         # Apply post-increase (for BEGIN, IF, etc.)
-        if post_increase:
-            self.indent_level += 1
-        
-        return formatted_line
-    
-    def _should_decrease_before(self, line: str) -> bool:
-        """Check if indentation should decrease before this line"""
-        line_upper = line.upper()
-        
-        # END statements (but not END IF, END WHILE, etc.)
-        if re.search(r'\bEND\b(?!\s+(?:IF|WHILE|FOR|TRY|CATCH|CASE))', line_upper):
-            return True
-        
-        # ELSE (but not ELSE IF)
-        if re.search(r'\bELSE\b(?!\s+IF)', line_upper):
-            return True
-            
-        # CATCH
-        if re.search(r'\bCATCH\b', line_upper):
-            return True
-            
-        return False
-    
-    def _should_increase_after(self, line: str) -> bool:
-        """Check if indentation should increase after this line"""
-        line_upper = line.upper()
-        
-        # BEGIN
-        if re.search(r'\bBEGIN\b', line_upper):
-            return True
-        
-        # IF (but only if it seems to be a block IF, not single-line)
-        if re.search(r'\bIF\b', line_upper):
-            # If it doesn't contain SET, SELECT, etc. on the same line, it's likely a block IF
-            if not re.search(r'\bIF\b.*\b(SET|SELECT|RETURN|GOTO)\b', line_upper):
-                return True
-        
-        # WHILE, FOR, TRY
-        if re.search(r'\b(WHILE|FOR|TRY)\b', line_upper):
-            return True
-            
-        # ELSE (increase after ELSE)
-        if re.search(r'\bELSE\b', line_upper):
-            return True
-            
-        # CATCH
-        if re.search(r'\bCATCH\b', line_upper):
-            return True
+        if post_change:
+            indent_level += 1
         
-        return False
+        return formatted_line, indent_level
     
-    def _indent(self, line: str) -> str:
+    def _indent(self, line: str, indent_level: int) -> str:
         """Apply indentation to a line"""
-        # For CREATE PROCEDURE, don't indent
-        if re.search(r'\bCREATE\s+PROCEDURE\b', line, re.IGNORECASE):
-            return line
-            
-        # For procedure content, start with base indentation
-        indent_spaces = ' ' * (self.indent_level * self.indent_size)
-        return indent_spaces + line
+        return ' ' * (indent_level * self.indent_size) + line
+
+def write_lines(lines: Iterable[str], out: TextIO, batch_size: int = 4096):
+    """Write formatted lines separated (not terminated) by newlines, as format_sql joins them"""
+    separator = ''
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= batch_size:
+            out.write(separator + '\n'.join(batch))
+            separator = '\n'
+            batch = []
+    if batch:
+        out.write(separator + '\n'.join(batch))
+
+def format_sql_file(input_file: str, output_file: str = None, workers: int = None) -> str:
+    """Format a SQL file with clean indentation
 
-def format_sql_file(input_file: str, output_file: str = None) -> str:
-    """Format a SQL file with clean indentation"""
+    Large multi-procedure files are formatted one procedure shard per process
+    (workers=None picks automatically, workers=1 forces a sequential stream).
+    """
+    # Process pools are only needed here, so keep them out of import time
+    from sql_format_parallel import format_lines_parallel, use_parallel
+    
     if output_file is None:
         base_name = input_file.replace('.sql', '')
         output_file = f"{base_name}_clean_formatted.sql"
     
-    # Read input file
-    with open(input_file, 'r', encoding='utf-8', errors='ignore') as f:
-        content = f.read()
-    
-    # Format content
     formatter = SimpleSQLFormatter(indent_size=4)
-    formatted_content = formatter.format_sql(content)
-    
-    # Write output file
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(formatted_content)
+    if use_parallel(input_file, workers):
+        with open(input_file, 'r', encoding='utf-8', errors='ignore') as f:
+            lines = f.read().split('\n')
+        with open(output_file, 'w', encoding='utf-8') as f:
+            write_lines(format_lines_parallel(formatter, lines, workers), f)
+    else:
+        # Stream input to output so file size never matters
+        with open(input_file, 'r', encoding='utf-8', errors='ignore') as f_in, \
+                open(output_file, 'w', encoding='utf-8') as f_out:
+            write_lines(formatter.format_stream(f_in), f_out)
     
     print(f"Clean formatted SQL written to: {output_file}")
     return output_file
 
 if __name__ == "__main__":
-    import sys
     if len(sys.argv) != 2:
         print("Usage: python simple_sql_formatter.py <input_file.sql>")
+        print("       python simple_sql_formatter.py - < input.sql > output.sql")
         sys.exit(1)
     
     input_file = sys.argv[1]
-    format_sql_file(input_file) 
\ No newline at end of file
+    if input_file == '-':
+        write_lines(SimpleSQLFormatter(indent_size=4).format_stream(sys.stdin), sys.stdout)
+    else:
+        format_sql_file(input_file)
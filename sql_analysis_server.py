@@ -0,0 +1,533 @@
+#!/usr/bin/env python3
+"""
+Warm SQL Analysis Server
+Keeps the analyzers loaded in preforked worker processes behind an asyncio front end
+on a Unix socket or a localhost TCP port, so editor tools and bots get results without
+paying interpreter startup, imports and pattern setup on every request.
+
+Protocol: newline-delimited JSON in both directions.
+
+Request:
+    {"id": 1, "op": "chunks" | "analysis" | "decision_points" | "stats",
+     "sql": "<procedure text>" or "path": "<file>",
+     "options": {...}, "priority": "interactive" | "bulk"}
+
+Responses (streamed, tagged with the request id):
+    {"id": 1, "event": "chunk", "data": {...}}        one per chunk        (chunks)
+    {"id": 1, "event": "section", "name": ..., "data": ...}   per section (analysis)
+    {"id": 1, "event": "result", "data": {...}}                (decision_points, stats)
+    {"id": 1, "event": "done", "timings": {...}, "deduplicated": false}
+    {"id": 1, "event": "error", "error": "..."}
+
+Identical requests in flight at the same time (same op, options and content hash)
+share one computation. Interactive requests are dispatched before bulk ones.
+"""
+
+import os
+import sys
+import json
+import signal
+import time
+import asyncio
+import hashlib
+import threading
+import contextlib
+import multiprocessing
+from collections import deque
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+
+OPERATIONS = ('chunks', 'analysis', 'decision_points')
+PRIORITIES = ('interactive', 'bulk')
+
+# Dispatch one waiting bulk job after this many interactive ones in a row
+BULK_STARVATION_LIMIT = 8
+
+# Latency samples kept per phase for the stats endpoint
+LATENCY_WINDOW = 1000
+
+class _WarmAnalyzers:
+    """Analyzer instances created once per worker and reused across requests"""
+
+    def __init__(self):
+        from sql_analyzer import UniversalSQLAnalyzer
+        from decision_points_analyzer import DecisionPointsAnalyzer
+        import adaptive_chunked_analyzer
+
+        self.universal = UniversalSQLAnalyzer()
+        self.decision_points = DecisionPointsAnalyzer()
+        self.adaptive = adaptive_chunked_analyzer
+        self._chunkers = {}
+
+    def chunker(self, options: Dict[str, Any]):
+        """AdaptiveSQLAnalyzer for a set of chunking options, cached by those options"""
+        key = json.dumps(options, sort_keys=True)
+        if key not in self._chunkers:
+            self._chunkers[key] = self.adaptive.AdaptiveSQLAnalyzer(
+                strategy=self.adaptive.ChunkStrategy(options.get('strategy', 'hybrid')),
+                target_chunk_size=options.get('target_size', 60),
+                min_chunk_size=options.get('min_size', 10),
+                max_chunk_size=options.get('max_size', 120),
+                force_subdivision_threshold=options.get('force_subdivision', 200),
+                max_complexity_per_chunk=options.get('max_complexity', 50),
+                max_chunk_tokens=options.get('max_tokens', self.adaptive.DEFAULT_MAX_CHUNK_TOKENS),
+                token_estimator=self.adaptive.make_token_estimator(options.get('tokenizer', 'estimate'))
+            )
+        return self._chunkers[key]
+
+def _run_job(warm: _WarmAnalyzers, op: str, sql: str, source: str,
+             options: Dict[str, Any], timings: Dict[str, float]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Yield (event, payload) pairs for one job, recording per-phase timings in ms"""
+    start = time.perf_counter()
+    if op == 'chunks':
+        # The chunker reports progress on stdout; keep the worker quiet
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            chunks = warm.chunker(options).chunk_procedure(sql, auto_format=options.get('auto_format', True))
+        timings['chunk'] = (time.perf_counter() - start) * 1000
+        for chunk in chunks:
+            yield 'chunk', {'data': warm.adaptive.chunk_to_dict(chunk)}
+
+    elif op == 'analysis':
+        from sql_analyzer import section_to_json
+        result = warm.universal.analyze_procedure(sql, sections=options.get('sections'))
+        for name in result:
+            section_start = time.perf_counter()
+            value = section_to_json(result[name])
+            timings[name] = (time.perf_counter() - section_start) * 1000
+            yield 'section', {'name': name, 'data': value}
+
+    elif op == 'decision_points':
+        report = warm.decision_points.analyze_content(sql, source)
+        timings['decision_points'] = (time.perf_counter() - start) * 1000
+        yield 'result', {'data': report}
+
+    else:
+        raise ValueError(f"Unknown operation: {op}")
+
+def _worker_main(conn):
+    """Worker process loop: receive jobs, stream events back over the pipe"""
+    warm = _WarmAnalyzers()
+    conn.send(('ready', None, None))
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        job_key, op, sql, source, options = message
+        timings = {}
+        try:
+            for event, payload in _run_job(warm, op, sql, source, options, timings):
+                conn.send((job_key, event, payload))
+            conn.send((job_key, 'done', {'timings': timings}))
+        except Exception as e:
+            conn.send((job_key, 'error', {'error': f"{type(e).__name__}: {e}"}))
+
+@dataclass
+class _Job:
+    """One computation, possibly shared by several identical requests"""
+    key: str
+    op: str
+    sql: str
+    source: str
+    options: Dict[str, Any]
+    priority: str
+    created: float = field(default_factory=time.perf_counter)
+    dispatched: float = 0.0
+    events: List[Dict[str, Any]] = field(default_factory=list)
+    subscribers: List[asyncio.Queue] = field(default_factory=list)
+    finished: bool = False
+
+class _Worker:
+    """A preforked worker process and the thread relaying its replies into the loop
+
+    context is the multiprocessing context to start it with; by default the
+    platform's, which forks on Linux.
+    """
+
+    def __init__(self, index: int, context=None):
+        self.index = index
+        self.job = None
+        self.ready = False
+        context = context or multiprocessing
+        conn, child_conn = context.Pipe()
+        self.conn = conn
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.thread = None
+
+    def start_relay(self, server: 'AnalysisServer'):
+        self.thread = threading.Thread(target=self._relay, args=(server,), daemon=True)
+        self.thread.start()
+
+    def _relay(self, server: 'AnalysisServer'):
+        loop = server.loop
+        while True:
+            try:
+                message = self.conn.recv()
+            except (EOFError, OSError):
+                message = None
+            try:
+                if message is None:
+                    loop.call_soon_threadsafe(server._on_worker_exit, self)
+                    return
+                loop.call_soon_threadsafe(server._on_worker_message, self, message)
+            except RuntimeError:
+                return      # the loop has already closed during shutdown
+
+class _LatencyStats:
+    """Rolling latency samples per phase"""
+
+    def __init__(self):
+        self.samples = {}
+        self.counts = {}
+
+    def add(self, phase: str, milliseconds: float):
+        self.samples.setdefault(phase, deque(maxlen=LATENCY_WINDOW)).append(milliseconds)
+        self.counts[phase] = self.counts.get(phase, 0) + 1
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        result = {}
+        for phase, samples in self.samples.items():
+            ordered = sorted(samples)
+            result[phase] = {
+                'count': self.counts[phase],
+                'mean_ms': round(sum(ordered) / len(ordered), 2),
+                'p50_ms': round(ordered[len(ordered) // 2], 2),
+                'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+                'max_ms': round(ordered[-1], 2),
+            }
+        return result
+
+class AnalysisServer:
+    """Asyncio front end dispatching deduplicated, prioritised jobs to warm workers"""
+
+    def __init__(self, workers: int = None):
+        self.worker_count = workers or os.cpu_count() or 1
+        self.workers = []
+        self.lanes = {priority: deque() for priority in PRIORITIES}
+        self.jobs = {}                  # key -> queued or running job
+        self.latency = _LatencyStats()
+        self.started = time.time()
+        self.requests = 0
+        self.deduplicated = 0
+        self._interactive_streak = 0
+        self.loop = None
+        self.closing = False
+
+    async def serve(self, socket_path: str = None, host: str = '127.0.0.1', port: int = None):
+        """Start the workers and serve until cancelled"""
+        self.loop = asyncio.get_running_loop()
+        # Import the analyzers before forking so workers share the loaded modules,
+        # and fork every worker before any relay thread exists
+        import sql_analyzer, decision_points_analyzer, adaptive_chunked_analyzer  # noqa: F401
+        self.workers = [_Worker(i) for i in range(self.worker_count)]
+        for worker in self.workers:
+            worker.start_relay(self)
+        if socket_path:
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+            server = await asyncio.start_unix_server(self._handle_client, path=socket_path, limit=1 << 30)
+            where = socket_path
+        else:
+            server = await asyncio.start_server(self._handle_client, host=host, port=port, limit=1 << 30)
+            where = f"{host}:{server.sockets[0].getsockname()[1]}"
+        print(f"SQL analysis server listening on {where} with {self.worker_count} workers", file=sys.stderr)
+        # Treat SIGTERM like Ctrl-C so the workers are stopped and the socket removed
+        serving = asyncio.current_task()
+        self.loop.add_signal_handler(signal.SIGTERM, serving.cancel)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.shutdown()
+            if socket_path and os.path.exists(socket_path):
+                os.unlink(socket_path)
+
+    def shutdown(self):
+        """Stop all worker processes"""
+        self.closing = True
+        for worker in self.workers:
+            with contextlib.suppress(OSError):
+                worker.conn.send(None)
+        for worker in self.workers:
+            worker.process.join(timeout=2)
+            if worker.process.is_alive():
+                worker.process.terminate()
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        write_lock = asyncio.Lock()
+        tasks = set()
+
+        async def send(message: Dict[str, Any]):
+            async with write_lock:
+                writer.write(json.dumps(message).encode('utf-8') + b'\n')
+                await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                # Requests on one connection run concurrently; replies carry the id
+                task = asyncio.create_task(self._handle_request(line, send))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+            with contextlib.suppress(Exception):
+                await writer.wait_closed()
+
+    async def _handle_request(self, line: bytes, send):
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+            request_id = request.get('id')
+            op = request.get('op')
+            if op == 'stats':
+                await send({'id': request_id, 'event': 'result', 'data': self.stats()})
+                await send({'id': request_id, 'event': 'done', 'timings': {}, 'deduplicated': False})
+                return
+            if op not in OPERATIONS:
+                raise ValueError(f"op must be one of: stats, {', '.join(OPERATIONS)}")
+            priority = request.get('priority', 'bulk')
+            if priority not in PRIORITIES:
+                raise ValueError(f"priority must be one of: {', '.join(PRIORITIES)}")
+            options = request.get('options')
+            if options is None:
+                options = {}
+            elif not isinstance(options, dict):
+                raise ValueError("options must be a JSON object")
+
+            received = time.perf_counter()
+            if 'sql' in request:
+                sql, source = request['sql'], request.get('source', 'SQL Content')
+                if not isinstance(sql, str) or not isinstance(source, str):
+                    raise ValueError("sql and source must be strings")
+            elif 'path' in request:
+                source = request['path']
+                if not isinstance(source, str):
+                    raise ValueError("path must be a string")
+                sql = await self.loop.run_in_executor(None, _read_file, source)
+                self.latency.add('read', (time.perf_counter() - received) * 1000)
+            else:
+                raise ValueError("request needs 'sql' or 'path'")
+        except (ValueError, OSError) as e:
+            await send({'id': request_id, 'event': 'error', 'error': str(e)})
+            return
+
+        job = queue = None
+        try:
+            self.requests += 1
+            job, shared = self._submit(op, sql, source, options, priority)
+            queue = asyncio.Queue()
+            # Replay what an already-running identical job has produced, then follow it
+            for event in job.events:
+                queue.put_nowait(event)
+            if not job.finished:
+                job.subscribers.append(queue)
+
+            while True:
+                event = await queue.get()
+                reply = dict(event, id=request_id)
+                if reply['event'] == 'done':
+                    reply['deduplicated'] = shared
+                    reply['timings'] = dict(reply.get('timings', {}),
+                                            total=round((time.perf_counter() - received) * 1000, 2))
+                await send(reply)
+                if reply['event'] in ('done', 'error'):
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            raise
+        except Exception as e:
+            # Never leave the client waiting for a done / error event
+            with contextlib.suppress(ConnectionError):
+                await send({'id': request_id, 'event': 'error', 'error': f"{type(e).__name__}: {e}"})
+        finally:
+            if job is not None and queue in job.subscribers:
+                job.subscribers.remove(queue)
+
+    def _submit(self, op: str, sql: str, source: str, options: Dict[str, Any],
+                priority: str) -> Tuple[_Job, bool]:
+        """Queue a job, or join an identical one already queued or running"""
+        digest = hashlib.sha256()
+        digest.update(json.dumps([op, options], sort_keys=True).encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(sql.encode('utf-8', errors='surrogatepass'))
+        if op == 'decision_points':
+            digest.update(source.encode('utf-8', errors='surrogatepass'))  # echoed in the report
+        key = digest.hexdigest()
+
+        job = self.jobs.get(key)
+        if job is not None:
+            self.deduplicated += 1
+            # An interactive caller promotes a still-queued bulk job
+            if priority == 'interactive' and job.priority == 'bulk' and job in self.lanes['bulk']:
+                self.lanes['bulk'].remove(job)
+                self.lanes['interactive'].append(job)
+                job.priority = 'interactive'
+            return job, True
+
+        job = _Job(key, op, sql, source, options, priority)
+        self.jobs[key] = job
+        self.lanes[priority].append(job)
+        self._dispatch()
+        return job, False
+
+    def _next_job(self) -> Optional[_Job]:
+        interactive, bulk = self.lanes['interactive'], self.lanes['bulk']
+        if interactive and (not bulk or self._interactive_streak < BULK_STARVATION_LIMIT):
+            self._interactive_streak += 1
+            return interactive.popleft()
+        if bulk:
+            self._interactive_streak = 0
+            return bulk.popleft()
+        return None
+
+    def _dispatch(self):
+        for worker in self.workers:
+            if not worker.ready or worker.job is not None:
+                continue
+            job = self._next_job()
+            if job is None:
+                return
+            try:
+                worker.conn.send((job.key, job.op, job.sql, job.source, job.options))
+            except OSError:
+                # The worker is gone; its relay thread will report the exit
+                worker.ready = False
+                self.lanes[job.priority].appendleft(job)
+                continue
+            worker.job = job
+            job.dispatched = time.perf_counter()
+            self.latency.add('queue', (job.dispatched - job.created) * 1000)
+
+    def _publish(self, job: _Job, event: Dict[str, Any]):
+        job.events.append(event)
+        for queue in job.subscribers:
+            queue.put_nowait(event)
+
+    def _finish(self, job: _Job):
+        job.finished = True
+        job.subscribers.clear()
+        if self.jobs.get(job.key) is job:
+            del self.jobs[job.key]
+
+    def _on_worker_message(self, worker: _Worker, message):
+        job_key, event, payload = message
+        if job_key == 'ready':
+            worker.ready = True
+            self._dispatch()
+            return
+
+        job = worker.job
+        if job is None or job.key != job_key:
+            return
+        self._publish(job, dict(payload, event=event))
+        if event in ('done', 'error'):
+            if event == 'done':
+                self.latency.add('compute', (time.perf_counter() - job.dispatched) * 1000)
+                for phase, milliseconds in payload.get('timings', {}).items():
+                    self.latency.add(f"{job.op}.{phase}", milliseconds)
+            self.latency.add('total', (time.perf_counter() - job.created) * 1000)
+            self._finish(job)
+            worker.job = None
+            self._dispatch()
+
+    def _on_worker_exit(self, worker: _Worker):
+        """A worker died: fail its job and start a replacement"""
+        job = worker.job
+        if job is not None and not job.finished:
+            self._publish(job, {'event': 'error', 'error': 'worker process exited'})
+            self._finish(job)
+        if worker in self.workers and not self.closing:
+            index = self.workers.index(worker)
+            worker.process.join(timeout=1)
+            # Relay threads are running now, so forking this process could copy a held
+            # lock into the child; replacements start from a fresh interpreter instead
+            replacement = _Worker(worker.index, multiprocessing.get_context('spawn'))
+            replacement.start_relay(self)
+            self.workers[index] = replacement
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, worker state and per-phase latency"""
+        return {
+            'uptime_seconds': round(time.time() - self.started, 1),
+            'workers': self.worker_count,
+            'busy_workers': sum(1 for worker in self.workers if worker.job is not None),
+            'queue_depth': {priority: len(lane) for priority, lane in self.lanes.items()},
+            'jobs_in_flight': len(self.jobs),
+            'requests': self.requests,
+            'deduplicated_requests': self.deduplicated,
+            'latency': self.latency.summary(),
+        }
+
+def _read_file(path: str) -> str:
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        return f.read()
+
+def request(message: Dict[str, Any], socket_path: str = None, host: str = '127.0.0.1',
+            port: int = None) -> Iterator[Dict[str, Any]]:
+    """Send one request and yield its streamed replies until done or error"""
+    import socket
+
+    if socket_path:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(socket_path)
+    else:
+        sock = socket.create_connection((host, port))
+    with sock, sock.makefile('rb') as replies:
+        sock.sendall(json.dumps(message).encode('utf-8') + b'\n')
+        for line in replies:
+            reply = json.loads(line)
+            yield reply
+            if reply.get('event') in ('done', 'error'):
+                break
+
+def main():
+    """Run the server, or send a single request to a running one"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Warm SQL analysis server (newline-delimited JSON over a local socket)')
+    parser.add_argument('--socket', help='Unix socket path to listen on / connect to')
+    parser.add_argument('--port', type=int, help='Localhost TCP port to listen on / connect to')
+    parser.add_argument('--workers', type=int, default=None, help='Preforked worker processes (default: CPU count)')
+    parser.add_argument('--query', nargs=2, metavar=('OP', 'SQL_FILE'),
+                        help='Client mode: send one request (chunks, analysis, decision_points) and print replies')
+    parser.add_argument('--stats', action='store_true', help='Client mode: print server statistics')
+    parser.add_argument('--priority', choices=PRIORITIES, default='interactive', help='Client mode: request lane')
+
+    args = parser.parse_args()
+    if not args.socket and args.port is None:
+        parser.error('one of --socket or --port is required')
+
+    if args.query or args.stats:
+        if args.stats:
+            message = {'id': 1, 'op': 'stats'}
+        else:
+            message = {'id': 1, 'op': args.query[0], 'path': os.path.abspath(args.query[1]),
+                       'priority': args.priority}
+        for reply in request(message, socket_path=args.socket, port=args.port):
+            print(json.dumps(reply))
+        return
+
+    server = AnalysisServer(workers=args.workers)
+    try:
+        asyncio.run(server.serve(socket_path=args.socket, port=args.port))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,166 @@ Works across all business domains and SQL variants to extract patterns and struc
 
 import re
 import json
-from typing import List, Dict, Any, Tuple
+from typing import TYPE_CHECKING, List, Dict, Any, Tuple, Iterable, Iterator, Optional
+from collections.abc import Mapping
 from dataclasses import dataclass
-from pathlib import Path
+from functools import lru_cache, partial
+
+from sql_batch import map_ordered
+from sql_line_model import LineModel, build_line_model
+from sql_line_splitter import VirtualSource
+from sql_watch import add_watch_arguments, watch_and_regenerate
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+
+# Result sections in report order; 'summary' pulls in its inputs on demand
+ANALYSIS_SECTIONS = (
+    'procedure_info',
+    'control_flows',
+    'business_rules',
+    'data_operations',
+    'complexity_analysis',
+    'structure_analysis',
+    'decision_points',
+    'summary',
+)
+
+# Sections whose entries carry line numbers, which refer to virtual lines when
+# over-long lines were split
+LINE_NUMBERED_SECTIONS = ('control_flows', 'business_rules', 'data_operations', 'decision_points')
+
+# Universal SQL patterns that work across all domains
+UNIVERSAL_PATTERNS = {
+    'validation_patterns': [
+        (r'(?:IF|WHERE)\s+.*(?:IS\s+NULL|IS\s+NOT\s+NULL)', 'null_validation', 'Null value validation'),
+        (r'(?:IF|WHERE)\s+.*(?:<=|>=|<|>|=|<>|!=)\s*[0-9]+', 'threshold_validation', 'Numeric threshold validation'),
+        (r'(?:IF|WHERE)\s+.*EXISTS\s*\(', 'existence_validation', 'Record existence validation'),
+        (r'(?:IF|WHERE)\s+.*NOT\s+EXISTS\s*\(', 'non_existence_validation', 'Record non-existence validation'),
+        (r'(?:IF|WHERE)\s+.*\bLEN\s*\(.*\)\s*[<>=]', 'length_validation', 'String length validation'),
+        (r'(?:IF|WHERE)\s+.*\bISNULL\s*\(', 'null_handling', 'Null value handling'),
+        (r'(?:IF|WHERE)\s+.*\bISDATE\s*\(', 'date_validation', 'Date format validation'),
+        (r'(?:IF|WHERE)\s+.*\bISNUMERIC\s*\(', 'numeric_validation', 'Numeric format validation'),
+    ],
+    'calculation_patterns': [
+        (r'SET\s+@\w+\s*=.*[+\-*/]', 'arithmetic_calculation', 'Arithmetic calculation'),
+        (r'(?:SUM|COUNT|AVG|MIN|MAX|STDEV)\s*\(', 'aggregate_calculation', 'Aggregate calculation'),
+        (r'CASE\s+WHEN.*THEN.*END', 'conditional_calculation', 'Conditional calculation'),
+        (r'(?:ROUND|CEILING|FLOOR|ABS)\s*\(', 'mathematical_function', 'Mathematical function'),
+        (r'(?:DATEDIFF|DATEADD|GETDATE|CURRENT_TIMESTAMP)', 'date_calculation', 'Date/time calculation'),
+        (r'(?:SUBSTRING|LEFT|RIGHT|CHARINDEX|PATINDEX)', 'string_manipulation', 'String manipulation'),
+    ],
+    'transaction_patterns': [
+        (r'BEGIN\s+TRANSACTION', 'transaction_start', 'Transaction initiation'),
+        (r'COMMIT\s+TRANSACTION', 'transaction_commit', 'Transaction commit'),
+        (r'ROLLBACK\s+TRANSACTION', 'transaction_rollback', 'Transaction rollback'),
+        (r'SAVE\s+TRANSACTION', 'transaction_savepoint', 'Transaction savepoint'),
+        (r'SET\s+XACT_ABORT', 'transaction_control', 'Transaction abort control'),
+    ],
+    'error_handling_patterns': [
+        (r'BEGIN\s+TRY', 'try_block', 'Error handling try block'),
+        (r'BEGIN\s+CATCH', 'catch_block', 'Error handling catch block'),
+        (r'RAISERROR\s*\(', 'error_raising', 'Error message raising'),
+        (r'THROW\s+', 'error_throwing', 'Exception throwing'),
+        (r'@@ERROR', 'error_checking', 'Error status checking'),
+        (r'ERROR_(?:MESSAGE|NUMBER|SEVERITY|STATE|PROCEDURE|LINE)\s*\(\)', 'error_info', 'Error information retrieval'),
+    ],
+    'performance_patterns': [
+        (r'SET\s+NOCOUNT\s+(?:ON|OFF)', 'performance_tuning', 'Row count optimization'),
+        (r'WITH\s*\((?:NOLOCK|READUNCOMMITTED)', 'isolation_hint', 'Isolation level hint'),
+        (r'OPTION\s*\(.*\)', 'query_hint', 'Query optimization hint'),
+        (r'INDEX\s*=\s*', 'index_hint', 'Index usage hint'),
+    ],
+    'security_patterns': [
+        (r'QUOTENAME\s*\(', 'sql_injection_protection', 'SQL injection protection'),
+        (r'sp_executesql', 'parameterized_sql', 'Parameterized dynamic SQL'),
+        (r'HAS_PERMS_BY_NAME\s*\(', 'permission_check', 'Permission validation'),
+        (r'IS_MEMBER\s*\(', 'role_check', 'Role membership check'),
+    ]
+}
+
+# Business logic patterns for categorizing decision points
+BUSINESS_LOGIC_PATTERNS = {
+    'validation_logic': [
+        r'IS\s+NULL', r'IS\s+NOT\s+NULL', r'LEN\s*\(', r'EXISTS\s*\(',
+        r'NOT\s+EXISTS', r'<=|>=|<|>|=|<>|!=', r'ISNULL\s*\(',
+        r'ISDATE\s*\(', r'ISNUMERIC\s*\(', r'@\w+\s*IS\s+NULL'
+    ],
+    'pricing_logic': [
+        r'Price|Cost|Amount|Discount|Fee|Rate|Charge|Total',
+        r'CustomerType|VIP|Corporate|Wholesale', r'Volume|Quantity',
+        r'Seasonal|Holiday|Promotion|Loyalty', r'Tax|Shipping'
+    ],
+    'order_processing': [
+        r'Order|Payment|Fraud|Status|Workflow|Process',
+        r'Credit|Limit|Balance|Approval', r'Rush|Priority',
+        r'Confirmation|Notification', r'Backorder|Fulfillment'
+    ],
+    'inventory_management': [
+        r'Inventory|Stock|Warehouse|Allocation|Reserve',
+        r'Available|Quantity|Transfer|Restock', r'Product|Item'
+    ],
+    'customer_management': [
+        r'Customer|Account|Profile|Status|Tier',
+        r'Suspend|Active|Delete|Create|Update', r'Credit|Risk'
+    ],
+    'returns_processing': [
+        r'Return|Refund|Exchange|Condition|Defective',
+        r'Damaged|Wrong|Changed.*Mind|Approval'
+    ],
+    'analytics_logic': [
+        r'Report|Analysis|Trend|Forecast|Cohort',
+        r'Revenue|Growth|Retention|Churn|Segment'
+    ]
+}
+
+# Literal text each universal pattern needs on the upper-cased line before it can
+# match, by rule type: every group must have at least one of its alternatives on
+# the line. Rule types without an entry are always tried.
+UNIVERSAL_PATTERN_KEYWORDS = {
+    'null_validation': (('IF', 'WHERE'), ('NULL',)),
+    'threshold_validation': (('IF', 'WHERE'), ('<', '>', '=')),
+    'existence_validation': (('IF', 'WHERE'), ('EXISTS',)),
+    'non_existence_validation': (('IF', 'WHERE'), ('NOT',), ('EXISTS',)),
+    'length_validation': (('IF', 'WHERE'), ('LEN',)),
+    'null_handling': (('IF', 'WHERE'), ('ISNULL',)),
+    'date_validation': (('IF', 'WHERE'), ('ISDATE',)),
+    'numeric_validation': (('IF', 'WHERE'), ('ISNUMERIC',)),
+    'arithmetic_calculation': (('SET',), ('@',), ('=',)),
+    'aggregate_calculation': (('SUM', 'COUNT', 'AVG', 'MIN', 'MAX', 'STDEV'), ('(',)),
+    'conditional_calculation': (('CASE',), ('WHEN',), ('THEN',), ('END',)),
+    'mathematical_function': (('ROUND', 'CEILING', 'FLOOR', 'ABS'), ('(',)),
+    'date_calculation': (('DATEDIFF', 'DATEADD', 'GETDATE', 'CURRENT_TIMESTAMP'),),
+    'string_manipulation': (('SUBSTRING', 'LEFT', 'RIGHT', 'CHARINDEX', 'PATINDEX'),),
+    'transaction_start': (('BEGIN',), ('TRANSACTION',)),
+    'transaction_commit': (('COMMIT',), ('TRANSACTION',)),
+    'transaction_rollback': (('ROLLBACK',), ('TRANSACTION',)),
+    'transaction_savepoint': (('SAVE',), ('TRANSACTION',)),
+    'transaction_control': (('XACT_ABORT',),),
+    'try_block': (('BEGIN',), ('TRY',)),
+    'catch_block': (('BEGIN',), ('CATCH',)),
+    'error_raising': (('RAISERROR',),),
+    'error_throwing': (('THROW',),),
+    'error_checking': (('@@ERROR',),),
+    'error_info': (('ERROR_',), ('()',)),
+    'performance_tuning': (('NOCOUNT',),),
+    'isolation_hint': (('NOLOCK', 'READUNCOMMITTED'),),
+    'query_hint': (('OPTION',), ('(',)),
+    'index_hint': (('INDEX',), ('=',)),
+    'sql_injection_protection': (('QUOTENAME',),),
+    'parameterized_sql': (('SP_EXECUTESQL',),),
+    'permission_check': (('HAS_PERMS_BY_NAME',),),
+    'role_check': (('IS_MEMBER',),),
+}
+
+@lru_cache(maxsize=None)
+def compiled_universal_patterns() -> List[Tuple[str, List[Tuple[str, 're.Pattern', str, str, Tuple[Tuple[str, ...], ...]]]]]:
+    """UNIVERSAL_PATTERNS as (category, [(pattern, regex, rule_type, description, keywords)]),
+    compiled on first use"""
+    return [(category, [(pattern, re.compile(pattern, re.IGNORECASE), rule_type, description,
+                         UNIVERSAL_PATTERN_KEYWORDS.get(rule_type, ()))
+                        for pattern, rule_type, description in patterns])
+            for category, patterns in UNIVERSAL_PATTERNS.items()]
 
 @dataclass
 class BusinessRule:
@@ -51,88 +208,56 @@ class DecisionPoint:
     source_code: str  # The actual source line
     code_block: List[str]  # The code block associated with this decision point
 
+def _origin_note(item: Dict[str, Any]) -> str:
+    """Where a virtual line came from in the original text, for report lines"""
+    return f" (original {item['original_line']}:{item['original_column']})" if 'original_line' in item else ''
+
+def rate_complexity_score(complexity_score: int) -> str:
+    """Map an overall complexity score to its rating"""
+    if complexity_score < 10:
+        return 'Low'
+    elif complexity_score < 25:
+        return 'Medium'
+    elif complexity_score < 50:
+        return 'High'
+    else:
+        return 'Very High'
+
 class UniversalSQLAnalyzer:
-    def __init__(self):
-        self.business_rules = []
-        self.control_flows = []
-        self.data_operations = []
-        self.variables = {}
-        self.parameters = {}
-        
-        # Universal SQL patterns that work across all domains
-        self.universal_patterns = {
-            'validation_patterns': [
-                (r'(?:IF|WHERE)\s+.*(?:IS\s+NULL|IS\s+NOT\s+NULL)', 'null_validation', 'Null value validation'),
-                (r'(?:IF|WHERE)\s+.*(?:<=|>=|<|>|=|<>|!=)\s*[0-9]+', 'threshold_validation', 'Numeric threshold validation'),
-                (r'(?:IF|WHERE)\s+.*EXISTS\s*\(', 'existence_validation', 'Record existence validation'),
-                (r'(?:IF|WHERE)\s+.*NOT\s+EXISTS\s*\(', 'non_existence_validation', 'Record non-existence validation'),
-                (r'(?:IF|WHERE)\s+.*\bLEN\s*\(.*\)\s*[<>=]', 'length_validation', 'String length validation'),
-                (r'(?:IF|WHERE)\s+.*\bISNULL\s*\(', 'null_handling', 'Null value handling'),
-                (r'(?:IF|WHERE)\s+.*\bISDATE\s*\(', 'date_validation', 'Date format validation'),
-                (r'(?:IF|WHERE)\s+.*\bISNUMERIC\s*\(', 'numeric_validation', 'Numeric format validation'),
-            ],
-            'calculation_patterns': [
-                (r'SET\s+@\w+\s*=.*[+\-*/]', 'arithmetic_calculation', 'Arithmetic calculation'),
-                (r'(?:SUM|COUNT|AVG|MIN|MAX|STDEV)\s*\(', 'aggregate_calculation', 'Aggregate calculation'),
-                (r'CASE\s+WHEN.*THEN.*END', 'conditional_calculation', 'Conditional calculation'),
-                (r'(?:ROUND|CEILING|FLOOR|ABS)\s*\(', 'mathematical_function', 'Mathematical function'),
-                (r'(?:DATEDIFF|DATEADD|GETDATE|CURRENT_TIMESTAMP)', 'date_calculation', 'Date/time calculation'),
-                (r'(?:SUBSTRING|LEFT|RIGHT|CHARINDEX|PATINDEX)', 'string_manipulation', 'String manipulation'),
-            ],
-            'transaction_patterns': [
-                (r'BEGIN\s+TRANSACTION', 'transaction_start', 'Transaction initiation'),
-                (r'COMMIT\s+TRANSACTION', 'transaction_commit', 'Transaction commit'),
-                (r'ROLLBACK\s+TRANSACTION', 'transaction_rollback', 'Transaction rollback'),
-                (r'SAVE\s+TRANSACTION', 'transaction_savepoint', 'Transaction savepoint'),
-                (r'SET\s+XACT_ABORT', 'transaction_control', 'Transaction abort control'),
-            ],
-            'error_handling_patterns': [
-                (r'BEGIN\s+TRY', 'try_block', 'Error handling try block'),
-                (r'BEGIN\s+CATCH', 'catch_block', 'Error handling catch block'),
-                (r'RAISERROR\s*\(', 'error_raising', 'Error message raising'),
-                (r'THROW\s+', 'error_throwing', 'Exception throwing'),
-                (r'@@ERROR', 'error_checking', 'Error status checking'),
-                (r'ERROR_(?:MESSAGE|NUMBER|SEVERITY|STATE|PROCEDURE|LINE)\s*\(\)', 'error_info', 'Error information retrieval'),
-            ],
-            'performance_patterns': [
-                (r'SET\s+NOCOUNT\s+(?:ON|OFF)', 'performance_tuning', 'Row count optimization'),
-                (r'WITH\s*\((?:NOLOCK|READUNCOMMITTED)', 'isolation_hint', 'Isolation level hint'),
-                (r'OPTION\s*\(.*\)', 'query_hint', 'Query optimization hint'),
-                (r'INDEX\s*=\s*', 'index_hint', 'Index usage hint'),
-            ],
-            'security_patterns': [
-                (r'QUOTENAME\s*\(', 'sql_injection_protection', 'SQL injection protection'),
-                (r'sp_executesql', 'parameterized_sql', 'Parameterized dynamic SQL'),
-                (r'HAS_PERMS_BY_NAME\s*\(', 'permission_check', 'Permission validation'),
-                (r'IS_MEMBER\s*\(', 'role_check', 'Role membership check'),
-            ]
-        }
-        
-    def analyze_procedure(self, sql_content: str, procedure_name: str = None) -> Dict[str, Any]:
-        """Main analysis function that works for any SQL stored procedure"""
-        lines = sql_content.split('\n')
-        
-        # Extract basic info
-        proc_info = self._extract_procedure_info(sql_content)
-        
-        # Analyze different aspects
-        control_flows = self._analyze_control_flow(lines)
-        business_rules = self._extract_universal_patterns(lines)
-        data_ops = self._analyze_data_operations(lines)
-        complexity_analysis = self._analyze_complexity(lines)
-        structure_analysis = self._analyze_structure(lines)
-        decision_points = self._analyze_decision_points(lines)
-        
-        return {
-            'procedure_info': proc_info,
-            'control_flows': control_flows,
-            'business_rules': business_rules,
-            'data_operations': data_ops,
-            'complexity_analysis': complexity_analysis,
-            'structure_analysis': structure_analysis,
-            'decision_points': decision_points,
-            'summary': self._generate_summary(proc_info, control_flows, business_rules, complexity_analysis)
-        }
+    """Stateless between calls: every result lives in its ProcedureAnalysis, so one
+    instance can be shared by many threads"""
+    
+    def analyze_procedure(self, sql_content: str, procedure_name: str = None,
+                          sections: Optional[Iterable[str]] = None,
+                          model: Optional[LineModel] = None) -> 'ProcedureAnalysis':
+        """Main analysis function that works for any SQL stored procedure
+
+        Sections are computed lazily on first access, so callers that only need
+        e.g. the complexity rating never pay for pattern extraction. A LineModel
+        of sql_content already built for another analyzer can be passed as model.
+        """
+        return ProcedureAnalysis(self, sql_content, sections, model)
+    
+    def analyze_many(self, sql_contents: Iterable[str], sections: Optional[Iterable[str]] = None,
+                     executor: Optional['Executor'] = None, max_pending: int = None) -> Iterator['ProcedureAnalysis']:
+        """Analyze many procedures, yielding results lazily in input order
+
+        With an executor the requested sections are computed on its workers
+        (see sql_batch.map_ordered); without one, each analysis is as lazy as
+        analyze_procedure's.
+        """
+        if executor is None:
+            return (self.analyze_procedure(sql_content, sections=sections) for sql_content in sql_contents)
+        sections = list(sections) if sections is not None else None
+        return map_ordered(partial(self._analyze_complete, sections=sections), sql_contents,
+                           executor, max_pending)
+    
+    def _analyze_complete(self, sql_content: str, sections: Optional[List[str]] = None) -> 'ProcedureAnalysis':
+        """analyze_procedure with every requested section already computed"""
+        result = self.analyze_procedure(sql_content, sections=sections)
+        for section in result:
+            result[section]
+        return result
     
     def _extract_procedure_info(self, sql_content: str) -> Dict[str, Any]:
         """Extract procedure name, parameters, and basic info"""
@@ -258,14 +383,49 @@ class UniversalSQLAnalyzer:
         
         return flows
     
-    def _extract_universal_patterns(self, lines: List[str]) -> List[Dict[str, Any]]:
-        """Extract business rules using universal patterns"""
+    def _extract_universal_patterns(self, lines: List[str],
+                                    upper_lines: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Extract business rules using universal patterns
+        
+        upper_lines, the stripped upper-cased lines, may be passed in when already
+        computed; they only decide which patterns are worth running on a line.
+        """
+        if upper_lines is None:
+            upper_lines = [line.strip().upper() for line in lines]
         rules = []
         
-        for category, patterns in self.universal_patterns.items():
-            for i, line in enumerate(lines, 1):
-                for pattern, rule_type, description in patterns:
-                    matches = re.findall(pattern, line, re.IGNORECASE)
+        # Indices of the lines containing each keyword, looked up once per keyword
+        keyword_lines = {}
+        
+        def candidate_lines(keywords) -> Optional[set]:
+            """Indices of the lines that pass a pattern's keyword gate (None: all lines)"""
+            if not keywords:
+                return None
+            candidates = None
+            for group in keywords:
+                found = set()
+                for keyword in group:
+                    if keyword not in keyword_lines:
+                        keyword_lines[keyword] = {index for index, line_upper in enumerate(upper_lines)
+                                                  if keyword in line_upper}
+                    found |= keyword_lines[keyword]
+                candidates = found if candidates is None else candidates & found
+            return candidates
+        
+        for category, patterns in compiled_universal_patterns():
+            pattern_lines = [candidate_lines(keywords) for *_, keywords in patterns]
+            if any(candidates is None for candidates in pattern_lines):
+                indices = range(len(lines))
+            else:
+                indices = sorted(set().union(*pattern_lines))
+            
+            for index in indices:
+                i = index + 1
+                line = lines[index]
+                for (pattern, regex, rule_type, description, _), candidates in zip(patterns, pattern_lines):
+                    if candidates is not None and index not in candidates:
+                        continue
+                    matches = regex.findall(line)
                     if matches:
                         # Determine confidence based on pattern specificity
                         confidence = 'high' if len(matches) == 1 else 'medium'
@@ -400,7 +560,7 @@ class UniversalSQLAnalyzer:
             if re.search(r'\b(?:TRY|CATCH)\b', line_upper):
                 metrics['exception_blocks'] += 1
             
-            if re.search(r'EXEC\s*\(|sp_executesql', line_upper):
+            if re.search(r'EXEC\s*\(|SP_EXECUTESQL', line_upper):
                 metrics['dynamic_sql_usage'] += 1
             
             if re.search(r'CURSOR|FETCH|OPEN|CLOSE', line_upper):
@@ -417,15 +577,7 @@ class UniversalSQLAnalyzer:
         )
         
         metrics['overall_complexity_score'] = complexity_score
-        
-        if complexity_score < 10:
-            metrics['complexity_rating'] = 'Low'
-        elif complexity_score < 25:
-            metrics['complexity_rating'] = 'Medium'
-        elif complexity_score < 50:
-            metrics['complexity_rating'] = 'High'
-        else:
-            metrics['complexity_rating'] = 'Very High'
+        metrics['complexity_rating'] = rate_complexity_score(complexity_score)
         
         return metrics
     
@@ -493,41 +645,6 @@ class UniversalSQLAnalyzer:
             'total_decision_points': 0
         }
         
-        # Business logic patterns for categorization
-        business_logic_patterns = {
-            'validation_logic': [
-                r'IS\s+NULL', r'IS\s+NOT\s+NULL', r'LEN\s*\(', r'EXISTS\s*\(',
-                r'NOT\s+EXISTS', r'<=|>=|<|>|=|<>|!=', r'ISNULL\s*\(',
-                r'ISDATE\s*\(', r'ISNUMERIC\s*\(', r'@\w+\s*IS\s+NULL'
-            ],
-            'pricing_logic': [
-                r'Price|Cost|Amount|Discount|Fee|Rate|Charge|Total',
-                r'CustomerType|VIP|Corporate|Wholesale', r'Volume|Quantity',
-                r'Seasonal|Holiday|Promotion|Loyalty', r'Tax|Shipping'
-            ],
-            'order_processing': [
-                r'Order|Payment|Fraud|Status|Workflow|Process',
-                r'Credit|Limit|Balance|Approval', r'Rush|Priority',
-                r'Confirmation|Notification', r'Backorder|Fulfillment'
-            ],
-            'inventory_management': [
-                r'Inventory|Stock|Warehouse|Allocation|Reserve',
-                r'Available|Quantity|Transfer|Restock', r'Product|Item'
-            ],
-            'customer_management': [
-                r'Customer|Account|Profile|Status|Tier',
-                r'Suspend|Active|Delete|Create|Update', r'Credit|Risk'
-            ],
-            'returns_processing': [
-                r'Return|Refund|Exchange|Condition|Defective',
-                r'Damaged|Wrong|Changed.*Mind|Approval'
-            ],
-            'analytics_logic': [
-                r'Report|Analysis|Trend|Forecast|Cohort',
-                r'Revenue|Growth|Retention|Churn|Segment'
-            ]
-        }
-        
         # First pass: identify all decision points
         for i, line in enumerate(lines, 1):
             original_line = line.strip()
@@ -547,8 +664,8 @@ class UniversalSQLAnalyzer:
                     'line_number': i,
                     'decision_type': 'IF',
                     'condition': condition,
-                    'business_logic': self._extract_business_logic(condition, business_logic_patterns),
-                    'category': self._categorize_decision_point(condition, business_logic_patterns),
+                    'business_logic': self._extract_business_logic(condition, BUSINESS_LOGIC_PATTERNS),
+                    'category': self._categorize_decision_point(condition, BUSINESS_LOGIC_PATTERNS),
                     'complexity_level': self._assess_decision_complexity(condition),
                     'source_code': original_line,
                     'code_block': []
@@ -563,8 +680,8 @@ class UniversalSQLAnalyzer:
                     'line_number': i,
                     'decision_type': 'ELSE_IF',
                     'condition': condition,
-                    'business_logic': self._extract_business_logic(condition, business_logic_patterns),
-                    'category': self._categorize_decision_point(condition, business_logic_patterns),
+                    'business_logic': self._extract_business_logic(condition, BUSINESS_LOGIC_PATTERNS),
+                    'category': self._categorize_decision_point(condition, BUSINESS_LOGIC_PATTERNS),
                     'complexity_level': self._assess_decision_complexity(condition),
                     'source_code': original_line,
                     'code_block': []
@@ -579,8 +696,8 @@ class UniversalSQLAnalyzer:
                     'line_number': i,
                     'decision_type': 'CASE',
                     'condition': condition,
-                    'business_logic': self._extract_business_logic(condition, business_logic_patterns),
-                    'category': self._categorize_decision_point(condition, business_logic_patterns),
+                    'business_logic': self._extract_business_logic(condition, BUSINESS_LOGIC_PATTERNS),
+                    'category': self._categorize_decision_point(condition, BUSINESS_LOGIC_PATTERNS),
                     'complexity_level': self._assess_decision_complexity(condition),
                     'source_code': original_line,
                     'code_block': []
@@ -595,8 +712,8 @@ class UniversalSQLAnalyzer:
                     'line_number': i,
                     'decision_type': 'WHILE',
                     'condition': condition,
-                    'business_logic': self._extract_business_logic(condition, business_logic_patterns),
-                    'category': self._categorize_decision_point(condition, business_logic_patterns),
+                    'business_logic': self._extract_business_logic(condition, BUSINESS_LOGIC_PATTERNS),
+                    'category': self._categorize_decision_point(condition, BUSINESS_LOGIC_PATTERNS),
                     'complexity_level': 'high',  # Loops are inherently complex
                     'source_code': original_line,
                     'code_block': []
@@ -611,8 +728,8 @@ class UniversalSQLAnalyzer:
                     'line_number': i,
                     'decision_type': 'EXISTS',
                     'condition': condition,
-                    'business_logic': self._extract_business_logic(condition, business_logic_patterns),
-                    'category': self._categorize_decision_point(condition, business_logic_patterns),
+                    'business_logic': self._extract_business_logic(condition, BUSINESS_LOGIC_PATTERNS),
+                    'category': self._categorize_decision_point(condition, BUSINESS_LOGIC_PATTERNS),
                     'complexity_level': self._assess_decision_complexity(condition),
                     'source_code': original_line,
                     'code_block': []
@@ -857,6 +974,142 @@ class UniversalSQLAnalyzer:
         else:
             return 'Very High'
 
+class ProcedureAnalysis(Mapping):
+    """Lazily computed analysis result restricted to the requested sections
+
+    Behaves like the result dict: iteration, ``in`` and ``[]`` cover only the
+    requested sections. The attribute properties compute any section on demand,
+    and sections another section depends on are computed (once) as needed.
+    """
+    
+    def __init__(self, analyzer: UniversalSQLAnalyzer, sql_content: str,
+                 sections: Optional[Iterable[str]] = None, model: Optional[LineModel] = None):
+        self.analyzer = analyzer
+        self.sql_content = sql_content
+        requested = set(sections) if sections is not None else set(ANALYSIS_SECTIONS)
+        unknown = requested - set(ANALYSIS_SECTIONS)
+        if unknown:
+            raise ValueError(f"Unknown analysis sections: {', '.join(sorted(unknown))}")
+        self.sections = [name for name in ANALYSIS_SECTIONS if name in requested]
+        self._model = model
+        self._cache = {}
+    
+    @property
+    def model(self) -> LineModel:
+        """The shared per-line model, built on first use unless one was passed in"""
+        if self._model is None:
+            self._model = build_line_model(self.sql_content)
+        return self._model
+    
+    @property
+    def source(self) -> VirtualSource:
+        """Analyzer lines, with over-long (minified) lines split into virtual lines"""
+        return self.model.source
+    
+    @property
+    def lines(self) -> List[str]:
+        return self.source.lines
+    
+    def _compute(self, section: str) -> Any:
+        """Compute a section (and, through it, its dependencies) once"""
+        if section in self._cache:
+            return self._cache[section]
+        
+        analyzer = self.analyzer
+        if section == 'procedure_info':
+            if self.source.was_split:
+                value = analyzer._extract_procedure_info(self.source.text)
+                value['character_count'] = len(self.sql_content)
+                value['split_line_count'] = self.source.split_line_count
+            else:
+                value = analyzer._extract_procedure_info(self.sql_content)
+        elif section == 'control_flows':
+            value = analyzer._analyze_control_flow(self.lines)
+        elif section == 'business_rules':
+            value = analyzer._extract_universal_patterns(self.lines, self.model.upper_lines)
+        elif section == 'data_operations':
+            value = analyzer._analyze_data_operations(self.lines)
+        elif section == 'complexity_analysis':
+            value = analyzer._analyze_complexity(self.lines)
+        elif section == 'structure_analysis':
+            value = analyzer._analyze_structure(self.lines)
+        elif section == 'decision_points':
+            value = analyzer._analyze_decision_points(self.lines)
+        elif section == 'summary':
+            value = analyzer._generate_summary(self.procedure_info, self.control_flows,
+                                               self.business_rules, self.complexity_analysis)
+        else:
+            raise KeyError(section)
+        if self.source.was_split and section in LINE_NUMBERED_SECTIONS:
+            self._add_original_lines(section, value)
+        
+        self._cache[section] = value
+        return value
+    
+    def _add_original_lines(self, section: str, value: Any):
+        """Line numbers are virtual; keep the way back to the original text"""
+        origin = self.source.origin
+        if section == 'control_flows':
+            for flow in value:
+                flow['original_start_line'] = origin(flow['start_line'])[0]
+                flow['original_end_line'] = origin(flow['end_line'])[0]
+            return
+        items = value['decision_points'] if section == 'decision_points' else value
+        for item in items:
+            item['original_line'], item['original_column'] = origin(item['line_number'])
+    
+    def __getitem__(self, section: str) -> Any:
+        if section not in self.sections:
+            raise KeyError(section)
+        return self._compute(section)
+    
+    def __contains__(self, section) -> bool:
+        return section in self.sections
+    
+    def __iter__(self):
+        return iter(self.sections)
+    
+    def __len__(self) -> int:
+        return len(self.sections)
+    
+    @property
+    def procedure_info(self) -> Dict[str, Any]:
+        return self._compute('procedure_info')
+    
+    @property
+    def control_flows(self) -> List[Dict[str, Any]]:
+        return self._compute('control_flows')
+    
+    @property
+    def business_rules(self) -> List[Dict[str, Any]]:
+        return self._compute('business_rules')
+    
+    @property
+    def data_operations(self) -> List[Dict[str, Any]]:
+        return self._compute('data_operations')
+    
+    @property
+    def complexity_analysis(self) -> Dict[str, Any]:
+        return self._compute('complexity_analysis')
+    
+    @property
+    def structure_analysis(self) -> Dict[str, Any]:
+        return self._compute('structure_analysis')
+    
+    @property
+    def decision_points(self) -> Dict[str, Any]:
+        return self._compute('decision_points')
+    
+    @property
+    def summary(self) -> Dict[str, Any]:
+        return self._compute('summary')
+
+def section_to_json(value: Any) -> Any:
+    """JSON-serializable form of one analysis section"""
+    if isinstance(value, list):
+        return [item if isinstance(item, dict) else str(item) for item in value]
+    return value
+
 def generate_universal_analysis_report(analysis_result: Dict[str, Any]) -> str:
     """Generate a comprehensive analysis report for any stored procedure"""
     report = []
@@ -866,44 +1119,51 @@ def generate_universal_analysis_report(analysis_result: Dict[str, Any]) -> str:
     report.append("=" * 60)
     report.append("")
     
+    # Sections missing from a partial (--sections) analysis are skipped
+    info = analysis_result.get('procedure_info')
+    summary = analysis_result.get('summary')
+    complexity = analysis_result.get('complexity_analysis')
+    structure = analysis_result.get('structure_analysis')
+    
     # Procedure Info
-    info = analysis_result['procedure_info']
-    summary = analysis_result['summary']
-    
-    report.append("## Procedure Overview")
-    report.append(f"**Procedure Name:** {info['name']}")
-    report.append(f"**Total Lines:** {info['line_count']:,}")
-    report.append(f"**Parameters:** {len(info['parameters'])}")
-    report.append(f"**Variables:** {info['variable_count']}")
-    report.append(f"**Tables/Views:** {len(info['tables_involved'])}")
-    if info['cursor_count'] > 0:
-        report.append(f"**Cursors:** {info['cursor_count']}")
-    report.append("")
+    if info:
+        report.append("## Procedure Overview")
+        report.append(f"**Procedure Name:** {info['name']}")
+        report.append(f"**Total Lines:** {info['line_count']:,}")
+        report.append(f"**Parameters:** {len(info['parameters'])}")
+        report.append(f"**Variables:** {info['variable_count']}")
+        report.append(f"**Tables/Views:** {len(info['tables_involved'])}")
+        if info['cursor_count'] > 0:
+            report.append(f"**Cursors:** {info['cursor_count']}")
+        if info.get('split_line_count'):
+            report.append(f"**Long Lines Split:** {info['split_line_count']} (line numbers refer to virtual lines)")
+        report.append("")
     
     # Complexity Analysis
-    complexity = analysis_result['complexity_analysis']
-    report.append("## Complexity Analysis")
-    report.append(f"- **Overall Complexity:** {complexity['complexity_rating']} (Score: {complexity['overall_complexity_score']})")
-    report.append(f"- **Cyclomatic Complexity:** {complexity['cyclomatic_complexity']}")
-    report.append(f"- **Maximum Nesting Depth:** {complexity['max_nesting_depth']}")
-    report.append(f"- **Decision Points:** {complexity['decision_points']}")
-    if complexity['loop_count'] > 0:
-        report.append(f"- **Loops:** {complexity['loop_count']}")
-    if complexity['dynamic_sql_usage'] > 0:
-        report.append(f"- **Dynamic SQL Usage:** {complexity['dynamic_sql_usage']}")
-    report.append(f"- **Estimated Maintenance Effort:** {summary['estimated_maintenance_effort']}")
-    report.append("")
+    if complexity:
+        report.append("## Complexity Analysis")
+        report.append(f"- **Overall Complexity:** {complexity['complexity_rating']} (Score: {complexity['overall_complexity_score']})")
+        report.append(f"- **Cyclomatic Complexity:** {complexity['cyclomatic_complexity']}")
+        report.append(f"- **Maximum Nesting Depth:** {complexity['max_nesting_depth']}")
+        report.append(f"- **Decision Points:** {complexity['decision_points']}")
+        if complexity['loop_count'] > 0:
+            report.append(f"- **Loops:** {complexity['loop_count']}")
+        if complexity['dynamic_sql_usage'] > 0:
+            report.append(f"- **Dynamic SQL Usage:** {complexity['dynamic_sql_usage']}")
+        if summary:
+            report.append(f"- **Estimated Maintenance Effort:** {summary['estimated_maintenance_effort']}")
+        report.append("")
     
     # Structure Analysis
-    structure = analysis_result['structure_analysis']
-    report.append("## Code Structure")
-    report.append(f"- **Code Lines:** {structure['code_lines']:,}")
-    report.append(f"- **Comment Lines:** {structure['comment_lines']:,}")
-    report.append(f"- **Empty Lines:** {structure['empty_lines']:,}")
-    report.append(f"- **Comment Ratio:** {structure['comment_ratio']:.1%}")
-    report.append(f"- **Documentation Quality:** {'Good' if structure['has_documentation'] else 'Poor'}")
-    report.append(f"- **Average Line Length:** {structure['average_line_length']:.1f} characters")
-    report.append("")
+    if structure:
+        report.append("## Code Structure")
+        report.append(f"- **Code Lines:** {structure['code_lines']:,}")
+        report.append(f"- **Comment Lines:** {structure['comment_lines']:,}")
+        report.append(f"- **Empty Lines:** {structure['empty_lines']:,}")
+        report.append(f"- **Comment Ratio:** {structure['comment_ratio']:.1%}")
+        report.append(f"- **Documentation Quality:** {'Good' if structure['has_documentation'] else 'Poor'}")
+        report.append(f"- **Average Line Length:** {structure['average_line_length']:.1f} characters")
+        report.append("")
     
     # Decision Points Analysis
     if 'decision_points' in analysis_result and analysis_result['decision_points']:
@@ -951,7 +1211,7 @@ def generate_universal_analysis_report(analysis_result: Dict[str, Any]) -> str:
                 for dp in decision_points[:5]:
                     complexity_icon = "🔴" if dp['complexity_level'] == 'high' else "🟡" if dp['complexity_level'] == 'medium' else "🟢"
                     type_display = dp['decision_type'].replace('_', ' ')
-                    report.append(f"- {complexity_icon} **Line {dp['line_number']}** ({type_display}): {dp['business_logic']}")
+                    report.append(f"- {complexity_icon} **Line {dp['line_number']}**{_origin_note(dp)} ({type_display}): {dp['business_logic']}")
                     
                     # Show the source code and code block
                     report.append(f"  **Source:** `{dp['source_code']}`")
@@ -980,7 +1240,7 @@ def generate_universal_analysis_report(analysis_result: Dict[str, Any]) -> str:
                 report.append("")
     
     # Business Rules by Category
-    if analysis_result['business_rules']:
+    if analysis_result.get('business_rules'):
         report.append("## Identified Patterns & Rules")
         
         # Group by category
@@ -995,7 +1255,7 @@ def generate_universal_analysis_report(analysis_result: Dict[str, Any]) -> str:
             report.append(f"### {category.replace('_', ' ').title()}")
             for rule in rules[:5]:  # Show top 5 per category
                 confidence_icon = "🔴" if rule['confidence'] == 'high' else "🟡" if rule['confidence'] == 'medium' else "🟢"
-                report.append(f"- {confidence_icon} **Line {rule['line_number']}:** {rule['description']}")
+                report.append(f"- {confidence_icon} **Line {rule['line_number']}{_origin_note(rule)}:** {rule['description']}")
                 if len(rule['code_snippet']) < 100:
                     report.append(f"  ```sql")
                     report.append(f"  {rule['code_snippet']}")
@@ -1005,7 +1265,7 @@ def generate_universal_analysis_report(analysis_result: Dict[str, Any]) -> str:
             report.append("")
     
     # Data Operations
-    if analysis_result['data_operations']:
+    if analysis_result.get('data_operations'):
         report.append("## Data Operations")
         operations_by_type = {}
         for op in analysis_result['data_operations']:
@@ -1018,13 +1278,13 @@ def generate_universal_analysis_report(analysis_result: Dict[str, Any]) -> str:
             report.append(f"### {op_type} Operations ({len(ops)})")
             for op in ops[:10]:  # Show first 10
                 impact_icon = "🔴" if op['estimated_impact'] == 'high' else "🟡" if op['estimated_impact'] == 'medium' else "🟢"
-                report.append(f"- {impact_icon} **{op['table']}** (Line {op['line_number']})")
+                report.append(f"- {impact_icon} **{op['table']}** (Line {op['line_number']}{_origin_note(op)})")
             if len(ops) > 10:
                 report.append(f"  *... and {len(ops) - 10} more*")
             report.append("")
     
     # Control Flow
-    if analysis_result['control_flows']:
+    if analysis_result.get('control_flows'):
         report.append("## Control Flow Analysis")
         total_complexity = sum(flow['complexity_factor'] for flow in analysis_result['control_flows'])
         report.append(f"**Total Control Structures:** {len(analysis_result['control_flows'])}")
@@ -1033,11 +1293,13 @@ def generate_universal_analysis_report(analysis_result: Dict[str, Any]) -> str:
         
         for flow in analysis_result['control_flows']:
             lines_span = f"Lines {flow['start_line']}-{flow.get('end_line', '?')}"
+            if 'original_start_line' in flow:
+                lines_span += f", original {flow['original_start_line']}-{flow['original_end_line']}"
             report.append(f"- **{flow['type']}** ({lines_span}): {flow['condition'][:80]}{'...' if len(flow['condition']) > 80 else ''}")
         report.append("")
     
     # Tables and Dependencies
-    if info['tables_involved']:
+    if info and info['tables_involved']:
         report.append("## Database Objects")
         report.append("**Tables/Views/Functions Referenced:**")
         for table in sorted(info['tables_involved']):
@@ -1045,6 +1307,9 @@ def generate_universal_analysis_report(analysis_result: Dict[str, Any]) -> str:
         report.append("")
     
     # Recommendations
+    if not (complexity and structure and info):
+        return "\n".join(report)
+    
     report.append("## Recommendations")
     recommendations = []
     
@@ -1080,11 +1345,45 @@ def main():
     import argparse
     
     parser = argparse.ArgumentParser(description='Universal SQL stored procedure analyzer')
-    parser.add_argument('sql_file', help='Path to SQL file to analyze')
+    parser.add_argument('sql_file', nargs='?', help='Path to SQL file to analyze')
     parser.add_argument('--output', '-o', help='Output file for analysis report')
     parser.add_argument('--format', choices=['markdown', 'json'], default='markdown', help='Output format')
+    parser.add_argument('--sections', type=lambda x: [s.strip() for s in x.split(',') if s.strip()],
+                        default=None,
+                        help=f"Comma-separated sections to compute (default: all). Choices: {', '.join(ANALYSIS_SECTIONS)}")
+    add_watch_arguments(parser)
     
     args = parser.parse_args()
+    if not args.sql_file and not args.watch:
+        parser.error('sql_file is required unless --watch is given')
+    
+    if args.sections is not None:
+        unknown = [s for s in args.sections if s not in ANALYSIS_SECTIONS]
+        if unknown:
+            parser.error(f"unknown section(s): {', '.join(unknown)}")
+    
+    analyzer = UniversalSQLAnalyzer()
+    
+    def render(sql_content: str):
+        """Analyze SQL content and generate the requested report"""
+        result = analyzer.analyze_procedure(sql_content, sections=args.sections)
+        
+        if args.format == 'json':
+            # Convert to JSON-serializable format
+            json_result = {key: section_to_json(value) for key, value in result.items()}
+            output = json.dumps(json_result, indent=2)
+        else:
+            output = generate_universal_analysis_report(result)
+        return result, output
+    
+    if args.watch:
+        # --output names a directory here; reports go next to each file by default
+        suffix = 'analysis.json' if args.format == 'json' else 'analysis.md'
+        signature = json.dumps(['universal', args.sections])
+        watch_and_regenerate(args.watch, lambda sql_content: render(sql_content)[1], suffix,
+                             output_dir=args.output, signature=signature, poll_interval=args.poll_interval,
+                             debounce=args.debounce, once=args.once)
+        return
     
     # Read SQL file
     try:
@@ -1098,21 +1397,7 @@ def main():
         return
     
     # Analyze
-    analyzer = UniversalSQLAnalyzer()
-    result = analyzer.analyze_procedure(sql_content)
-    
-    # Generate output
-    if args.format == 'json':
-        # Convert to JSON-serializable format
-        json_result = {}
-        for key, value in result.items():
-            if isinstance(value, list):
-                json_result[key] = [item if isinstance(item, dict) else str(item) for item in value]
-            else:
-                json_result[key] = value
-        output = json.dumps(json_result, indent=2)
-    else:
-        output = generate_universal_analysis_report(result)
+    result, output = render(sql_content)
     
     # Write output
     if args.output:
@@ -1120,8 +1405,12 @@ def main():
             with open(args.output, 'w', encoding='utf-8') as f:
                 f.write(output)
             print(f"Analysis written to {args.output}")
-            print(f"Complexity: {result['summary']['complexity_rating']} (Score: {result['summary']['complexity_score']})")
-            print(f"Business rules found: {result['summary']['business_rule_count']}")
+            if 'summary' in result:
+                print(f"Complexity: {result['summary']['complexity_rating']} (Score: {result['summary']['complexity_score']})")
+                print(f"Business rules found: {result['summary']['business_rule_count']}")
+            elif 'complexity_analysis' in result:
+                complexity = result['complexity_analysis']
+                print(f"Complexity: {complexity['complexity_rating']} (Score: {complexity['overall_complexity_score']})")
         except Exception as e:
             print(f"Error writing output file: {e}")
     else:
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Batch Analysis Helpers
+The analyzers keep no per-input state on the instance, so one instance (with its
+keyword tables and compiled patterns) can serve a whole batch. map_ordered runs a
+function over an iterable of inputs, inline or on any concurrent.futures executor,
+and yields the results lazily in input order.
+"""
+
+import os
+from collections import deque
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator, Optional
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+
+def map_ordered(function: Callable[[Any], Any], items: Iterable[Any],
+                executor: Optional['Executor'] = None, max_pending: int = None) -> Iterator[Any]:
+    """Lazily yield function(item) for every item, in input order
+
+    Without an executor each item is processed in the caller's thread when its
+    result is requested. With one, at most max_pending items (default: twice the
+    CPU count) are in flight, so items are only read as fast as results are
+    consumed. Work still queued when the consumer stops early is cancelled.
+    """
+    if executor is None:
+        for item in items:
+            yield function(item)
+        return
+
+    max_pending = max(1, max_pending or 2 * (os.cpu_count() or 1))
+    pending = deque()
+    try:
+        for item in items:
+            pending.append(executor.submit(function, item))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
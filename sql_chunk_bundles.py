@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Order-Preserving Prompt Bundles of Adaptive Chunks
+Packs consecutive chunks of the adaptive guide into bundles that each fit one model
+prompt, so a review pass makes one request per bundle instead of one per chunk.
+Chunks keep their sequential order and every chunk lands in the same bundle as its
+dependencies or a later one: a dependency on an earlier chunk is satisfied by order
+alone, and the rare dependency on a later chunk pulls both into one bundle.
+
+A chunk costs what its rendered guide section costs, in characters and in estimated
+model tokens, so the limits hold for the bundle files as written.
+"""
+
+import os
+from typing import Callable, Dict, List, Optional
+from dataclasses import dataclass, field
+
+from adaptive_chunked_analyzer import CodeChunk, estimate_tokens, format_chunk_section
+
+# Default token limit of one bundle
+DEFAULT_BUNDLE_TOKENS = 8000
+
+@dataclass
+class Bundle:
+    """Consecutive chunks rendered into one prompt"""
+    index: int                             # 1-based position among the bundles
+    chunks: List[CodeChunk]
+    sections: List[str]                    # rendered guide section of every chunk
+    tokens: int
+    chars: int
+    depends_on: List[int] = field(default_factory=list)   # indexes of earlier bundles needed
+
+    @property
+    def start_line(self) -> int:
+        return self.chunks[0].start_line
+
+    @property
+    def end_line(self) -> int:
+        return self.chunks[-1].end_line
+
+def pack_chunks(chunks: List[CodeChunk], max_tokens: Optional[int] = DEFAULT_BUNDLE_TOKENS,
+                max_chars: Optional[int] = None,
+                token_estimator: Callable[[str], int] = estimate_tokens) -> List[Bundle]:
+    """Fewest bundles of consecutive chunks within max_tokens and max_chars (either may be None)
+
+    A chunk over a limit on its own gets a bundle of its own, as does any run of
+    chunks that must share a bundle because of a forward dependency.
+    """
+    sections = ['\n'.join(format_chunk_section(chunk)) for chunk in chunks]
+    tokens = [sum(token_estimator(line) for line in section.split('\n')) for section in sections]
+    chars = [len(section) + 1 for section in sections]
+
+    # The last position each chunk has to share a bundle with
+    positions = {chunk.chunk_id: position for position, chunk in enumerate(chunks)}
+    reach = list(range(len(chunks)))
+    for position, chunk in enumerate(chunks):
+        for dependency in chunk.dependencies or ():
+            reach[position] = max(reach[position], positions.get(dependency, position))
+
+    def fits(total_tokens: int, total_chars: int) -> bool:
+        return ((max_tokens is None or total_tokens <= max_tokens) and
+                (max_chars is None or total_chars <= max_chars))
+
+    bundles = []
+    start = 0
+    while start < len(chunks):
+        end = start + 1
+        required = reach[start]
+        total_tokens, total_chars = tokens[start], chars[start]
+        while end < len(chunks) and (end <= required or
+                                     fits(total_tokens + tokens[end], total_chars + chars[end])):
+            required = max(required, reach[end])
+            total_tokens += tokens[end]
+            total_chars += chars[end]
+            end += 1
+        bundles.append(Bundle(len(bundles) + 1, chunks[start:end], sections[start:end],
+                              total_tokens, total_chars))
+        start = end
+
+    bundle_of = {chunk.chunk_id: bundle.index for bundle in bundles for chunk in bundle.chunks}
+    for bundle in bundles:
+        bundle.depends_on = sorted({bundle_of[dependency] for chunk in bundle.chunks
+                                    for dependency in chunk.dependencies or ()
+                                    if bundle_of.get(dependency, bundle.index) < bundle.index})
+    return bundles
+
+def format_bundle(bundle: Bundle, total: int, source_name: str = '') -> str:
+    """Markdown prompt of one bundle: a short header and the guide sections of its chunks"""
+    first, last = bundle.chunks[0].chunk_id, bundle.chunks[-1].chunk_id
+    chunk_range = f"Chunk {first}" if first == last else f"Chunks {first}-{last}"
+    output = [f"# Bundle {bundle.index}/{total}: {chunk_range}" + (f" of {source_name}" if source_name else ''),
+              f"**Lines**: {bundle.start_line}-{bundle.end_line}",
+              f"**Estimated Tokens**: {bundle.tokens}"]
+    if bundle.chunks[0].original_start_line is not None:
+        output[1] += f" (original {bundle.chunks[0].original_start_line}-{bundle.chunks[-1].original_end_line})"
+    if bundle.depends_on:
+        output.append(f"**Builds On**: Bundles {', '.join(map(str, bundle.depends_on))}")
+    output.append("")
+    output.extend(bundle.sections)
+    return '\n'.join(output)
+
+def bundle_file_names(bundles: List[Bundle], stem: str) -> Dict[int, str]:
+    """File name of every bundle, numbered so they sort in order"""
+    width = max(3, len(str(len(bundles))))
+    return {bundle.index: f"{stem}.bundle_{bundle.index:0{width}d}.md" for bundle in bundles}
+
+def write_bundles(bundles: List[Bundle], output_dir: str, stem: str, source_name: str = '') -> List[str]:
+    """Write one markdown file per bundle into output_dir and return their paths
+
+    Bundle files of stem left over from an earlier run with more bundles are removed.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    names = bundle_file_names(bundles, stem)
+    paths = []
+    for bundle in bundles:
+        path = os.path.join(output_dir, names[bundle.index])
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(format_bundle(bundle, len(bundles), source_name))
+        paths.append(path)
+    current = set(names.values())
+    for name in os.listdir(output_dir):
+        if name.startswith(f"{stem}.bundle_") and name.endswith('.md') and name not in current:
+            os.remove(os.path.join(output_dir, name))
+    return paths
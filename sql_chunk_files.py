@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Per-Chunk Guide Files with a JSON Manifest
+The adaptive guide of a large procedure is one file of hundreds of kilobytes that is
+slow to open, diff and hand to tools. This output mode writes one markdown file per
+chunk plus manifest.json, which lists every chunk's id, title, line range, content
+hash, dependencies and file, so consumers load only the chunks they need.
+
+Chunk files are named by content hash and hold only what follows from the chunk's
+code; everything that depends on its position (id, lines, dependencies) lives in the
+manifest. Editing one statement therefore rewrites one chunk file and the manifest,
+not every file below the edit. A file is rewritten only when its text changed since
+the manifest was last written, files are written concurrently by a thread pool, and
+files of chunks that no longer exist are removed.
+"""
+
+import os
+import json
+from typing import Any, Dict, List, Optional
+from dataclasses import dataclass, field
+
+from adaptive_chunked_analyzer import CodeChunk
+from sql_watch import write_atomic
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+# Hex digits of the content hash in chunk file names
+FILE_HASH_LENGTH = 16
+
+@dataclass
+class SplitResult:
+    """What one write of per-chunk files did"""
+    manifest_path: str
+    written: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+
+def chunk_file_name(chunk: CodeChunk) -> str:
+    return f"chunk_{chunk.content_hash[:FILE_HASH_LENGTH]}.md"
+
+def format_chunk_file(chunk: CodeChunk) -> str:
+    """Markdown of one chunk with only the fields that follow from its code"""
+    output = [f"# Chunk {chunk.content_hash[:FILE_HASH_LENGTH]}",
+              f"**Type**: {chunk.chunk_type.value}",
+              f"**Complexity Score**: {chunk.complexity_score}",
+              f"**Estimated Tokens**: {chunk.token_count}"]
+    if chunk.sql_operations:
+        output.append(f"**SQL Operations**: {', '.join(chunk.sql_operations)}")
+    if chunk.control_structures:
+        output.append(f"**Control Structures**: {', '.join(chunk.control_structures)}")
+    if chunk.business_functions:
+        output.append(f"**Business Functions**: {', '.join(chunk.business_functions).replace('_', ' ').title()}")
+    if chunk.variables_declared:
+        output.append(f"**Variables Declared**: {', '.join(chunk.variables_declared)}")
+    if chunk.tables_accessed:
+        output.append(f"**Tables/Views**: {', '.join(chunk.tables_accessed)}")
+    output.append("")
+    output.append("```sql")
+    output.extend(chunk.lines)
+    output.append("```")
+    output.append("")
+    return '\n'.join(output)
+
+def _text_digest(text: str) -> str:
+    import hashlib
+    return hashlib.sha256(text.encode('utf-8', errors='surrogatepass')).hexdigest()
+
+def _load_manifest(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return manifest if manifest.get('version') == MANIFEST_VERSION else {}
+
+def _manifest_entry(chunk: CodeChunk) -> Dict[str, Any]:
+    entry = {'chunk_id': chunk.chunk_id,
+             'title': chunk.title,
+             'chunk_type': chunk.chunk_type.value,
+             'start_line': chunk.start_line,
+             'end_line': chunk.end_line,
+             'content_hash': chunk.content_hash,
+             'token_count': chunk.token_count,
+             'dependencies': chunk.dependencies,
+             'context_summary': chunk.context_summary,
+             'file': chunk_file_name(chunk)}
+    if chunk.original_start_line is not None:
+        entry['original_start_line'] = chunk.original_start_line
+        entry['original_end_line'] = chunk.original_end_line
+    return entry
+
+def build_manifest(chunks: List[CodeChunk], files: Dict[str, str], source: str = '',
+                   strategy: str = '', config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Manifest of the chunks and the digest of every chunk file"""
+    return {
+        'version': MANIFEST_VERSION,
+        'source': source,
+        'strategy': strategy,
+        'config': config or {},
+        'chunks': [_manifest_entry(chunk) for chunk in chunks],
+        'files': files,
+    }
+
+def write_chunk_files(chunks: List[CodeChunk], output_dir: str, source: str = '', strategy: str = '',
+                      config: Optional[Dict[str, Any]] = None, max_workers: Optional[int] = None) -> SplitResult:
+    """Write one file per distinct chunk and the manifest into output_dir
+
+    Files whose text is unchanged since the previous manifest are left alone.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    previous = _load_manifest(manifest_path).get('files', {})
+    result = SplitResult(manifest_path)
+
+    texts = {}
+    for chunk in chunks:
+        name = chunk_file_name(chunk)
+        if name not in texts:
+            texts[name] = format_chunk_file(chunk)
+    files = {name: _text_digest(text) for name, text in texts.items()}
+    for name, digest in files.items():
+        if previous.get(name) == digest and os.path.exists(os.path.join(output_dir, name)):
+            result.unchanged.append(name)
+        else:
+            result.written.append(name)
+
+    if result.written:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(lambda name: write_atomic(os.path.join(output_dir, name), texts[name]),
+                              result.written))
+
+    for name in previous:
+        if name not in files:
+            try:
+                os.remove(os.path.join(output_dir, name))
+            except FileNotFoundError:
+                pass
+            result.removed.append(name)
+
+    manifest = build_manifest(chunks, files, source, strategy, config)
+    write_atomic(manifest_path, json.dumps(manifest, indent=2))
+    return result
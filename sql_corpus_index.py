@@ -0,0 +1,1004 @@
+#!/usr/bin/env python3
+"""
+Corpus Index for SQL Procedures
+Keeps what the analyzers find in every file of a directory tree in one SQLite
+database, so questions about the whole corpus are answered by a query instead of
+by re-analyzing hundreds of procedures. Files are re-indexed only when their
+content changes (see sql_watch.ChangeWatcher); unchanged files cost one stat.
+
+Indexed today:
+- procedure and function definitions
+- the call graph, from the SP_CALL / UDF_CALL operations of the adaptive line analysis
+- the adaptive chunks of every file (hybrid strategy, no auto-formatting)
+- table accesses: which procedure, chunk and line reads or writes each table
+- the code of every chunk, in an FTS5 trigram index for substring search
+- a chunk store keyed by normalized content hash, holding the per-chunk analysis
+  and review notes once per unique chunk, across updates and indexed trees
+- a MinHash signature per unique chunk, from which near-duplicate chunks and
+  procedure variant families are clustered (see sql_minhash)
+"""
+
+import os
+import re
+import sys
+import json
+import sqlite3
+import argparse
+from bisect import bisect_left, bisect_right
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Set, Tuple
+from dataclasses import dataclass, field
+
+from sql_batch import map_ordered
+from sql_watch import ChangeWatcher, FileState
+
+if TYPE_CHECKING:
+    from array import array
+    from adaptive_chunked_analyzer import AdaptiveSQLAnalyzer
+
+DEFAULT_DB = 'sql_index.db'
+
+# Bump when extraction changes, so existing databases are rebuilt
+INDEX_VERSION = 8
+
+# Bump when analyze_chunk changes, so stored chunk analyses are recomputed
+CHUNK_ANALYSIS_VERSION = 2
+
+# Operation tags of AdaptiveSQLAnalyzer._analyze_lines that name a callee
+CALL_OPERATION_KINDS = {'SP_CALL': 'procedure', 'UDF_CALL': 'function'}
+
+# Words the EXEC patterns can capture that are not procedure names (EXECUTE AS ...)
+NON_CALLEE_WORDS = {'AS'}
+
+# Unqualified names resolve to SQL Server's default schema
+DEFAULT_SCHEMA = 'DBO'
+
+_NAME_PART = r'(?:\[[^\]]+\]|[A-Z_#][\w#$@]*)'
+_DEFINITION_RE = re.compile(r'\b(?:CREATE|ALTER)\s+(?:OR\s+ALTER\s+)?(PROC|PROCEDURE|FUNCTION)\s+'
+                            rf'({_NAME_PART}(?:\s*\.\s*{_NAME_PART})?)')
+# EXEC @status = procedure, which the adaptive call patterns do not cover
+_EXEC_STATUS_RE = re.compile(rf'\bEXEC(?:UTE)?\s+@\w+\s*=\s*(?P<callee>{_NAME_PART}(?:\.{_NAME_PART}){{0,2}})')
+_CALLEE_RE = re.compile(r'[A-Z_#][\w#$]*(?:\.[A-Z_#][\w#$]*)*')
+
+# Statement heads followed by the table they touch, in the order they are tried at
+# each position; DELETE FROM is consumed whole so its FROM is not also a read.
+# Names must end at a word boundary, and an optional INTO / FROM is never itself
+# taken for the table.
+_TABLE_ACCESS_RE = re.compile(
+    r'\b(?:(?P<INSERT>INSERT\s+(?:INTO\s+)?)|(?P<UPDATE>UPDATE\s+)'
+    r'|(?P<DELETE>DELETE\s+(?:FROM\s+)?)|(?P<MERGE>MERGE\s+(?:INTO\s+)?)'
+    r'|(?P<TRUNCATE>TRUNCATE\s+TABLE\s+)|(?P<SELECT>(?:FROM|JOIN)\s+))'
+    r'(?!(?:INTO|FROM|STATISTICS|SET|TOP)\b)'
+    rf'(?P<table>{_NAME_PART}(?:\.{_NAME_PART}){{0,2}})(?![\w.\]])')
+
+# FROM / JOIN with an alias, which UPDATE and DELETE statements often target instead
+_TABLE_ALIAS_RE = re.compile(rf'\b(?:FROM|JOIN)\s+(?P<table>{_NAME_PART}(?:\.{_NAME_PART}){{0,2}})'
+                             r'\s+(?:AS\s+)?(?P<alias>[A-Z_]\w*)\b')
+_NOT_ALIASES = {'WHERE', 'ON', 'INNER', 'LEFT', 'RIGHT', 'FULL', 'OUTER', 'CROSS', 'JOIN', 'WITH',
+                'SET', 'GROUP', 'ORDER', 'UNION', 'HAVING', 'OPTION', 'WHEN', 'THEN', 'ELSE', 'END',
+                'AND', 'OR', 'AS', 'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'BEGIN', 'IF', 'OUTPUT'}
+
+# The alias and table hint after a FROM / JOIN table, and the further tables of a
+# comma-separated FROM list, each with its own alias and hint
+_ALIAS_AFTER_TABLE = (rf'(?:\s+(?:AS\s+)?(?!(?:{"|".join(sorted(_NOT_ALIASES))})\b)(?P<alias>[A-Z_]\w*)\b)?'
+                      r'(?:\s*WITH\s*\([^)]*\))?')
+_ALIAS_AFTER_TABLE_RE = re.compile(_ALIAS_AFTER_TABLE)
+_FROM_LIST_ITEM_RE = re.compile(rf'\s*,\s*(?P<table>{_NAME_PART}(?:\.{_NAME_PART}){{0,2}})(?![\w.\](])'
+                                + _ALIAS_AFTER_TABLE)
+# The first table of a FROM list continued from the previous line
+_FROM_LIST_CONTINUATION_RE = re.compile(rf'\s*,?\s*(?P<table>{_NAME_PART}(?:\.{_NAME_PART}){{0,2}})(?![\w.\](])'
+                                        + _ALIAS_AFTER_TABLE)
+
+# The source table of MERGE ... USING
+_MERGE_USING_RE = re.compile(rf'\bUSING\s+(?P<table>{_NAME_PART}(?:\.{_NAME_PART}){{0,2}})(?![\w.\](])')
+
+# Common table expressions: WITH name [(columns)] AS ( and , name [(columns)] AS (
+_CTE_RE = re.compile(r'(?:\bWITH|,)\s*(?P<name>[A-Z_]\w*)\s*(?:\([^()]*\)\s*)?AS\s*\(')
+
+# Text inside string literals is never a table reference
+_STRING_LITERAL_RE = re.compile(r"'[^']*'")
+
+# How far below an UPDATE / DELETE its FROM clause may declare the target's alias
+ALIAS_LOOKAHEAD_LINES = 30
+
+# Operations that change a table's contents
+WRITE_OPERATIONS = ('INSERT', 'UPDATE', 'DELETE', 'MERGE', 'TRUNCATE')
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, digest TEXT);
+CREATE TABLE IF NOT EXISTS procedures (name TEXT, kind TEXT, path TEXT, line INTEGER);
+CREATE TABLE IF NOT EXISTS calls (caller TEXT, callee TEXT, kind TEXT, path TEXT, line INTEGER);
+CREATE TABLE IF NOT EXISTS chunks (path TEXT, chunk_id INTEGER, procedure TEXT, start_line INTEGER,
+                                   end_line INTEGER, chunk_type TEXT, title TEXT, content_hash TEXT);
+CREATE TABLE IF NOT EXISTS table_access (table_name TEXT, operation TEXT, procedure TEXT, chunk_id INTEGER,
+                                         path TEXT, line INTEGER);
+CREATE INDEX IF NOT EXISTS procedures_name ON procedures (name);
+CREATE INDEX IF NOT EXISTS procedures_path ON procedures (path);
+CREATE INDEX IF NOT EXISTS calls_caller ON calls (caller);
+CREATE INDEX IF NOT EXISTS calls_callee ON calls (callee);
+CREATE INDEX IF NOT EXISTS calls_path ON calls (path);
+CREATE INDEX IF NOT EXISTS chunks_path ON chunks (path, chunk_id);
+CREATE INDEX IF NOT EXISTS chunks_hash ON chunks (content_hash);
+CREATE INDEX IF NOT EXISTS table_access_table ON table_access (table_name, operation);
+CREATE INDEX IF NOT EXISTS table_access_path ON table_access (path);
+CREATE TABLE IF NOT EXISTS chunk_store (hash TEXT PRIMARY KEY, code TEXT, analysis TEXT);
+CREATE TABLE IF NOT EXISTS chunk_notes (hash TEXT, note TEXT, created TEXT);
+CREATE INDEX IF NOT EXISTS chunk_notes_hash ON chunk_notes (hash);
+CREATE TABLE IF NOT EXISTS chunk_minhash (hash TEXT PRIMARY KEY, signature BLOB, shingles INTEGER);
+'''
+
+# Tables holding per-file rows, cleared when a file changes or disappears. The
+# chunk store and its notes are keyed by content, so they outlive any one tree.
+_FILE_TABLES = ('procedures', 'calls', 'chunks', 'table_access')
+
+# Chunk code keyed by the rowid of its chunks row. The trigram tokenizer turns any
+# quoted query of three or more characters into an indexed, case-insensitive
+# substring search (SQLite 3.34+ with FTS5).
+_TEXT_SCHEMA = "CREATE VIRTUAL TABLE IF NOT EXISTS chunk_text USING fts5(code, tokenize='trigram')"
+
+# Shorter queries have no trigram to look up and scan every chunk instead
+MIN_INDEXED_QUERY = 3
+
+# Code with fewer token shingles (END / GO / a lone comment) resembles everything
+# similar in size and is left out of near-duplicate families
+MIN_FAMILY_SHINGLES = 10
+
+@dataclass
+class ProcedureDefinition:
+    """A CREATE/ALTER PROCEDURE or FUNCTION statement"""
+    name: str
+    kind: str           # 'procedure' or 'function'
+    line: int
+
+@dataclass
+class CallSite:
+    """One call of a procedure or function; caller is None outside any definition"""
+    caller: Optional[str]
+    callee: str
+    kind: str           # 'procedure' or 'function'
+    line: int
+    path: str = ''
+
+@dataclass
+class ChunkRecord:
+    """Where an adaptive chunk sits in its file"""
+    chunk_id: int
+    procedure: Optional[str]
+    start_line: int
+    end_line: int
+    chunk_type: str
+    title: str
+    path: str = ''
+    code: str = ''
+    content_hash: str = ''
+
+@dataclass
+class ChunkMatch:
+    """A chunk containing a search string"""
+    chunk: ChunkRecord
+    match_count: int        # lines of the chunk containing the string
+    first_match: str        # the first of them, stripped
+
+@dataclass
+class TableAccess:
+    """One read or write of a table"""
+    table_name: str
+    operation: str      # SELECT, or one of WRITE_OPERATIONS
+    procedure: Optional[str]
+    chunk_id: Optional[int]
+    line: int
+    path: str = ''
+
+@dataclass
+class FileIndex:
+    """Everything indexed for one SQL file"""
+    procedures: List[ProcedureDefinition] = field(default_factory=list)
+    calls: List[CallSite] = field(default_factory=list)
+    chunks: List[ChunkRecord] = field(default_factory=list)
+    table_accesses: List[TableAccess] = field(default_factory=list)
+
+@dataclass
+class StoredChunk:
+    """One unique chunk of the store, with its analysis, notes and occurrences"""
+    content_hash: str
+    code: str
+    analysis: Optional[Dict]
+    notes: List[Tuple[str, str]]            # (created, note)
+    occurrences: List[ChunkRecord]
+
+@dataclass
+class VariantFamily:
+    """Near-duplicate procedures or chunks, with the member that best stands for them all"""
+    representative: Tuple
+    members: List[Tuple[Tuple, float]]     # (member, estimated similarity to the representative)
+
+def canonical_name(name: str) -> str:
+    """Upper-cased, unbracketed, schema-qualified object name"""
+    parts = [part.strip().strip('[]"').upper() for part in name.split('.')]
+    if len(parts) == 1:
+        parts.insert(0, DEFAULT_SCHEMA)
+    return '.'.join(parts)
+
+def _operation(match: 're.Match') -> str:
+    """Which statement head of _TABLE_ACCESS_RE matched"""
+    return next(operation for operation in WRITE_OPERATIONS + ('SELECT',) if match.group(operation) is not None)
+
+def _from_list(code: str, position: int, first: Optional['re.Pattern'] = None) -> Tuple[List[Tuple[str, Optional[str]]], Optional[str]]:
+    """(table, alias) of the comma-separated FROM list items from position on
+
+    The list starts right after a FROM table, or with first when it continues from
+    the previous line. Also says how the line ends: 'comma' when the list goes on
+    with a table on the next line, 'end' when the line ends after a table (a next
+    line starting with a comma continues the list) and None otherwise.
+    """
+    items = []
+    match = (first or _ALIAS_AFTER_TABLE_RE).match(code, position)
+    if first is not None:
+        if not match:
+            return items, None
+        items.append((match.group('table'), match.group('alias')))
+    position = match.end()
+    while True:
+        match = _FROM_LIST_ITEM_RE.match(code, position)
+        if not match:
+            break
+        items.append((match.group('table'), match.group('alias')))
+        position = match.end()
+    rest = code[position:].strip()
+    return items, 'comma' if rest == ',' else 'end' if not rest else None
+
+def extract_file_index(sql_content: str, analyzer: Optional['AdaptiveSQLAnalyzer'] = None) -> FileIndex:
+    """Definitions, call sites, chunks and table accesses of one SQL text
+
+    A definition extends to the next CREATE/ALTER PROCEDURE or FUNCTION. Line
+    numbers refer to the original text, also when over-long lines were split.
+    """
+    from adaptive_chunked_analyzer import AdaptiveSQLAnalyzer
+    from sql_line_model import build_line_model
+
+    model = build_line_model(sql_content)
+    analyzer = analyzer or AdaptiveSQLAnalyzer()
+    analyzed = analyzer._analyze_lines(model.lines, model.upper_lines)
+    origin = model.source.origin
+    index = FileIndex()
+    current = None
+    procedure_at = []       # definition each virtual line belongs to
+    definition_lines = []   # virtual line of every definition, in order
+    accesses = []           # (virtual line, table as written, operation)
+    aliases = []            # (virtual line, alias, table)
+    ctes = set()            # CTE names of the statement being read
+    cte_depth = None        # parenthesis depth since that statement's WITH
+    from_list = None        # how the previous code line's FROM list ended
+    merge_line = None       # virtual line of a MERGE still waiting for its USING
+
+    for analysis in analyzed:
+        line_upper = analysis['upper']
+        line = origin(analysis['line_number'])[0]
+        defined = None
+        if 'CREATE' in line_upper or 'ALTER' in line_upper:
+            match = _DEFINITION_RE.search(line_upper)
+            if match:
+                kind = 'function' if match.group(1) == 'FUNCTION' else 'procedure'
+                defined = current = canonical_name(re.sub(r'\s+', '', match.group(2)))
+                definition_lines.append(analysis['line_number'])
+                index.procedures.append(ProcedureDefinition(current, kind, line))
+                ctes, cte_depth, from_list, merge_line = set(), None, None, None
+        procedure_at.append(current)
+
+        calls = []
+        for operation in analysis['sql_operations']:
+            tag, _, name = operation.partition(':')
+            kind = CALL_OPERATION_KINDS.get(tag)
+            if kind is not None and name not in NON_CALLEE_WORDS:
+                calls.append((name, kind))
+        if 'EXEC' in line_upper and '=' in line_upper and not analysis['is_comment']:
+            code = _STRING_LITERAL_RE.sub("''", line_upper) if "'" in line_upper else line_upper
+            calls.extend((match.group('callee'), 'procedure') for match in _EXEC_STATUS_RE.finditer(code))
+        seen = set()
+        for name, kind in calls:
+            callee = canonical_name(name)
+            # A parameter list on the definition line looks like a function call
+            if callee == defined or callee in seen or not _CALLEE_RE.fullmatch(callee):
+                continue
+            seen.add(callee)
+            index.calls.append(CallSite(current, callee, kind, line))
+
+        if not analysis['is_comment'] and not analysis['is_empty']:
+            code = _STRING_LITERAL_RE.sub("''", line_upper) if "'" in line_upper else line_upper
+            virtual_line = analysis['line_number']
+            if 'AS' in code:
+                for match in _CTE_RE.finditer(code):
+                    if not match.group().startswith(','):
+                        ctes, cte_depth = set(), 0      # WITH starts a new statement
+                    if cte_depth is not None:
+                        ctes.add(match.group('name'))
+            found = []          # (table, operation) of this line
+            listed = []         # (table, alias) of comma-separated FROM lists
+            if from_list is not None:
+                items, from_list = _from_list(code, 0, _FROM_LIST_CONTINUATION_RE if from_list == 'comma'
+                                              else _FROM_LIST_ITEM_RE)
+                listed.extend(items)
+            for match in _TABLE_ACCESS_RE.finditer(code):
+                operation = _operation(match)
+                if operation == 'SELECT' and (code.startswith('FETCH') or
+                                              code[match.end():].lstrip().startswith('(')):
+                    continue    # a cursor, or a table-valued function call
+                found.append((match.group('table'), operation))
+                if operation == 'SELECT' and match.group('SELECT').startswith('FROM'):
+                    items, from_list = _from_list(code, match.end())
+                    listed.extend(items)
+                elif operation == 'MERGE':
+                    merge_line = virtual_line
+            found.extend((table, 'SELECT') for table, _ in listed)
+            if merge_line is not None and 'USING' in code:
+                match = _MERGE_USING_RE.search(code)
+                if match and virtual_line - merge_line <= ALIAS_LOOKAHEAD_LINES:
+                    found.append((match.group('table'), 'SELECT'))
+                    merge_line = None
+            accesses.extend((virtual_line, table, operation) for table, operation in found
+                            if '.' in table or table.strip('[]') not in ctes)
+            if 'FROM' in code or 'JOIN' in code:
+                for match in _TABLE_ALIAS_RE.finditer(code):
+                    if match.group('alias') not in _NOT_ALIASES:
+                        aliases.append((virtual_line, match.group('alias'), match.group('table')))
+            aliases.extend((virtual_line, alias, table) for table, alias in listed if alias)
+            if cte_depth is not None:
+                cte_depth += code.count('(') - code.count(')')
+                if cte_depth <= 0 and code.rstrip().endswith(';'):
+                    ctes, cte_depth = set(), None
+
+    chunks = analyzer._chunk_analyzed_lines(analyzed) if analyzed else []
+    starts = [chunk.start_line for chunk in chunks]
+    for chunk in chunks:
+        # A chunk belongs to the definition starting inside it, else to the one in
+        # effect at its first code line (a leading comment may precede a definition)
+        position = bisect_left(definition_lines, chunk.start_line)
+        if position < len(definition_lines) and definition_lines[position] <= chunk.end_line:
+            owner = procedure_at[definition_lines[position] - 1]
+        else:
+            first_code = next((analysis['line_number'] for analysis in analyzed[chunk.start_line - 1:chunk.end_line]
+                               if not analysis['is_comment'] and not analysis['is_empty']), chunk.start_line)
+            owner = procedure_at[first_code - 1]
+        index.chunks.append(ChunkRecord(chunk.chunk_id, owner,
+                                        origin(chunk.start_line)[0], origin(chunk.end_line)[0],
+                                        chunk.chunk_type.value, chunk.title, code='\n'.join(chunk.lines),
+                                        content_hash=chunk.content_hash))
+
+    alias_lines = [alias_line for alias_line, _, _ in aliases]
+    for virtual_line, table, operation in accesses:
+        if operation in ('UPDATE', 'DELETE') and '.' not in table:
+            # UPDATE o SET ... FROM Orders o: the target is the aliased table
+            position = bisect_right(alias_lines, virtual_line - 1)
+            while (position < len(aliases) and aliases[position][0] - virtual_line <= ALIAS_LOOKAHEAD_LINES and
+                   procedure_at[aliases[position][0] - 1] == procedure_at[virtual_line - 1]):
+                if aliases[position][1] == table:
+                    table = aliases[position][2]
+                    break
+                position += 1
+        if table.startswith(('@', '#')):
+            continue    # table variables and temporary tables are local
+        table = canonical_name(table)
+        position = bisect_right(starts, virtual_line) - 1
+        chunk_id = None
+        if position >= 0 and chunks[position].end_line >= virtual_line:
+            chunk_id = chunks[position].chunk_id
+        index.table_accesses.append(TableAccess(table, operation, procedure_at[virtual_line - 1],
+                                                chunk_id, origin(virtual_line)[0]))
+    return index
+
+def analyze_chunk(code: str) -> Dict:
+    """Per-chunk analysis kept in the chunk store: the chunk's decision points"""
+    from decision_points_analyzer import DecisionPointsAnalyzer
+    report = DecisionPointsAnalyzer().analyze_content(code, 'chunk')
+    return {
+        'decision_points': report['total_decision_points'],
+        'complexity_score': report['complexity_score'],
+        'complexity_rating': report['complexity_rating'],
+        'max_nesting_level': report['metrics']['max_nesting_level'],
+        'decision_point_types': {name: summary['count']
+                                 for name, summary in sorted(report['decision_point_types'].items())},
+    }
+
+def _analyze_stored_chunk(item: Tuple[str, str]) -> Tuple[str, str, bytes, int]:
+    """(hash, analysis JSON, MinHash signature, shingle count) of one stored chunk; runs in
+    worker processes"""
+    from sql_minhash import shingles, signature, to_bytes
+    content_hash, code = item
+    found = shingles(code)
+    return content_hash, json.dumps(analyze_chunk(code)), to_bytes(signature(found)), len(found)
+
+def index_file(path: str) -> Tuple[str, Optional[FileIndex], Optional[str]]:
+    """(path, index, error) for one file; runs in worker processes"""
+    try:
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            return path, extract_file_index(f.read()), None
+    except OSError as e:
+        return path, None, str(e)
+
+class CorpusIndex:
+    """SQLite index of a directory of SQL files, updated incrementally"""
+
+    def __init__(self, db_path: str = DEFAULT_DB):
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        if self._meta('version') not in (None, str(INDEX_VERSION)):
+            # An older extraction may have stored per-file rows in other columns
+            self._drop_file_tables()
+        self._create_tables()
+
+    def _create_tables(self):
+        self.connection.executescript(_SCHEMA)
+        try:
+            self.connection.execute(_TEXT_SCHEMA)
+            self.text_search = True
+        except sqlite3.OperationalError:
+            self.text_search = False    # SQLite without FTS5: everything but search works
+
+    def _drop_file_tables(self):
+        """Drop every per-file table; the chunk store and its notes are kept"""
+        with self.connection:
+            for table in ('files', 'chunk_text') + _FILE_TABLES:
+                self.connection.execute(f'DROP TABLE IF EXISTS {table}')
+            self.connection.execute("DELETE FROM meta WHERE key IN ('root', 'version')")
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self) -> 'CorpusIndex':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self.connection.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    @property
+    def root(self) -> Optional[str]:
+        """Directory the indexed paths are relative to"""
+        return self._meta('root')
+
+    def update(self, root: str, workers: int = None,
+               log=None) -> Tuple[List[str], List[str], List[str]]:
+        """Bring the index up to date with root: (changed, removed, failed) relative paths
+
+        Only files whose content changed since the last update are analyzed, on a
+        process pool when there are several (workers=1 keeps everything inline).
+        """
+        root = os.path.abspath(root)
+        connection = self.connection
+        if self.root != root or self._meta('version') != str(INDEX_VERSION):
+            # Another tree or a fresh database: no per-file row is reusable
+            self._drop_file_tables()
+            self._create_tables()
+            with connection:
+                connection.executemany('INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                                       [('root', root), ('version', str(INDEX_VERSION))])
+        if self._meta('chunk_analysis_version') != str(CHUNK_ANALYSIS_VERSION):
+            with connection:
+                connection.execute('UPDATE chunk_store SET analysis = NULL')
+                connection.execute('DELETE FROM chunk_minhash')
+                connection.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                                   ('chunk_analysis_version', str(CHUNK_ANALYSIS_VERSION)))
+
+        known = {os.path.join(root, path): FileState(mtime_ns, size, digest)
+                 for path, mtime_ns, size, digest in connection.execute('SELECT * FROM files')}
+        watcher = ChangeWatcher(root, debounce=0, known=known)
+        changed, removed = watcher.poll()
+
+        executor = None
+        if len(changed) > 1 and workers != 1:
+            from concurrent.futures import ProcessPoolExecutor
+            executor = ProcessPoolExecutor(max_workers=workers)
+        failed = []
+        try:
+            with connection:
+                for path in removed:
+                    self._delete_file(os.path.relpath(path, root))
+                for path, file_index, error in map_ordered(index_file, changed, executor):
+                    relative = os.path.relpath(path, root)
+                    self._delete_file(relative)
+                    if file_index is None:
+                        # Keep it out of files so the next update retries it
+                        failed.append(relative)
+                        if log:
+                            log(f"error: {relative}: {error}")
+                        continue
+                    self._insert_file(relative, watcher.known[path], file_index)
+
+            # Chunks seen for the first time anywhere; known ones keep their analysis
+            with connection:
+                pending = connection.execute(
+                    'SELECT s.hash, s.code FROM chunk_store s LEFT JOIN chunk_minhash m ON m.hash = s.hash '
+                    'WHERE s.analysis IS NULL OR m.hash IS NULL').fetchall()
+                for content_hash, analysis, sig, count in map_ordered(_analyze_stored_chunk, pending, executor):
+                    connection.execute('UPDATE chunk_store SET analysis = ? WHERE hash = ?', (analysis, content_hash))
+                    connection.execute('INSERT OR REPLACE INTO chunk_minhash VALUES (?, ?, ?)',
+                                       (content_hash, sig, count))
+            if log and pending:
+                log(f"analyzed {len(pending)} new unique chunk(s)")
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+        changed = [os.path.relpath(path, root) for path in changed]
+        return ([path for path in changed if path not in failed],
+                [os.path.relpath(path, root) for path in removed], failed)
+
+    def _delete_file(self, path: str):
+        self.connection.execute('DELETE FROM files WHERE path = ?', (path,))
+        if self.text_search:
+            self.connection.execute('DELETE FROM chunk_text WHERE rowid IN '
+                                    '(SELECT rowid FROM chunks WHERE path = ?)', (path,))
+        for table in _FILE_TABLES:
+            self.connection.execute(f'DELETE FROM {table} WHERE path = ?', (path,))
+
+    def _insert_file(self, path: str, state: FileState, file_index: FileIndex):
+        connection = self.connection
+        connection.execute('INSERT INTO files VALUES (?, ?, ?, ?)',
+                           (path, state.mtime_ns, state.size, state.digest))
+        connection.executemany('INSERT INTO procedures VALUES (?, ?, ?, ?)',
+                               [(p.name, p.kind, path, p.line) for p in file_index.procedures])
+        connection.executemany('INSERT INTO calls VALUES (?, ?, ?, ?, ?)',
+                               [(c.caller, c.callee, c.kind, path, c.line) for c in file_index.calls])
+        connection.executemany('INSERT INTO chunks VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                               [(path, c.chunk_id, c.procedure, c.start_line, c.end_line, c.chunk_type, c.title,
+                                 c.content_hash) for c in file_index.chunks])
+        connection.executemany('INSERT OR IGNORE INTO chunk_store (hash, code) VALUES (?, ?)',
+                               [(c.content_hash, c.code) for c in file_index.chunks])
+        connection.executemany('INSERT INTO table_access VALUES (?, ?, ?, ?, ?, ?)',
+                               [(a.table_name, a.operation, a.procedure, a.chunk_id, path, a.line)
+                                for a in file_index.table_accesses])
+        if self.text_search:
+            code = {c.chunk_id: c.code for c in file_index.chunks}
+            connection.executemany('INSERT INTO chunk_text (rowid, code) VALUES (?, ?)',
+                                   [(rowid, code[chunk_id]) for rowid, chunk_id in connection.execute(
+                                       'SELECT rowid, chunk_id FROM chunks WHERE path = ?', (path,))])
+
+    # Call graph queries; names are matched after canonical_name
+
+    def definitions(self, name: str) -> List[Tuple[str, str, int]]:
+        """(kind, path, line) of every definition of name"""
+        return self.connection.execute(
+            'SELECT kind, path, line FROM procedures WHERE name = ? ORDER BY path, line',
+            (canonical_name(name),)).fetchall()
+
+    def fan_in(self, name: str) -> List[CallSite]:
+        """Every call site of name"""
+        rows = self.connection.execute(
+            'SELECT caller, callee, kind, line, path FROM calls WHERE callee = ? ORDER BY path, line',
+            (canonical_name(name),))
+        return [CallSite(*row) for row in rows]
+
+    def fan_out(self, name: str) -> List[CallSite]:
+        """Every call made by name"""
+        rows = self.connection.execute(
+            'SELECT caller, callee, kind, line, path FROM calls WHERE caller = ? ORDER BY path, line',
+            (canonical_name(name),))
+        return [CallSite(*row) for row in rows]
+
+    def _neighbours(self, names: Iterable[str], column: str, other: str) -> Set[str]:
+        found = set()
+        for name in names:
+            found.update(value for value, in self.connection.execute(
+                f'SELECT DISTINCT {other} FROM calls WHERE {column} = ? AND {other} IS NOT NULL', (name,)))
+        return found
+
+    def _reachable(self, name: str, column: str, other: str, transitive: bool) -> Dict[str, int]:
+        """Breadth-first walk along calls: {name: distance}"""
+        distances = {}
+        frontier = {canonical_name(name)}
+        depth = 0
+        while frontier:
+            depth += 1
+            frontier = self._neighbours(frontier, column, other) - distances.keys()
+            for found in frontier:
+                distances[found] = depth
+            if not transitive:
+                break
+        return distances
+
+    def callers(self, name: str, transitive: bool = False) -> Dict[str, int]:
+        """Procedures calling name ({caller: distance}), directly or through others"""
+        return self._reachable(name, 'callee', 'caller', transitive)
+
+    def callees(self, name: str, transitive: bool = False) -> Dict[str, int]:
+        """Procedures and functions name calls ({callee: distance}), directly or through others"""
+        return self._reachable(name, 'caller', 'callee', transitive)
+
+    def fan_counts(self) -> List[Tuple[str, int, int]]:
+        """(name, distinct callers, distinct callees) of every defined or called name"""
+        return self.connection.execute('''
+            SELECT name, SUM(fan_in), SUM(fan_out) FROM (
+                SELECT callee AS name, COUNT(DISTINCT caller) AS fan_in, 0 AS fan_out
+                    FROM calls GROUP BY callee
+                UNION ALL
+                SELECT caller, 0, COUNT(DISTINCT callee) FROM calls WHERE caller IS NOT NULL GROUP BY caller
+                UNION ALL
+                SELECT DISTINCT name, 0, 0 FROM procedures
+            ) GROUP BY name ORDER BY name''').fetchall()
+
+    # Chunk search
+
+    def search(self, text: str, limit: Optional[int] = 100) -> List[ChunkMatch]:
+        """Chunks whose code contains text (case-insensitive), in path and line order"""
+        if not self.text_search:
+            raise RuntimeError('this SQLite build has no FTS5 module, so chunk search is unavailable')
+        columns = ('c.chunk_id, c.procedure, c.start_line, c.end_line, c.chunk_type, c.title, c.path, t.code, '
+                   'c.content_hash FROM chunks c JOIN chunk_text t ON t.rowid = c.rowid')
+        if len(text) >= MIN_INDEXED_QUERY:
+            query = f'SELECT {columns} WHERE chunk_text MATCH ?'
+            parameters = ['"' + text.replace('"', '""') + '"']
+        else:
+            query = f'SELECT {columns} WHERE instr(lower(t.code), ?) > 0'
+            parameters = [text.lower()]
+        query += ' ORDER BY c.path, c.start_line'
+        if limit is not None:
+            query += ' LIMIT ?'
+            parameters.append(limit)
+
+        needle = text.lower()
+        matches = []
+        for row in self.connection.execute(query, parameters):
+            chunk = ChunkRecord(*row)
+            lines = [line.strip() for line in chunk.code.split('\n') if needle in line.lower()]
+            matches.append(ChunkMatch(chunk, len(lines), lines[0] if lines else ''))
+        return matches
+
+    # Chunk store
+
+    def chunk_counts(self) -> Tuple[int, int]:
+        """(chunks in the indexed tree, distinct content hashes among them)"""
+        return self.connection.execute('SELECT COUNT(*), COUNT(DISTINCT content_hash) FROM chunks').fetchone()
+
+    def duplicate_chunks(self) -> List[Tuple[str, int, int]]:
+        """(hash, occurrences, files) of every chunk occurring more than once, most frequent first"""
+        return self.connection.execute(
+            'SELECT content_hash, COUNT(*), COUNT(DISTINCT path) FROM chunks GROUP BY content_hash '
+            'HAVING COUNT(*) > 1 ORDER BY COUNT(*) DESC, content_hash').fetchall()
+
+    def _resolve_hash(self, prefix: str) -> str:
+        rows = self.connection.execute('SELECT hash FROM chunk_store WHERE hash >= ? AND hash < ? LIMIT 2',
+                                       (prefix.lower(), prefix.lower() + '\uffff')).fetchall()
+        if len(rows) != 1:
+            raise KeyError(f"{'ambiguous' if rows else 'unknown'} chunk hash {prefix!r}")
+        return rows[0][0]
+
+    def stored_chunk(self, content_hash: str) -> StoredChunk:
+        """A chunk of the store by hash or unique hash prefix; KeyError if there is none"""
+        content_hash = self._resolve_hash(content_hash)
+        code, analysis = self.connection.execute('SELECT code, analysis FROM chunk_store WHERE hash = ?',
+                                                 (content_hash,)).fetchone()
+        notes = self.connection.execute('SELECT created, note FROM chunk_notes WHERE hash = ? ORDER BY rowid',
+                                        (content_hash,)).fetchall()
+        rows = self.connection.execute(
+            'SELECT chunk_id, procedure, start_line, end_line, chunk_type, title, path FROM chunks '
+            'WHERE content_hash = ? ORDER BY path, start_line', (content_hash,))
+        return StoredChunk(content_hash, code, json.loads(analysis) if analysis else None, notes,
+                           [ChunkRecord(*row, content_hash=content_hash) for row in rows])
+
+    def add_note(self, content_hash: str, note: str) -> str:
+        """Attach a review note to a chunk, and so to every copy of it; returns the full hash"""
+        import datetime
+        content_hash = self._resolve_hash(content_hash)
+        with self.connection:
+            self.connection.execute('INSERT INTO chunk_notes VALUES (?, ?, ?)',
+                                    (content_hash, note, datetime.datetime.now().isoformat(timespec='seconds')))
+        return content_hash
+
+    # Near-duplicates
+
+    def chunk_signatures(self, min_shingles: int = 0) -> Dict[str, 'array']:
+        """MinHash signature of every distinct chunk of the indexed tree with at least
+        min_shingles token shingles"""
+        from sql_minhash import from_bytes
+        return {content_hash: from_bytes(sig) for content_hash, sig in self.connection.execute(
+            'SELECT m.hash, m.signature FROM chunk_minhash m '
+            'WHERE m.shingles >= ? AND m.hash IN (SELECT content_hash FROM chunks)', (min_shingles,))}
+
+    def procedure_signatures(self, min_shingles: int = 0) -> Dict[Tuple[str, str], 'array']:
+        """MinHash signature of every (path, procedure), merged from its chunks' signatures;
+        procedures whose chunks have fewer than min_shingles shingles in all are left out"""
+        from sql_minhash import from_bytes, merge
+        chunks = {}
+        for path, procedure, sig, count in self.connection.execute(
+                'SELECT DISTINCT c.path, c.procedure, m.signature, m.shingles FROM chunks c '
+                'JOIN chunk_minhash m ON m.hash = c.content_hash WHERE c.procedure IS NOT NULL'):
+            chunks.setdefault((path, procedure), []).append((sig, count))
+        return {key: merge(from_bytes(sig) for sig, _ in found) for key, found in chunks.items()
+                if sum(count for _, count in found) >= min_shingles}
+
+    def families(self, level: str = 'procedure', threshold: Optional[float] = None) -> List[VariantFamily]:
+        """Groups of near-duplicate procedures ((path, procedure) members) or chunks ((hash,) members)
+
+        Exact copies of a chunk share a hash and are one member at chunk level;
+        see duplicate_chunks for those.
+        """
+        from sql_minhash import DEFAULT_THRESHOLD, cluster, representative, similarity
+        threshold = DEFAULT_THRESHOLD if threshold is None else threshold
+        if level == 'procedure':
+            signatures = self.procedure_signatures(MIN_FAMILY_SHINGLES)
+        else:
+            signatures = {(content_hash,): sig
+                          for content_hash, sig in self.chunk_signatures(MIN_FAMILY_SHINGLES).items()}
+        found = []
+        for keys in cluster(signatures, threshold):
+            keys.sort()
+            chosen = representative(keys, signatures)
+            found.append(VariantFamily(chosen, [(key, round(similarity(signatures[chosen], signatures[key]), 3))
+                                                for key in keys]))
+        return found
+
+    def first_occurrence(self, content_hash: str) -> Optional[ChunkRecord]:
+        """The first place, by path and line, where a chunk occurs"""
+        row = self.connection.execute(
+            'SELECT chunk_id, procedure, start_line, end_line, chunk_type, title, path FROM chunks '
+            'WHERE content_hash = ? ORDER BY path, start_line LIMIT 1', (content_hash,)).fetchone()
+        return ChunkRecord(*row, content_hash=content_hash) if row else None
+
+    # Table access queries
+
+    def table_accesses(self, table: str, operations: Optional[Iterable[str]] = None) -> List[TableAccess]:
+        """Every access to table, optionally only the given operations"""
+        query = ('SELECT table_name, operation, procedure, chunk_id, line, path FROM table_access '
+                 'WHERE table_name = ?')
+        parameters = [canonical_name(table)]
+        if operations is not None:
+            operations = list(operations)
+            query += f" AND operation IN ({', '.join('?' for _ in operations)})"
+            parameters.extend(operations)
+        rows = self.connection.execute(query + ' ORDER BY path, line, operation', parameters)
+        return [TableAccess(*row) for row in rows]
+
+    def writers(self, table: str) -> List[TableAccess]:
+        """Every statement that changes table's contents"""
+        return self.table_accesses(table, WRITE_OPERATIONS)
+
+    def table_summary(self) -> List[Tuple[str, int, int, int]]:
+        """(table, reads, writes, distinct procedures) of every accessed table"""
+        placeholders = ', '.join('?' for _ in WRITE_OPERATIONS)
+        return self.connection.execute(f'''
+            SELECT table_name,
+                   SUM(operation NOT IN ({placeholders})),
+                   SUM(operation IN ({placeholders})),
+                   COUNT(DISTINCT procedure)
+            FROM table_access GROUP BY table_name ORDER BY table_name''',
+            WRITE_OPERATIONS + WRITE_OPERATIONS).fetchall()
+
+    def cycles(self) -> List[List[str]]:
+        """Groups of procedures that call each other (strongly connected components),
+        including procedures that call themselves"""
+        graph = {}
+        for caller, callee in self.connection.execute(
+                'SELECT DISTINCT caller, callee FROM calls WHERE caller IS NOT NULL'):
+            graph.setdefault(caller, []).append(callee)
+            graph.setdefault(callee, [])
+
+        # Iterative Tarjan: recursion would overflow on long call chains
+        order = {}
+        low = {}
+        stack = []
+        on_stack = set()
+        components = []
+        for start in sorted(graph):
+            if start in order:
+                continue
+            work = [(start, iter(sorted(graph[start])))]
+            order[start] = low[start] = len(order)
+            stack.append(start)
+            on_stack.add(start)
+            while work:
+                node, successors = work[-1]
+                for successor in successors:
+                    if successor not in order:
+                        order[successor] = low[successor] = len(order)
+                        stack.append(successor)
+                        on_stack.add(successor)
+                        work.append((successor, iter(sorted(graph[successor]))))
+                        break
+                    if successor in on_stack:
+                        low[node] = min(low[node], order[successor])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[node])
+                    if low[node] == order[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == node:
+                                break
+                        if len(component) > 1 or node in graph[node]:
+                            components.append(sorted(component))
+        return sorted(components)
+
+def _print_rows(rows: List[Dict], output_format: str, columns: List[str]):
+    if output_format == 'json':
+        print(json.dumps(rows, indent=2))
+        return
+    for row in rows:
+        print('\t'.join('' if row[column] is None else str(row[column]) for column in columns))
+
+def main():
+    """Main function for command line usage"""
+    parser = argparse.ArgumentParser(description='Index a directory of SQL procedures and query calls, table accesses and chunk code')
+    parser.add_argument('--db', default=DEFAULT_DB, help=f'Index database (default: {DEFAULT_DB})')
+    parser.add_argument('--format', choices=['text', 'json'], default='text', help='Output format of queries')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    update = subparsers.add_parser('update', help='Index new and changed files, drop removed ones')
+    update.add_argument('root', help='Directory of .sql files')
+    update.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+
+    for command, help_text in (('callers', 'Who calls NAME'), ('callees', 'What NAME calls')):
+        query = subparsers.add_parser(command, help=help_text)
+        query.add_argument('name', help='Procedure or function name (unqualified names are dbo)')
+        query.add_argument('--transitive', action='store_true', help='Follow calls through intermediate procedures')
+        query.add_argument('--sites', action='store_true', help='List every direct call site with file and line')
+
+    fan = subparsers.add_parser('fan', help='Fan-in and fan-out of every procedure')
+    fan.add_argument('--top', type=int, default=None, help='Only the N names with the highest fan-in')
+    subparsers.add_parser('cycles', help='Procedures that call each other recursively')
+
+    table = subparsers.add_parser('table', help='Who reads or writes TABLE')
+    table.add_argument('name', help='Table name (unqualified names are dbo)')
+    access = table.add_mutually_exclusive_group()
+    access.add_argument('--writes', action='store_true', help='Only INSERT/UPDATE/DELETE/MERGE/TRUNCATE')
+    access.add_argument('--reads', action='store_true', help='Only SELECT (FROM / JOIN)')
+    tables = subparsers.add_parser('tables', help='Read and write counts of every accessed table')
+    tables.add_argument('--top', type=int, default=None, help='Only the N most written tables')
+
+    search = subparsers.add_parser('search', help='Chunks whose code contains TEXT')
+    search.add_argument('text', help='Variable, column, literal or any other text (case-insensitive)')
+    search.add_argument('--limit', type=int, default=100, help='Maximum chunks to list (default: 100)')
+    search.add_argument('--code', action='store_true', help='Include the code of every matching chunk')
+
+    duplicates = subparsers.add_parser('duplicates', help='Chunks whose normalized code occurs more than once')
+    duplicates.add_argument('--top', type=int, default=None, help='Only the N most repeated chunks')
+    chunk = subparsers.add_parser('chunk', help='Stored analysis, notes and every occurrence of a chunk')
+    chunk.add_argument('hash', help='Content hash, or a unique prefix of one')
+    chunk.add_argument('--code', action='store_true', help='Include the chunk code')
+    families = subparsers.add_parser('families', help='Near-duplicate procedure variants (or chunks) '
+                                                      'with a representative for each family')
+    families.add_argument('--level', choices=['procedure', 'chunk'], default='procedure',
+                          help='Cluster whole procedures or single chunks (default: procedure)')
+    families.add_argument('--threshold', type=float, default=None,
+                          help='Minimum estimated Jaccard similarity of token shingles (default: 0.8)')
+    families.add_argument('--top', type=int, default=None, help='Only the N largest families')
+    note = subparsers.add_parser('note', help='Attach a review note to a chunk and all its copies')
+    note.add_argument('hash', help='Content hash, or a unique prefix of one')
+    note.add_argument('text', help='Note text')
+
+    args = parser.parse_args()
+
+    with CorpusIndex(args.db) as index:
+        if args.command == 'update':
+            import time
+            start = time.perf_counter()
+            changed, removed, failed = index.update(args.root, args.workers,
+                                                    log=lambda message: print(message, file=sys.stderr))
+            print(f"Indexed {len(changed)} changed file(s), removed {len(removed)}, failed {len(failed)} "
+                  f"in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+            total, unique = index.chunk_counts()
+            print(f"{total} chunk(s), {unique} unique by content", file=sys.stderr)
+            if failed:
+                sys.exit(1)
+        elif args.command in ('callers', 'callees'):
+            if args.sites:
+                sites = index.fan_in(args.name) if args.command == 'callers' else index.fan_out(args.name)
+                _print_rows([vars(site) for site in sites], args.format,
+                            ['caller', 'callee', 'kind', 'path', 'line'])
+            else:
+                found = (index.callers if args.command == 'callers' else index.callees)(args.name, args.transitive)
+                rows = [{'name': name, 'distance': distance}
+                        for name, distance in sorted(found.items(), key=lambda item: (item[1], item[0]))]
+                _print_rows(rows, args.format, ['name', 'distance'])
+        elif args.command == 'fan':
+            counts = sorted(index.fan_counts(), key=lambda row: (-row[1], -row[2], row[0]))
+            rows = [{'name': name, 'fan_in': fan_in, 'fan_out': fan_out}
+                    for name, fan_in, fan_out in counts[:args.top]]
+            _print_rows(rows, args.format, ['name', 'fan_in', 'fan_out'])
+        elif args.command == 'table':
+            operations = WRITE_OPERATIONS if args.writes else ('SELECT',) if args.reads else None
+            _print_rows([vars(access) for access in index.table_accesses(args.name, operations)], args.format,
+                        ['table_name', 'operation', 'procedure', 'chunk_id', 'path', 'line'])
+        elif args.command == 'tables':
+            summary = sorted(index.table_summary(), key=lambda row: (-row[2], -row[1], row[0]))
+            rows = [{'table_name': name, 'reads': reads, 'writes': writes, 'procedures': procedures}
+                    for name, reads, writes, procedures in summary[:args.top]]
+            _print_rows(rows, args.format, ['table_name', 'reads', 'writes', 'procedures'])
+        elif args.command == 'search':
+            try:
+                found = index.search(args.text, args.limit)
+            except RuntimeError as e:
+                print(f"Error: {e}", file=sys.stderr)
+                sys.exit(1)
+            if args.format == 'json':
+                rows = []
+                for match in found:
+                    row = {key: value for key, value in vars(match.chunk).items() if key != 'code' or args.code}
+                    row.update(match_count=match.match_count, first_match=match.first_match)
+                    rows.append(row)
+                print(json.dumps(rows, indent=2))
+            else:
+                for match in found:
+                    chunk = match.chunk
+                    print(f"{chunk.path}:{chunk.start_line}-{chunk.end_line}\tchunk {chunk.chunk_id}\t"
+                          f"{chunk.procedure or ''}\t{chunk.chunk_type}\t{match.match_count}\t{match.first_match}")
+                    if args.code:
+                        print(chunk.code)
+                        print()
+        elif args.command == 'duplicates':
+            rows = [{'content_hash': content_hash, 'occurrences': occurrences, 'files': files}
+                    for content_hash, occurrences, files in index.duplicate_chunks()[:args.top]]
+            _print_rows(rows, args.format, ['content_hash', 'occurrences', 'files'])
+        elif args.command == 'families':
+            found = index.families(args.level, args.threshold)[:args.top]
+
+            def describe(member: Tuple) -> Dict:
+                if args.level == 'procedure':
+                    return {'path': member[0], 'procedure': member[1]}
+                record = index.first_occurrence(member[0])
+                return {'content_hash': member[0], 'path': record.path, 'procedure': record.procedure,
+                        'start_line': record.start_line, 'end_line': record.end_line}
+
+            if args.format == 'json':
+                print(json.dumps([{'representative': describe(family.representative),
+                                   'members': [dict(describe(member), similarity=score)
+                                               for member, score in family.members]}
+                                  for family in found], indent=2))
+            else:
+                for number, family in enumerate(found, 1):
+                    print(f"Family {number}: {len(family.members)} members")
+                    for member, score in family.members:
+                        described = describe(member)
+                        where = described['path']
+                        if args.level == 'chunk':
+                            where += f":{described['start_line']}-{described['end_line']}\t{described['content_hash'][:12]}"
+                        marker = '*' if member == family.representative else ' '
+                        print(f" {marker} {score:.2f}\t{where}\t{described['procedure'] or ''}")
+        elif args.command in ('chunk', 'note'):
+            try:
+                if args.command == 'note':
+                    print(index.add_note(args.hash, args.text))
+                    return
+                stored = index.stored_chunk(args.hash)
+            except KeyError as e:
+                print(f"Error: {e.args[0]}", file=sys.stderr)
+                sys.exit(1)
+            if args.format == 'json':
+                row = {key: value for key, value in vars(stored).items() if key != 'code' or args.code}
+                row['notes'] = [{'created': created, 'note': text} for created, text in stored.notes]
+                row['occurrences'] = [{key: value for key, value in vars(record).items()
+                                       if key not in ('code', 'content_hash')} for record in stored.occurrences]
+                print(json.dumps(row, indent=2))
+            else:
+                print(f"Chunk {stored.content_hash}")
+                if stored.analysis:
+                    analysis = stored.analysis
+                    print(f"Decision points: {analysis['decision_points']}, complexity {analysis['complexity_score']} "
+                          f"({analysis['complexity_rating']}), max nesting {analysis['max_nesting_level']}")
+                for created, text in stored.notes:
+                    print(f"Note ({created}): {text}")
+                print(f"Occurrences: {len(stored.occurrences)}")
+                for record in stored.occurrences:
+                    print(f"  {record.path}:{record.start_line}-{record.end_line}\tchunk {record.chunk_id}\t"
+                          f"{record.procedure or ''}")
+                if args.code:
+                    print()
+                    print(stored.code)
+        else:
+            cycles = index.cycles()
+            if args.format == 'json':
+                print(json.dumps(cycles, indent=2))
+            else:
+                for cycle in cycles:
+                    print(', '.join(cycle))
+
+if __name__ == "__main__":
+    main()
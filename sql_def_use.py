@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Def-Use Index and Minimal Context of Adaptive Chunks
+A chunk's dependencies name whole earlier chunks, so a consumer that wants the
+variables a chunk reads in context has to load every one of them. This index maps
+every variable to the exact statements that define it (parameters, DECLARE, SET,
+SELECT @x = ..., FETCH ... INTO and EXEC ... OUTPUT) and every table to its CREATE
+TABLE or DECLARE ... TABLE statement, one scan over the procedure. A chunk's context
+is then the definitions outside the chunk of what it uses: the declaration of each
+variable, its last few assignments before the chunk, and the declarations of the
+temporary tables and table variables it touches.
+
+Variables and tables are scoped to the procedure (or GO batch) they are declared in,
+so files with several procedures do not mix up their @Id parameters or #Items tables.
+"""
+
+import re
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Set, Tuple
+from dataclasses import dataclass, field
+
+from adaptive_chunked_analyzer import CodeChunk, format_line_range
+
+# Assignments of one variable shown before a chunk; older ones are only counted
+MAX_ASSIGNMENTS = 3
+
+# Longest statement taken as one definition
+MAX_STATEMENT_LINES = 40
+
+DECLARATION_KINDS = ('parameter', 'declare', 'table')
+
+# String literals and comments; unterminated ones run to end of line
+_MASK_RE = re.compile(r"'[^']*(?:''[^']*)*'?|--.*|/\*.*?(?:\*/|$)")
+_VARIABLE_RE = re.compile(r'(?<![@\w])@\w+')
+_WORD_RE = re.compile(r'[#@]*\w+')
+
+_SCOPE_START_RE = re.compile(r'^(?:CREATE|ALTER)\s+(?:OR\s+ALTER\s+)?(?:PROC|PROCEDURE|FUNCTION|TRIGGER)\b')
+_GO_RE = re.compile(r'^GO\b')
+_HEADER_END_RE = re.compile(r'(?:^|\s)AS$|^AS\b')
+_PARAMETER_RE = re.compile(r'(@\w+)\s+(?:AS\s+)?[A-Z_\[]')
+_STATEMENT_START_RE = re.compile(
+    r'^(?:SET|SELECT|IF|ELSE|DECLARE|BEGIN|END|INSERT|UPDATE|DELETE|MERGE|EXEC|EXECUTE|RETURN|WHILE|'
+    r'PRINT|RAISERROR|THROW|COMMIT|ROLLBACK|SAVE|FETCH|OPEN|CLOSE|DEALLOCATE|CREATE|ALTER|DROP|'
+    r'TRUNCATE|GO|WITH|GOTO|BREAK|CONTINUE)\b')
+
+_DECLARE_RE = re.compile(r'\bDECLARE\s+')
+_SET_RE = re.compile(r'\bSET\s+(@\w+)\s*[-+*/%&|^]?=')
+_SELECT_ASSIGN_RE = re.compile(r'\bSELECT\s+(?:TOP\s*\(?\s*\d+\s*\)?\s+)?(@\w+)\s*[-+*/%&|^]?=(?!=)')
+_MORE_ASSIGN_RE = re.compile(r',\s*(@\w+)\s*[-+*/%&|^]?=(?!=)')
+_FETCH_RE = re.compile(r'\bFETCH\b.*?\bINTO\b(.*)')
+_EXEC_RE = re.compile(r'^EXEC(?:UTE)?\b')
+_OUTPUT_RE = re.compile(r'(@\w+)\s+OUT(?:PUT)?\b')
+_NAMED_ARGUMENT_RE = re.compile(r'(?<![@\w])@\w+\s*=(?!=)')
+_CREATE_TABLE_RE = re.compile(r'\bCREATE\s+TABLE\s+((?:\[?\w+\]?\.)*\[?[#\w]+\]?)')
+_TABLE_VARIABLE_RE = re.compile(r'(@\w+)\s+(?:AS\s+)?TABLE\b')
+
+@dataclass
+class Definition:
+    """One statement that defines variables or a table"""
+    kind: str                              # parameter, declare, table, set, select, fetch or output
+    names: List[str]                       # upper-cased variables (with @) or table names it defines
+    start_line: int                        # 1-based, inclusive
+    end_line: int
+
+@dataclass
+class DefUseIndex:
+    """Definitions of one procedure file by scope and name"""
+    lines: List[str]
+    scopes: List[int]                      # scope number of every line
+    in_exec: List[bool]                    # whether every line is part of an EXEC statement
+    variables: Dict[Tuple[int, str], List[Definition]] = field(default_factory=dict)
+    tables: Dict[Tuple[int, str], List[Definition]] = field(default_factory=dict)
+
+@dataclass
+class ChunkContext:
+    """The definitions outside a chunk that its code needs"""
+    chunk_id: int
+    definitions: List[Definition]          # in line order
+    omitted: Dict[str, int] = field(default_factory=dict)   # older assignments left out, by variable
+    dependency_lines: int = 0              # lines of the dependency chunks this stands in for
+
+    @property
+    def line_count(self) -> int:
+        return len({line for definition in self.definitions
+                    for line in range(definition.start_line, definition.end_line + 1)})
+
+def _mask(line: str) -> str:
+    return _MASK_RE.sub(lambda match: "''" if match.group().startswith("'") else '', line).strip().upper()
+
+def _table_key(name: str) -> str:
+    return name.split('.')[-1].strip('[]').upper()
+
+def _statement_end(masked: List[str], start: int) -> int:
+    """Index of the last line of the statement starting at start: where parentheses are
+    balanced and the line ends with ';' or the next line starts another statement"""
+    depth = 0
+    last = min(len(masked), start + MAX_STATEMENT_LINES) - 1
+    for i in range(start, last + 1):
+        depth += masked[i].count('(') - masked[i].count(')')
+        if depth > 0:
+            continue
+        following = masked[i + 1] if i + 1 < len(masked) else ''
+        if masked[i].endswith(';') or not following or _STATEMENT_START_RE.match(following):
+            return i
+    return last
+
+def _declared_names(text: str) -> List[str]:
+    """Variables of a DECLARE statement: the first word of each top-level item"""
+    names = []
+    depth = 0
+    item_start = True
+    for token in re.findall(r'@\w+|[(),]|[^\s(),@]+', text[_DECLARE_RE.search(text).end():]):
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+        elif token == ',' and depth == 0:
+            item_start = True
+            continue
+        elif item_start and token.startswith('@'):
+            names.append(token)
+        item_start = False
+    return names
+
+def build_def_use_index(lines: List[str]) -> DefUseIndex:
+    """Def-use index of a procedure file's lines"""
+    masked = [_mask(line) for line in lines]
+    index = DefUseIndex(lines, [0] * len(lines), [False] * len(lines))
+
+    def add(kind: str, names: List[str], start: int, end: int, scope: int):
+        definition = Definition(kind, list(dict.fromkeys(names)), start + 1, end + 1)
+        for name in definition.names:
+            if kind == 'table' and not name.startswith('@'):
+                index.tables.setdefault((scope, _table_key(name)), []).append(definition)
+            else:
+                index.variables.setdefault((scope, name), []).append(definition)
+
+    scope = 0
+    in_header = False
+    exec_end = -1
+    for i, line in enumerate(masked):
+        if _GO_RE.match(line) or _SCOPE_START_RE.match(line):
+            scope += 1
+            in_header = bool(_SCOPE_START_RE.match(line))
+        index.scopes[i] = scope
+        if not line:
+            continue
+        if in_header:
+            parameters = _PARAMETER_RE.findall(line)
+            if parameters:
+                add('parameter', parameters, i, i, scope)
+            if _HEADER_END_RE.search(line):
+                in_header = False
+            continue
+
+        if _DECLARE_RE.search(line):
+            end = _statement_end(masked, i)
+            text = ' '.join(masked[i:end + 1])
+            table_variables = _TABLE_VARIABLE_RE.findall(text)
+            add('table' if table_variables else 'declare', _declared_names(text), i, end, scope)
+        table = _CREATE_TABLE_RE.search(line)
+        if table:
+            add('table', [table.group(1)], i, _statement_end(masked, i), scope)
+        assigned = _SET_RE.findall(line)
+        if assigned:
+            add('set', assigned, i, _statement_end(masked, i), scope)
+        select = _SELECT_ASSIGN_RE.search(line)
+        if select:
+            end = _statement_end(masked, i)
+            text = ' '.join(masked[i:end + 1])
+            add('select', [select.group(1)] + _MORE_ASSIGN_RE.findall(text[select.end():]), i, end, scope)
+        fetch = _FETCH_RE.search(line)
+        if fetch:
+            add('fetch', _VARIABLE_RE.findall(fetch.group(1)), i, _statement_end(masked, i), scope)
+        if _EXEC_RE.match(line) and i > exec_end:
+            exec_end = _statement_end(masked, i)
+            index.in_exec[i:exec_end + 1] = [True] * (exec_end + 1 - i)
+            outputs = _OUTPUT_RE.findall(' '.join(masked[i:exec_end + 1]))
+            if outputs:
+                add('output', outputs, i, exec_end, scope)
+    return index
+
+def procedure_lines(chunks: List[CodeChunk]) -> List[str]:
+    """The procedure's lines reassembled from its chunks"""
+    lines = [''] * max((chunk.end_line for chunk in chunks), default=0)
+    for chunk in chunks:
+        lines[chunk.start_line - 1:chunk.start_line - 1 + len(chunk.lines)] = chunk.lines
+    return lines
+
+def chunk_context(index: DefUseIndex, chunk: CodeChunk,
+                  max_assignments: int = MAX_ASSIGNMENTS) -> ChunkContext:
+    """Definitions before chunk of the variables and tables its code uses
+
+    For each variable this is its declaration (or parameter) and its last
+    max_assignments assignments before the chunk; definitions inside the chunk are
+    already part of its code. Named arguments of EXEC (the @Parameter in
+    @Parameter = value) are the callee's parameters, not reads of a local variable.
+    """
+    start, end = chunk.start_line, chunk.end_line
+    used_variables = {}                    # (scope, name) in order of first use
+    words: Set[Tuple[int, str]] = set()
+    for line_number in range(start, end + 1):
+        line = _mask(index.lines[line_number - 1])
+        scope = index.scopes[line_number - 1]
+        if index.in_exec[line_number - 1]:
+            line = _NAMED_ARGUMENT_RE.sub(' ', line)
+        for name in _VARIABLE_RE.findall(line):
+            used_variables.setdefault((scope, name), None)
+        words.update((scope, word) for word in _WORD_RE.findall(line))
+
+    chosen = {}
+    omitted = {}
+    for key in used_variables:
+        definitions = index.variables.get(key, [])
+        before = definitions[:bisect_left([d.start_line for d in definitions], start)]
+        declarations = [d for d in before if d.kind in DECLARATION_KINDS]
+        assignments = [d for d in before if d.kind not in DECLARATION_KINDS]
+        for definition in declarations[-1:] + assignments[-max_assignments:]:
+            chosen[id(definition)] = definition
+        if len(assignments) > max_assignments:
+            omitted[key[1]] = len(assignments) - max_assignments
+    for scope, word in words:
+        definitions = index.tables.get((scope, _table_key(word))) if not word.startswith('@') else None
+        if definitions:
+            before = [d for d in definitions if d.start_line < start]
+            if before:
+                chosen[id(before[-1])] = before[-1]
+
+    definitions = sorted(chosen.values(), key=lambda d: (d.start_line, d.end_line))
+    return ChunkContext(chunk.chunk_id, definitions, omitted)
+
+def all_chunk_contexts(chunks: List[CodeChunk], max_assignments: int = MAX_ASSIGNMENTS) -> List[ChunkContext]:
+    """Context of every chunk from one def-use index of the procedure"""
+    index = build_def_use_index(procedure_lines(chunks))
+    sizes = {chunk.chunk_id: chunk.end_line - chunk.start_line + 1 for chunk in chunks}
+    contexts = []
+    for chunk in chunks:
+        context = chunk_context(index, chunk, max_assignments)
+        context.dependency_lines = sum(sizes.get(dependency, 0) for dependency in chunk.dependencies or ())
+        contexts.append(context)
+    return contexts
+
+def context_lines(lines: List[str], context: ChunkContext) -> List[Tuple[int, str]]:
+    """(line number, text) of every line in the context, in order and without repeats"""
+    numbers = sorted({line for definition in context.definitions
+                      for line in range(definition.start_line, definition.end_line + 1)})
+    return [(number, lines[number - 1]) for number in numbers]
+
+def format_context_preamble(lines: List[str], context: ChunkContext) -> str:
+    """SQL preamble of a chunk's context, with a comment before each non-adjacent run of lines"""
+    output = []
+    previous = None
+    for number, text in context_lines(lines, context):
+        if previous is None or number != previous + 1:
+            output.append(f"-- line {number}")
+        output.append(text)
+        previous = number
+    for name, count in context.omitted.items():
+        output.append(f"-- ({count} earlier assignment(s) of {name} not shown)")
+    return '\n'.join(output)
+
+def context_to_dict(lines: List[str], context: ChunkContext) -> Dict[str, Any]:
+    """JSON-ready context of a chunk"""
+    return {'chunk_id': context.chunk_id,
+            'definitions': [{'kind': d.kind, 'names': d.names, 'start_line': d.start_line,
+                             'end_line': d.end_line} for d in context.definitions],
+            'omitted_assignments': context.omitted,
+            'context_lines': context.line_count,
+            'dependency_lines': context.dependency_lines,
+            'lines': [[number, text] for number, text in context_lines(lines, context)]}
+
+def format_chunk_contexts(chunks: List[CodeChunk], contexts: List[ChunkContext],
+                          source_name: Optional[str] = None) -> str:
+    """Markdown of every chunk preceded by its minimal context"""
+    lines = procedure_lines(chunks)
+    context_total = sum(context.line_count for context in contexts)
+    dependency_total = sum(context.dependency_lines for context in contexts)
+    output = [f"# Minimal Chunk Context{f' of {source_name}' if source_name else ''}", "",
+              f"**Context Lines**: {context_total} (dependency chunks: {dependency_total} lines)", ""]
+    for chunk, context in zip(chunks, contexts):
+        output.append(f"## Chunk {chunk.chunk_id}: {chunk.title}")
+        output.append(f"**Lines**: {format_line_range(chunk)}")
+        output.append(f"**Context**: {context.line_count} lines"
+                      f" (dependency chunks: {context.dependency_lines} lines)")
+        output.append("")
+        if context.definitions:
+            output.append("**Definitions used:**")
+            output.append("```sql")
+            output.append(format_context_preamble(lines, context))
+            output.append("```")
+            output.append("")
+        output.append("**Code:**")
+        output.append("```sql")
+        output.extend(chunk.lines)
+        output.append("```")
+        output.append("")
+    return '\n'.join(output)
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Parallel SQL Formatting
+Both formatters restart indentation at every CREATE PROCEDURE, so a multi-procedure
+script is split into shards at those lines, the shards are formatted on a process
+pool and the results are stitched back in order, byte-identical to a sequential run.
+Whole directory trees are formatted (or checked) one file per worker.
+"""
+
+import os
+import sys
+import time
+import tempfile
+from itertools import islice, repeat, zip_longest
+from typing import List, Tuple, Any, Iterable, Iterator, Optional, TextIO
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
+
+from sql_triage import iter_sql_files
+
+# Below this many lines a process pool costs more than it saves
+PARALLEL_MIN_LINES = 20000
+
+def shard_boundaries(lines: List[str], formatter: Any) -> List[int]:
+    """Start index of every shard: 0 plus each line where the formatter resets"""
+    starts = [0]
+    for i, line in enumerate(lines):
+        if i and formatter.resets_indentation(line):
+            starts.append(i)
+    return starts
+
+def _group_shards(starts: List[int], total: int, groups: int) -> List[Tuple[int, int]]:
+    """Merge consecutive shards into about `groups` contiguous (start, end) ranges"""
+    target = max(1, total // groups)
+    ranges = []
+    group_start = 0
+    for start in starts[1:]:
+        if start - group_start >= target:
+            ranges.append((group_start, start))
+            group_start = start
+    ranges.append((group_start, total))
+    return ranges
+
+def _format_shard(formatter: Any, lines: List[str], shard_length: int) -> List[str]:
+    """Format one shard; lines past shard_length are context that is not emitted"""
+    return list(islice(formatter.format_stream(lines), shard_length))
+
+def format_lines_parallel(formatter: Any, lines: List[str], workers: int = None) -> List[str]:
+    """Format lines with procedure-level parallelism, identical to formatter.format_stream"""
+    workers = workers or os.cpu_count() or 1
+    starts = shard_boundaries(lines, formatter) if workers > 1 else [0]
+    if len(starts) < 2:
+        return list(formatter.format_stream(lines))
+
+    ranges = _group_shards(starts, len(lines), workers * 4)
+    context = formatter.shard_context_lines
+    tasks = []
+    for start, end in ranges:
+        if end == len(lines):
+            # Last shard: the formatter's own end-of-input handling applies
+            tasks.append((lines[start:], len(lines) - start))
+        else:
+            tasks.append((lines[start:end + context], end - start))
+
+    formatted = []
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+        futures = [executor.submit(_format_shard, formatter, shard, length) for shard, length in tasks]
+        for future in futures:
+            formatted.extend(future.result())
+    return formatted
+
+def format_content_parallel(formatter: Any, sql_content: str, workers: int = None) -> str:
+    """Parallel equivalent of formatter.format_sql"""
+    return '\n'.join(format_lines_parallel(formatter, sql_content.split('\n'), workers))
+
+def use_parallel(input_file: str, workers: int = None) -> bool:
+    """Whether a file is worth formatting on a process pool"""
+    if workers == 1 or (workers is None and (os.cpu_count() or 1) < 2):
+        return False
+    with open(input_file, 'rb') as f:
+        line_count = sum(chunk.count(b'\n') for chunk in iter(lambda: f.read(1 << 20), b''))
+    return line_count >= PARALLEL_MIN_LINES
+
+@dataclass
+class FileFormatResult:
+    """Outcome of formatting or checking one file"""
+    path: str
+    changed: bool
+    first_difference: Optional[int] = None  # 1-based line of the first differing line
+    error: str = ""
+
+def _split_lines(f: TextIO, block_size: int = 1 << 16) -> Iterator[str]:
+    """Lazily yield the pieces str.split('\\n') would produce for a file's text"""
+    carry = ''
+    for block in iter(lambda: f.read(block_size), ''):
+        pieces = (carry + block).split('\n')
+        carry = pieces.pop()
+        yield from pieces
+    yield carry
+
+def _first_difference(formatted: Iterable[str], original: Iterable[str]) -> Optional[int]:
+    """1-based number of the first line where the two differ, None if identical"""
+    for line_number, (new, old) in enumerate(zip_longest(formatted, original), 1):
+        if new != old:
+            return line_number
+    return None
+
+def format_file_in_place(path: str, formatter: Any, check: bool = False) -> FileFormatResult:
+    """Format one file, replacing it atomically if it changes; only compare in check mode
+
+    The formatted stream is compared with the file as it is produced, so check
+    mode stops reading at the first differing line.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8', errors='ignore') as source, \
+                open(path, 'r', encoding='utf-8', errors='ignore', newline='') as raw:
+            formatted = formatter.format_stream(_split_lines(source))
+            original = _split_lines(raw)
+            if check:
+                difference = _first_difference(formatted, original)
+                return FileFormatResult(path, difference is not None, difference)
+            
+            # Write next to the original so the final rename is atomic
+            directory = os.path.dirname(os.path.abspath(path))
+            fd, temp_path = tempfile.mkstemp(prefix='.sqlfmt-', suffix='.tmp', dir=directory)
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8', newline='') as out:
+                    def written() -> Iterator[str]:
+                        first = True
+                        for line in formatted:
+                            out.write(line if first else '\n' + line)
+                            first = False
+                            yield line
+                    stream = written()
+                    difference = _first_difference(stream, original)
+                    if difference is not None:
+                        # Finish writing whatever the comparison did not consume
+                        for _ in stream:
+                            pass
+                if difference is None:
+                    os.unlink(temp_path)
+                    return FileFormatResult(path, False)
+                os.chmod(temp_path, os.stat(path).st_mode & 0o7777)
+                os.replace(temp_path, path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.unlink(temp_path)
+                raise
+            return FileFormatResult(path, True, difference)
+    except OSError as e:
+        return FileFormatResult(path, False, error=str(e))
+
+def format_tree(paths: Iterable[str], formatter: Any, check: bool = False,
+                workers: int = None) -> List[FileFormatResult]:
+    """Format (or check) every SQL file under the given files and directories concurrently"""
+    files = list(iter_sql_files(paths))
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(files) < 2:
+        return [format_file_in_place(path, formatter, check) for path in files]
+    
+    chunksize = max(1, len(files) // (workers * 8))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(format_file_in_place, files, repeat(formatter), repeat(check),
+                                 chunksize=chunksize))
+
+def main():
+    """Command line interface for formatting or checking whole directory trees"""
+    import argparse
+    # The formatters import this module for sharding, so load them late
+    from sql_formatter import SQLFormatter, FormatSettings
+    from simple_sql_formatter import SimpleSQLFormatter
+    
+    parser = argparse.ArgumentParser(description='Format SQL files across directory trees in parallel')
+    parser.add_argument('paths', nargs='+', help='SQL files or directories')
+    parser.add_argument('--check', action='store_true',
+                        help='Report files that would be reformatted without writing; exit 1 if any')
+    parser.add_argument('--formatter', choices=['advanced', 'simple'], default='advanced',
+                        help='advanced = sql_formatter.SQLFormatter, simple = SimpleSQLFormatter')
+    parser.add_argument('--indent-size', type=int, default=4, help='Number of spaces per indentation level')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    
+    args = parser.parse_args()
+    
+    if args.formatter == 'simple':
+        formatter = SimpleSQLFormatter(indent_size=args.indent_size)
+    else:
+        formatter = SQLFormatter(FormatSettings(indent_size=args.indent_size))
+    
+    start = time.perf_counter()
+    results = format_tree(args.paths, formatter, check=args.check, workers=args.workers)
+    elapsed = time.perf_counter() - start
+    
+    changed = [r for r in results if r.changed]
+    errors = [r for r in results if r.error]
+    for r in changed:
+        if args.check:
+            print(f"would reformat {r.path} (first difference at line {r.first_difference})")
+        else:
+            print(f"reformatted {r.path}")
+    for r in errors:
+        print(f"error: {r.path}: {r.error}", file=sys.stderr)
+    
+    verb = 'would be reformatted' if args.check else 'reformatted'
+    print(f"{len(changed)} of {len(results)} files {verb} in {elapsed:.2f}s", file=sys.stderr)
+    sys.exit(1 if (args.check and changed) or errors else 0)
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,29 @@ Formats SQL code with consistent indentation and structure before chunking analy
 
 import re
 import sys
-from typing import List, Tuple, Optional
+from typing import Optional, Iterable, Iterator
+from collections import deque
 from dataclasses import dataclass
 
+from simple_sql_formatter import write_lines
+from sql_line_classifier import CREATE_PROCEDURE, block_indent_deltas, classify_line
+
+# Operator spacing rules, applied in order
+_OPERATOR_SPACING = [
+    (re.compile(r'([a-zA-Z0-9_\]])\s*' + re.escape(op) + r'\s*([a-zA-Z0-9_@\[\(])'), r'\1 ' + op + r' \2')
+    for op in ('=', '+', '-', '*', '/')
+]
+
+# Every place any spacing rule could match, with its surrounding whitespace
+_OPERATOR_SITE_RE = re.compile(r'[a-zA-Z0-9_\]](\s*)[=+\-*/](\s*)(?=[a-zA-Z0-9_@\[\(])')
+
+def _needs_operator_spacing(line: str) -> bool:
+    """True unless every operator site is already spaced exactly as the rules would leave it"""
+    for match in _OPERATOR_SITE_RE.finditer(line):
+        if match.group(1) != ' ' or match.group(2) != ' ':
+            return True
+    return False
+
 @dataclass
 class FormatSettings:
     """SQL formatting configuration"""
@@ -19,13 +39,60 @@ class FormatSettings:
     uppercase_keywords: bool = False
     add_spacing_around_operators: bool = True
     normalize_whitespace: bool = True
+    lookahead_lines: int = 8
+
+class LineWindow:
+    """Iterator over a stream of lines with a fixed-size lookahead buffer"""
+    
+    def __init__(self, lines: Iterable[str], size: int = 8):
+        self.size = size
+        self.index = -1
+        self.current = None
+        self._lines = iter(lines)
+        self._ahead = deque()
+    
+    def __iter__(self) -> 'LineWindow':
+        return self
+    
+    def __next__(self) -> str:
+        self.current = self._ahead.popleft() if self._ahead else next(self._lines)
+        self.index += 1
+        return self.current
+    
+    def peek(self, offset: int = 1) -> Optional[str]:
+        """Line ``offset`` positions after the current one, or None past the end"""
+        if not 1 <= offset <= self.size:
+            raise ValueError(f"Lookahead offset must be between 1 and {self.size}, got {offset}")
+        while len(self._ahead) < offset:
+            try:
+                self._ahead.append(next(self._lines))
+            except StopIteration:
+                return None
+        return self._ahead[offset - 1]
+
+@dataclass
+class FormatState:
+    """Indentation state of one format_stream call"""
+    indent_level: int = 0
+    base_indent_level: int = 1  # Start at level 1 for procedure content
+    in_procedure: bool = False
+    
+    @property
+    def effective_indent(self) -> int:
+        """Indentation level for the current line"""
+        if self.in_procedure and self.indent_level == 0:
+            return self.base_indent_level
+        return self.base_indent_level + self.indent_level
 
 class SQLFormatter:
-    """Advanced SQL formatter with context-aware indentation"""
+    """Advanced SQL formatter with context-aware indentation
+
+    Formatting state lives in a FormatState per call, so one instance can
+    format many inputs at once from different threads.
+    """
     
     def __init__(self, settings: FormatSettings = None):
         self.settings = settings or FormatSettings()
-        self.reset_state()
         
         # Keywords that increase indentation
         self.indent_increase_keywords = {
@@ -53,28 +120,41 @@ class SQLFormatter:
             'IS', 'NULL', 'NOT', 'IN', 'EXISTS', 'LIKE', 'BETWEEN', 'ASC', 'DESC'
         }
         
-    def reset_state(self):
-        """Reset the formatter state"""
-        self.indent_level = 0
-        self.base_indent_level = 1  # Start at level 1 for procedure content
-        self.in_procedure = False
-        
     def format_sql(self, sql_content: str) -> str:
         """Format entire SQL content with consistent indentation"""
-        lines = sql_content.split('\n')
-        formatted_lines = []
-        
-        self.reset_state()
+        return '\n'.join(self.format_stream(sql_content.split('\n')))
+    
+    def format_stream(self, lines: Iterable[str]) -> Iterator[str]:
+        """Format an iterable of lines, yielding formatted lines (without newlines)
+
+        Only the lookahead window is held in memory, so any input size works.
+        """
+        state = FormatState()
+        window = LineWindow((line.rstrip('\r\n') for line in lines), self.settings.lookahead_lines)
         
-        for i, line in enumerate(lines):
-            formatted_line = self._format_line(line, i, lines)
+        for line in window:
+            formatted_line = self._format_line(line, state, window)
             if formatted_line is not None:
-                formatted_lines.append(formatted_line)
-        
-        return '\n'.join(formatted_lines)
+                yield formatted_line
+    
+    @property
+    def shard_context_lines(self) -> int:
+        """Lines after a shard that its formatting may depend on"""
+        return max(1, self.settings.lookahead_lines)
+    
+    def resets_indentation(self, line: str) -> bool:
+        """True if formatting restarts from scratch at this line (CREATE PROCEDURE)"""
+        line = line.strip()
+        if not line or line.startswith('--') or line.startswith('/*'):
+            return False
+        return bool(classify_line(line) & CREATE_PROCEDURE)
     
-    def _format_line(self, line: str, line_index: int, all_lines: List[str]) -> Optional[str]:
-        """Format a single line with proper indentation and structure"""
+    def _format_line(self, line: str, state: FormatState, window: 'LineWindow' = None) -> Optional[str]:
+        """Format a single line with proper indentation and structure
+
+        ``window`` gives bounded lookahead: ``window.peek(n)`` for n up to
+        ``settings.lookahead_lines``.
+        """
         original_line = line
         
         # Normalize whitespace
@@ -89,100 +169,47 @@ class SQLFormatter:
         
         # Handle comments - maintain current indentation level
         if line.startswith('--') or line.startswith('/*'):
-            return self._indent_text(line)
+            return self._indent_text(line, state)
+        
+        flags = classify_line(line)
         
         # Detect procedure start
-        if re.search(r'\bCREATE\s+PROCEDURE\b', line.upper()):
-            self.in_procedure = True
-            self.indent_level = 0
+        if flags & CREATE_PROCEDURE:
+            state.in_procedure = True
+            state.indent_level = 0
             return line  # No indentation for CREATE PROCEDURE
         
         # Process the line for indentation changes
-        pre_indent, post_indent = self._calculate_indentation_changes(line)
+        pre_indent, post_indent = block_indent_deltas(flags)
         
         # Apply pre-indentation change (for ELSE, END, etc.)
         if pre_indent != 0:
-            self.indent_level += pre_indent
-            if self.indent_level < 0:
-                self.indent_level = 0
+            state.indent_level += pre_indent
+            if state.indent_level < 0:
+                state.indent_level = 0
         
         # Format the line content
         formatted_content = self._format_line_content(line)
         
         # Create the indented line
-        effective_indent = self.base_indent_level if self.in_procedure and self.indent_level == 0 else self.base_indent_level + self.indent_level
-        indented_line = self._create_indented_line(formatted_content, effective_indent)
+        indented_line = self._create_indented_line(formatted_content, state.effective_indent)
         
         # Apply post-indentation change (for BEGIN, IF, etc.)
         if post_indent != 0:
-            self.indent_level += post_indent
-            if self.indent_level < 0:
-                self.indent_level = 0
+            state.indent_level += post_indent
+            if state.indent_level < 0:
+                state.indent_level = 0
         
         return indented_line
     
-    def _calculate_indentation_changes(self, line: str) -> Tuple[int, int]:
-        """Calculate indentation changes before and after processing the line"""
-        line_upper = line.upper().strip()
-        pre_change = 0
-        post_change = 0
-        
-        # Handle END statements (decrease before)
-        if re.search(r'\bEND\b(?!\s+(?:IF|WHILE|FOR|TRY|CATCH|CASE))', line_upper):
-            pre_change -= 1
-        
-        # Handle ELSE, ELSEIF (same level as their opening statement)
-        elif re.search(r'\b(ELSE)\b(?!\s+IF)', line_upper):
-            pre_change -= 1
-            post_change += 1
-        elif re.search(r'\b(ELSEIF|ELSIF)\b', line_upper):
-            pre_change -= 1
-            post_change += 1
-        
-        # Handle CATCH (same level as TRY)
-        elif re.search(r'\bCATCH\b', line_upper):
-            pre_change -= 1
-            post_change += 1
-        
-        # Handle statements that increase indentation after
-        if re.search(r'\bBEGIN\b', line_upper):
-            post_change += 1
-        elif re.search(r'\bIF\b', line_upper):
-            # Check if it's a complex IF statement (likely multi-line)
-            if not self._is_simple_if_statement(line_upper):
-                post_change += 1
-        elif re.search(r'\b(WHILE|FOR|TRY|CASE)\b', line_upper):
-            post_change += 1
-        
-        return pre_change, post_change
-    
-    def _is_simple_if_statement(self, line_upper: str) -> bool:
-        """Determine if an IF statement is a simple single-line statement"""
-        # If the line contains BEGIN or multiple statements, it's complex
-        if re.search(r'\bBEGIN\b', line_upper):
-            return False
-        
-        # If it's a simple assignment or single operation on the same line, it's simple
-        if re.search(r'\bIF\b.*\b(SET|SELECT|RETURN|GOTO)\b.*[;]?\s*$', line_upper):
-            return True
-        
-        # If the condition is very simple, it might be single-line
-        if len(line_upper) < 80 and line_upper.count('(') <= 1:
-            return True
-        
-        # Default to complex for safety
-        return False
-    
     def _format_line_content(self, line: str) -> str:
         """Format the content of the line (keywords, operators, spacing)"""
         # Add spacing around operators if enabled
         if self.settings.add_spacing_around_operators:
-            # Add spaces around common operators
-            line = re.sub(r'([a-zA-Z0-9_\]])\s*=\s*([a-zA-Z0-9_@\[\(])', r'\1 = \2', line)
-            line = re.sub(r'([a-zA-Z0-9_\]])\s*\+\s*([a-zA-Z0-9_@\[\(])', r'\1 + \2', line)
-            line = re.sub(r'([a-zA-Z0-9_\]])\s*-\s*([a-zA-Z0-9_@\[\(])', r'\1 - \2', line)
-            line = re.sub(r'([a-zA-Z0-9_\]])\s*\*\s*([a-zA-Z0-9_@\[\(])', r'\1 * \2', line)
-            line = re.sub(r'([a-zA-Z0-9_\]])\s*/\s*([a-zA-Z0-9_@\[\(])', r'\1 / \2', line)
+            # Add spaces around common operators (skipped when already spaced)
+            if _needs_operator_spacing(line):
+                for pattern, replacement in _OPERATOR_SPACING:
+                    line = pattern.sub(replacement, line)
         
         # Optionally convert keywords to uppercase
         if self.settings.uppercase_keywords:
@@ -192,33 +219,40 @@ class SQLFormatter:
         
         return line
     
-    def _indent_text(self, text: str) -> str:
+    def _indent_text(self, text: str, state: FormatState) -> str:
         """Apply the current indentation level to text"""
-        effective_indent = self.base_indent_level if self.in_procedure and self.indent_level == 0 else self.base_indent_level + self.indent_level
-        return self._create_indented_line(text, effective_indent)
+        return self._create_indented_line(text, state.effective_indent)
     
     def _create_indented_line(self, text: str, indent_level: int) -> str:
         """Create an indented line with the specified level"""
         indent = ' ' * (indent_level * self.settings.indent_size)
         return indent + text
 
-def format_sql_file(input_file: str, output_file: str = None, settings: FormatSettings = None) -> str:
-    """Format a SQL file with consistent indentation"""
+def format_sql_file(input_file: str, output_file: str = None, settings: FormatSettings = None,
+                    workers: int = None) -> str:
+    """Format a SQL file with consistent indentation
+
+    Large multi-procedure files are formatted one procedure shard per process
+    (workers=None picks automatically, workers=1 forces a sequential stream).
+    """
+    # Process pools are only needed here, so keep them out of import time
+    from sql_format_parallel import format_lines_parallel, use_parallel
+    
     if output_file is None:
         output_file = input_file.replace('.sql', '_formatted.sql')
     
     formatter = SQLFormatter(settings)
     
-    # Read the input file
-    with open(input_file, 'r', encoding='utf-8', errors='ignore') as f:
-        sql_content = f.read()
-    
-    # Format the content
-    formatted_content = formatter.format_sql(sql_content)
-    
-    # Write the formatted content
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(formatted_content)
+    if use_parallel(input_file, workers):
+        with open(input_file, 'r', encoding='utf-8', errors='ignore') as f:
+            lines = f.read().split('\n')
+        with open(output_file, 'w', encoding='utf-8') as f:
+            write_lines(format_lines_parallel(formatter, lines, workers), f)
+    else:
+        # Stream the input through the formatter straight into the output file
+        with open(input_file, 'r', encoding='utf-8', errors='ignore') as f_in, \
+                open(output_file, 'w', encoding='utf-8') as f_out:
+            write_lines(formatter.format_stream(f_in), f_out)
     
     print(f"Formatted SQL written to: {output_file}")
     return output_file
@@ -228,12 +262,14 @@ def main():
     import argparse
     
     parser = argparse.ArgumentParser(description='Format SQL stored procedures with consistent indentation')
-    parser.add_argument('input_file', help='Input SQL file to format')
+    parser.add_argument('input_file', help="Input SQL file to format ('-' streams stdin to stdout)")
     parser.add_argument('--output', '-o', help='Output file (default: input_formatted.sql)')
     parser.add_argument('--indent-size', type=int, default=4, help='Number of spaces per indentation level')
     parser.add_argument('--uppercase-keywords', action='store_true', help='Convert SQL keywords to uppercase')
     parser.add_argument('--no-align-columns', action='store_true', help='Disable SELECT column alignment')
     parser.add_argument('--no-spacing', action='store_true', help='Disable spacing around operators')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes for large multi-procedure files (default: automatic)')
+    parser.add_argument('--lookahead', type=int, default=8, help='Lines of lookahead held in memory while streaming')
     
     args = parser.parse_args()
     
@@ -242,11 +278,16 @@ def main():
         indent_size=args.indent_size,
         uppercase_keywords=args.uppercase_keywords,
         align_select_columns=not args.no_align_columns,
-        add_spacing_around_operators=not args.no_spacing
+        add_spacing_around_operators=not args.no_spacing,
+        lookahead_lines=args.lookahead
     )
     
+    if args.input_file == '-':
+        write_lines(SQLFormatter(settings).format_stream(sys.stdin), sys.stdout)
+        return
+    
     # Format the file
-    output_file = format_sql_file(args.input_file, args.output, settings)
+    output_file = format_sql_file(args.input_file, args.output, settings, workers=args.workers)
     
     print(f"SQL formatting complete!")
     print(f"Input: {args.input_file}")
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Incremental chunk and decision-point analysis for documents under edit
+Keeps the per-line analysis, the logical-boundary scan and the built chunks of the
+previous version of a document, and on each update redoes only what the changed
+lines can reach. Chunk boundaries match a full AdaptiveSQLAnalyzer run without
+auto-formatting; decision points match DecisionPointsAnalyzer.
+"""
+
+import time
+from bisect import bisect_left, bisect_right
+from typing import List, Dict, Any, Optional, Tuple, Callable
+from dataclasses import dataclass
+
+from adaptive_chunked_analyzer import AdaptiveSQLAnalyzer, CodeChunk
+from decision_points_analyzer import (DecisionPointsAnalyzer, DecisionPoint,
+                                      _PROCEDURE_START_RE, _PROCEDURE_NAME_RE)
+from sql_line_splitter import split_long_line, LONG_LINE_THRESHOLD
+
+# Check for cancellation every this many analyzed lines or boundary-scan steps
+CANCEL_CHECK_INTERVAL = 256
+
+class AnalysisCancelled(Exception):
+    """The cancellation check fired; the previous state is left untouched"""
+
+@dataclass
+class ChunkRange:
+    """A chunk placed in the document, with its decision-point load"""
+    chunk_id: int
+    chunk: CodeChunk                 # line numbers inside are relative to its group
+    start_line: int                  # 1-based physical lines
+    end_line: int
+    decision_points: List[DecisionPoint]
+    decision_complexity: float
+
+    @property
+    def max_nesting(self) -> int:
+        return max((dp.nesting_level for dp in self.decision_points), default=0)
+
+@dataclass
+class ProcedureRange:
+    """A CREATE/ALTER PROCEDURE or FUNCTION and the lines up to the next one"""
+    name: str
+    start_line: int
+    end_line: int
+
+@dataclass
+class DocumentAnalysis:
+    """Analysis of one document version"""
+    chunks: List[ChunkRange]
+    procedures: List[ProcedureRange]
+    decision_points: List[DecisionPoint]   # line_number is the physical line
+    reanalyzed_lines: int                  # lines in the changed region
+    rescanned_steps: int                   # boundary-scan steps that were re-run
+    rebuilt_groups: int                    # chunk groups that were not cached
+    timings: Dict[str, float]
+
+def decision_complexity(points: List[DecisionPoint]) -> float:
+    """Weighted complexity as in DecisionPointsAnalyzer's report"""
+    return sum(dp.complexity_weight * dp.condition_count * (1 + dp.nesting_level * 0.5) for dp in points)
+
+class _ReadTracker(list):
+    """List that remembers the highest index read through it"""
+    __slots__ = ('max_read',)
+
+    def __getitem__(self, index):
+        if type(index) is int and index > self.max_read:
+            self.max_read = index
+        return list.__getitem__(self, index)
+
+class IncrementalAnalysis:
+    """Analysis state for one document, updated from each new version of its lines"""
+
+    def __init__(self, chunker: AdaptiveSQLAnalyzer = None,
+                 decision_analyzer: DecisionPointsAnalyzer = None,
+                 max_line_length: int = LONG_LINE_THRESHOLD):
+        self.chunker = chunker or AdaptiveSQLAnalyzer()
+        self.decision_analyzer = decision_analyzer or DecisionPointsAnalyzer()
+        self.max_line_length = max_line_length
+
+        # Previous version
+        self.lines = []                 # physical lines
+        self.virtual_phys = []          # physical line index of each virtual line
+        self.infos = []                 # per virtual line: (analysis, comment_only, procedure)
+        self.steps = []                 # boundary scan: (position, block_end, max_line_read)
+        self.step_positions = []
+        self.result = None
+
+        # Caches keyed by text; pruned to what the current version uses
+        self._line_cache = {}
+        self._match_cache = {}
+        self._group_cache = {}
+
+    def update(self, lines: List[str], cancelled: Callable[[], bool] = None) -> DocumentAnalysis:
+        """Analyze a new version of the document, reusing everything the edit did not reach"""
+        cancelled = cancelled or (lambda: False)
+        timings = {}
+        start = time.perf_counter()
+
+        # Changed physical region: old[p:len(old)-s] became new[p:len(new)-s]
+        old = self.lines
+        limit = min(len(old), len(lines))
+        p = 0
+        while p < limit and old[p] == lines[p]:
+            p += 1
+        s = 0
+        while s < limit - p and old[-1 - s] == lines[-1 - s]:
+            s += 1
+
+        virtual, virtual_phys = self._virtualize(lines)
+        va = bisect_left(virtual_phys, p)
+        vb_new = bisect_left(virtual_phys, len(lines) - s)
+        vb_old = bisect_left(self.virtual_phys, len(old) - s)
+
+        changed = []
+        for index, text in enumerate(virtual[va:vb_new], 1):
+            changed.append(self._line_info(text))
+            if index % CANCEL_CHECK_INTERVAL == 0 and cancelled():
+                raise AnalysisCancelled()
+        infos = self.infos[:va] + changed + self.infos[vb_old:]
+        timings['lines'] = _elapsed(start)
+
+        if cancelled():
+            raise AnalysisCancelled()
+        phase = time.perf_counter()
+        steps, rescanned = self._scan_boundaries(infos, va, vb_new, vb_old, cancelled)
+        timings['boundaries'] = _elapsed(phase)
+
+        phase = time.perf_counter()
+        groups = self._group_ranges(self._replay_boundaries(steps, len(infos)), infos)
+        chunks, rebuilt = self._build_chunks(groups, virtual, infos, cancelled)
+        timings['chunks'] = _elapsed(phase)
+
+        if cancelled():
+            raise AnalysisCancelled()
+        phase = time.perf_counter()
+        points = self.decision_analyzer.scan_lines(virtual, match_line=self._match_line)
+        if len(virtual) != len(lines):
+            for dp in points:
+                dp.line_number = virtual_phys[dp.line_number - 1] + 1
+        timings['decision_points'] = _elapsed(phase)
+
+        ranges = self._place_chunks(chunks, virtual_phys, points)
+        procedures = self._procedures(infos, virtual_phys, len(lines))
+        timings['total'] = _elapsed(start)
+
+        # Commit the new version only once nothing can be cancelled any more
+        self.lines = lines
+        self.virtual_phys = virtual_phys
+        self.infos = infos
+        self.steps = steps
+        self.step_positions = [step[0] for step in steps]
+        self._prune_caches(len(infos))
+        self.result = DocumentAnalysis(ranges, procedures, points, len(changed), rescanned, rebuilt, timings)
+        return self.result
+
+    def _virtualize(self, lines: List[str]) -> Tuple[List[str], List[int]]:
+        """Virtual lines (long lines split as sql_line_splitter does) and their physical line index"""
+        max_length = self.max_line_length
+        if max_length <= 0 or all(len(line) <= max_length for line in lines):
+            return lines, list(range(len(lines)))
+
+        virtual, virtual_phys = [], []
+        for index, line in enumerate(lines):
+            if len(line) <= max_length:
+                virtual.append(line)
+                virtual_phys.append(index)
+                continue
+            for _, text in split_long_line(line, max_length):
+                virtual.append(text)
+                virtual_phys.append(index)
+        return virtual, virtual_phys
+
+    def _line_info(self, text: str) -> Tuple[Dict[str, Any], bool, Optional[str]]:
+        """Per-line analysis, comment-only flag and procedure name, cached by text"""
+        info = self._line_cache.get(text)
+        if info is None:
+            analysis = self.chunker._analyze_lines([text])[0]
+            upper = analysis['upper']
+            procedure = None
+            if ('CREATE' in upper or 'ALTER' in upper) and _PROCEDURE_START_RE.search(upper):
+                name_match = _PROCEDURE_NAME_RE.search(upper)
+                procedure = name_match.group(2) if name_match else 'Unknown'
+            info = (analysis, self.chunker._is_comment_only_lines([text]), procedure)
+            self._line_cache[text] = info
+        return info
+
+    def _match_line(self, line_clean: str) -> List[Tuple[str, int, int]]:
+        matches = self._match_cache.get(line_clean)
+        if matches is None:
+            matches = self._match_cache[line_clean] = self.decision_analyzer.match_line(line_clean)
+        return matches
+
+    def _scan_boundaries(self, infos: List[Tuple], va: int, vb_new: int, vb_old: int,
+                         cancelled: Callable[[], bool]) -> Tuple[List[Tuple], int]:
+        """Re-run the logical-boundary scan from the first step the edit could affect
+
+        Steps that only read lines before the edit are kept. The scan resumes from
+        there and stops as soon as it lands on a position the old scan also visited
+        past the edit, after which the old steps are reused shifted.
+        """
+        analyzed = _ReadTracker(info[0] for info in infos)
+        old_steps = self.steps
+        old_positions = self.step_positions
+        delta = vb_new - vb_old
+        # A step that read the last line may also depend on where the text ended
+        horizon = min(va, len(self.infos) - 1)
+
+        kept = 0
+        while kept < len(old_steps) and old_steps[kept][2] < horizon:
+            kept += 1
+        steps = old_steps[:kept]
+        if kept < len(old_steps):
+            i = old_steps[kept][0]
+        elif steps:
+            last_position, last_end, _ = steps[-1]
+            i = last_end + 1 if last_end is not None else last_position + 1
+        else:
+            i = 0
+
+        block_end = self.chunker._logical_block_end
+        total = len(analyzed)
+        rescanned = 0
+        while i < total:
+            if i >= vb_new:
+                index = bisect_left(old_positions, i - delta)
+                if index < len(old_positions) and old_positions[index] == i - delta:
+                    tail = old_steps[index:]
+                    if delta:
+                        tail = [(position + delta, end + delta if end is not None else None, read + delta)
+                                for position, end, read in tail]
+                    steps.extend(tail)
+                    break
+
+            analyzed.max_read = i
+            end = block_end(analyzed, i)
+            steps.append((i, end, analyzed.max_read))
+            i = end + 1 if end is not None else i + 1
+            rescanned += 1
+            if rescanned % CANCEL_CHECK_INTERVAL == 0 and cancelled():
+                raise AnalysisCancelled()
+        return steps, rescanned
+
+    @staticmethod
+    def _replay_boundaries(steps: List[Tuple], total: int) -> List[int]:
+        """The boundaries AdaptiveSQLAnalyzer._identify_logical_boundaries produces for these steps"""
+        boundaries = [0]
+        for position, end, _ in steps:
+            if end is not None:
+                if position > 0 and boundaries[-1] != position:
+                    boundaries.append(position)
+                if end + 1 < total:
+                    boundaries.append(end + 1)
+        if boundaries[-1] != total:
+            boundaries.append(total)
+        return boundaries
+
+    @staticmethod
+    def _group_ranges(boundaries: List[int], infos: List[Tuple]) -> List[List[int]]:
+        """Boundaries of each chunk group: comment-only ranges join the range that follows"""
+        ranges = list(zip(boundaries, boundaries[1:]))
+        comment_only = [all(info[1] for info in infos[start:end]) for start, end in ranges]
+        groups = []
+        i = 0
+        while i < len(ranges):
+            j = i
+            if comment_only[i]:
+                while j < len(ranges) and comment_only[j]:
+                    j += 1
+                if j == len(ranges):
+                    j = i       # trailing comments stay on their own
+            groups.append([start for start, _ in ranges[i:j + 1]] + [ranges[j][1]])
+            i = j + 1
+        return groups
+
+    def _build_chunks(self, groups: List[List[int]], virtual: List[str], infos: List[Tuple],
+                      cancelled: Callable[[], bool]) -> Tuple[List[Tuple[int, CodeChunk]], int]:
+        """(group start, chunk) for every chunk, building only groups not seen before"""
+        chunker = self.chunker
+        chunks = []
+        rebuilt = 0
+        for cuts in groups:
+            group_start = cuts[0]
+            key = (tuple(virtual[group_start:cuts[-1]]), tuple(cut - group_start for cut in cuts))
+            built = self._group_cache.get(key)
+            if built is None:
+                if cancelled():
+                    raise AnalysisCancelled()
+                analyzed = [info[0] for info in infos[group_start:cuts[-1]]]
+                relative = key[1]
+                pieces = [chunker._create_chunk(analyzed[start:end], 0, start + 1)
+                          for start, end in zip(relative, relative[1:])]
+                merged = chunker._merge_chunks(pieces)
+                built = self._group_cache[key] = chunker._apply_adaptive_subdivision([merged], analyzed)
+                rebuilt += 1
+            chunks.extend((group_start, chunk) for chunk in built)
+        return chunks, rebuilt
+
+    @staticmethod
+    def _place_chunks(chunks: List[Tuple[int, CodeChunk]], virtual_phys: List[int],
+                      points: List[DecisionPoint]) -> List[ChunkRange]:
+        """Chunks on physical lines, each with the decision points that fall inside it"""
+        ranges = []
+        for chunk_id, (group_start, chunk) in enumerate(chunks, 1):
+            start = virtual_phys[group_start + chunk.start_line - 1] + 1
+            end = virtual_phys[min(group_start + chunk.end_line, len(virtual_phys)) - 1] + 1
+            ranges.append(ChunkRange(chunk_id, chunk, start, end, [], 0.0))
+
+        starts = [r.start_line for r in ranges]
+        for dp in points:
+            index = bisect_right(starts, dp.line_number) - 1
+            if index >= 0:
+                ranges[index].decision_points.append(dp)
+        for r in ranges:
+            r.decision_complexity = round(decision_complexity(r.decision_points), 2)
+        return ranges
+
+    @staticmethod
+    def _procedures(infos: List[Tuple], virtual_phys: List[int], line_count: int) -> List[ProcedureRange]:
+        starts = [(virtual_phys[i] + 1, info[2]) for i, info in enumerate(infos) if info[2]]
+        procedures = []
+        for k, (line, name) in enumerate(starts):
+            end = starts[k + 1][0] - 1 if k + 1 < len(starts) else line_count
+            procedures.append(ProcedureRange(name, line, max(line, end)))
+        return procedures
+
+    def _prune_caches(self, line_count: int):
+        """Drop cached entries once they clearly outnumber the document's lines"""
+        limit = 4 * line_count + 1024
+        if len(self._line_cache) > limit:
+            self._line_cache = {info[0]['original']: info for info in self.infos}
+        if len(self._match_cache) > limit:
+            self._match_cache = {}
+        if len(self._group_cache) > limit // 8:
+            self._group_cache = {}
+
+def _elapsed(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 2)
@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+"""
+SQL Language Server
+Speaks the Language Server Protocol over stdio and shows the adaptive chunking and
+decision-point analysis inside the editor:
+
+    document symbols   procedures, with their chunks as children
+    folding ranges     one per chunk and procedure
+    code lenses        decision points and complexity above every chunk
+    diagnostics        chunks whose decision-point complexity passes a threshold
+
+Edits are applied incrementally and re-analyzed with sql_incremental_analysis, so
+only the lines an edit can reach are redone. Bursts of changes are coalesced by a
+short debounce, and an analysis still running when a newer version arrives is
+abandoned, so CPU time only goes to the latest text.
+"""
+
+import sys
+import json
+import time
+import threading
+from typing import List, Dict, Any, Optional, BinaryIO
+
+from adaptive_chunked_analyzer import AdaptiveSQLAnalyzer
+from decision_points_analyzer import DecisionPointsAnalyzer
+from sql_incremental_analysis import IncrementalAnalysis, DocumentAnalysis, ChunkRange, AnalysisCancelled
+
+# Wait this long after the last change before analyzing
+DEFAULT_DEBOUNCE_MS = 30
+
+# Chunks whose decision-point complexity reaches this get a diagnostic
+DEFAULT_COMPLEXITY_THRESHOLD = 40.0
+
+# LSP constants
+TEXT_DOCUMENT_SYNC_INCREMENTAL = 2
+SYMBOL_KIND_MODULE = 2
+SYMBOL_KIND_FUNCTION = 12
+SEVERITY_WARNING = 2
+METHOD_NOT_FOUND = -32601
+REQUEST_CANCELLED = -32800
+
+class _Document:
+    """An open text document and its latest analysis"""
+
+    def __init__(self, uri: str, version: int, text: str, engine: IncrementalAnalysis):
+        self.uri = uri
+        self.version = version
+        self.lines = text.split('\n')
+        self.engine = engine
+        self.analysis = None            # DocumentAnalysis of analyzed_lines
+        self.analyzed_lines = None
+        self.analyzed_version = None
+        self.changed_at = time.monotonic()
+        self.dirty = True
+        self.closed = False
+        self.waiting = []               # (request id, method) answered after the next analysis
+
+def _utf16_index(line: str, character: int) -> int:
+    """String index of an LSP (UTF-16 code unit) character offset"""
+    if line.isascii():
+        return min(character, len(line))
+    units = 0
+    for index, ch in enumerate(line):
+        if units >= character:
+            return index
+        units += 2 if ord(ch) > 0xFFFF else 1
+    return len(line)
+
+def apply_change(lines: List[str], change: Dict[str, Any]) -> List[str]:
+    """New line list after one TextDocumentContentChangeEvent"""
+    if 'range' not in change:
+        return change['text'].split('\n')
+    start, end = change['range']['start'], change['range']['end']
+    start_line = min(start['line'], len(lines))
+    end_line = min(end['line'], len(lines))
+    first = lines[start_line] if start_line < len(lines) else ''
+    last = lines[end_line] if end_line < len(lines) else ''
+    replaced = (first[:_utf16_index(first, start['character'])] + change['text'] +
+                last[_utf16_index(last, end['character']):])
+    return lines[:start_line] + replaced.split('\n') + lines[end_line + 1:]
+
+def _line_range(lines: List[str], start_line: int, end_line: int) -> Dict[str, Any]:
+    """LSP range covering 1-based lines start_line..end_line"""
+    end_line = min(end_line, len(lines))
+    return {
+        'start': {'line': start_line - 1, 'character': 0},
+        'end': {'line': end_line - 1, 'character': len(lines[end_line - 1]) if end_line else 0},
+    }
+
+class LanguageServer:
+    """LSP server over a pair of binary streams"""
+
+    def __init__(self, reader: BinaryIO, writer: BinaryIO, debounce_ms: float = DEFAULT_DEBOUNCE_MS,
+                 complexity_threshold: float = DEFAULT_COMPLEXITY_THRESHOLD, verbose: bool = False):
+        self.reader = reader
+        self.writer = writer
+        self.debounce = debounce_ms / 1000
+        self.complexity_threshold = complexity_threshold
+        self.verbose = verbose
+        self.documents = {}
+        # Analyzers hold no per-document state, so every document shares them
+        self.chunker = AdaptiveSQLAnalyzer()
+        self.decision_analyzer = DecisionPointsAnalyzer()
+        self.condition = threading.Condition()
+        self.write_lock = threading.Lock()
+        self.running = True
+        self.shutdown_requested = False
+        self.handlers = {
+            'initialize': self._initialize,
+            'shutdown': self._shutdown,
+            'textDocument/documentSymbol': self._deferred,
+            'textDocument/foldingRange': self._deferred,
+            'textDocument/codeLens': self._deferred,
+        }
+        self.notifications = {
+            'exit': self._exit,
+            'textDocument/didOpen': self._did_open,
+            'textDocument/didChange': self._did_change,
+            'textDocument/didClose': self._did_close,
+            '$/cancelRequest': self._cancel_request,
+        }
+
+    def serve(self) -> int:
+        """Handle messages until exit; returns the process exit code"""
+        worker = threading.Thread(target=self._analysis_loop, daemon=True)
+        worker.start()
+        while self.running:
+            message = self._read_message()
+            if message is None:
+                break
+            self._dispatch(message)
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        return 0 if self.shutdown_requested else 1
+
+    # Transport
+
+    def _read_message(self) -> Optional[Dict[str, Any]]:
+        length = None
+        while True:
+            header = self.reader.readline()
+            if not header:
+                return None
+            header = header.strip()
+            if not header:
+                break
+            name, _, value = header.decode('ascii').partition(':')
+            if name.lower() == 'content-length':
+                length = int(value)
+        if length is None:
+            return None
+        return json.loads(self.reader.read(length).decode('utf-8'))
+
+    def _send(self, message: Dict[str, Any]):
+        body = json.dumps(dict(message, jsonrpc='2.0'), separators=(',', ':')).encode('utf-8')
+        with self.write_lock:
+            self.writer.write(b'Content-Length: %d\r\n\r\n' % len(body) + body)
+            self.writer.flush()
+
+    def _respond(self, request_id: Any, result: Any = None, error: Dict[str, Any] = None):
+        if error is not None:
+            self._send({'id': request_id, 'error': error})
+        else:
+            self._send({'id': request_id, 'result': result})
+
+    def _dispatch(self, message: Dict[str, Any]):
+        method = message.get('method')
+        if method is None:
+            return      # a response to something we never send
+        params = message.get('params') or {}
+        if 'id' in message:
+            handler = self.handlers.get(method)
+            if handler is None:
+                self._respond(message['id'], error={'code': METHOD_NOT_FOUND, 'message': f'Unknown method {method}'})
+                return
+            handler(message['id'], method, params)
+        else:
+            handler = self.notifications.get(method)
+            if handler is not None:
+                handler(params)
+
+    # Lifecycle
+
+    def _initialize(self, request_id: Any, method: str, params: Dict[str, Any]):
+        options = params.get('initializationOptions') or {}
+        self.debounce = options.get('debounceMs', self.debounce * 1000) / 1000
+        self.complexity_threshold = options.get('complexityThreshold', self.complexity_threshold)
+        self._respond(request_id, {
+            'capabilities': {
+                'textDocumentSync': {'openClose': True, 'change': TEXT_DOCUMENT_SYNC_INCREMENTAL},
+                'documentSymbolProvider': True,
+                'foldingRangeProvider': True,
+                'codeLensProvider': {'resolveProvider': False},
+            },
+            'serverInfo': {'name': 'sql-analysis'},
+        })
+
+    def _shutdown(self, request_id: Any, method: str, params: Dict[str, Any]):
+        self.shutdown_requested = True
+        self._respond(request_id, None)
+
+    def _exit(self, params: Dict[str, Any]):
+        self.running = False
+
+    # Document synchronization
+
+    def _did_open(self, params: Dict[str, Any]):
+        item = params['textDocument']
+        with self.condition:
+            engine = IncrementalAnalysis(self.chunker, self.decision_analyzer)
+            self.documents[item['uri']] = _Document(item['uri'], item.get('version', 0), item['text'], engine)
+            self.condition.notify_all()
+
+    def _did_change(self, params: Dict[str, Any]):
+        identifier = params['textDocument']
+        with self.condition:
+            document = self.documents.get(identifier['uri'])
+            if document is None:
+                return
+            lines = document.lines
+            for change in params['contentChanges']:
+                lines = apply_change(lines, change)
+            document.lines = lines
+            document.version = identifier.get('version', document.version + 1)
+            document.changed_at = time.monotonic()
+            document.dirty = True
+            self.condition.notify_all()
+
+    def _did_close(self, params: Dict[str, Any]):
+        uri = params['textDocument']['uri']
+        with self.condition:
+            document = self.documents.pop(uri, None)
+            if document is None:
+                return
+            document.closed = True
+            waiting, document.waiting = document.waiting, []
+        for request_id, _ in waiting:
+            self._respond(request_id, None)
+        self._send({'method': 'textDocument/publishDiagnostics', 'params': {'uri': uri, 'diagnostics': []}})
+
+    def _cancel_request(self, params: Dict[str, Any]):
+        request_id = params.get('id')
+        with self.condition:
+            for document in self.documents.values():
+                for entry in document.waiting:
+                    if entry[0] == request_id:
+                        document.waiting.remove(entry)
+                        break
+                else:
+                    continue
+                break
+            else:
+                return
+        self._respond(request_id, error={'code': REQUEST_CANCELLED, 'message': 'Request cancelled'})
+
+    # Feature requests: answered from the analysis of the current version
+
+    def _deferred(self, request_id: Any, method: str, params: Dict[str, Any]):
+        uri = params['textDocument']['uri']
+        with self.condition:
+            document = self.documents.get(uri)
+            if document is None:
+                pass
+            elif document.analyzed_version != document.version:
+                document.waiting.append((request_id, method))
+                return
+            else:
+                analysis, lines = document.analysis, document.analyzed_lines
+        self._respond(request_id, self._feature(method, analysis, lines) if document else None)
+
+    def _feature(self, method: str, analysis: DocumentAnalysis, lines: List[str]) -> Any:
+        if method == 'textDocument/documentSymbol':
+            return self._symbols(analysis, lines)
+        if method == 'textDocument/foldingRange':
+            return self._folding_ranges(analysis)
+        return self._code_lenses(analysis, lines)
+
+    def _symbols(self, analysis: DocumentAnalysis, lines: List[str]) -> List[Dict[str, Any]]:
+        procedures = []
+        top_level = []
+        for procedure in analysis.procedures:
+            procedures.append({
+                'name': procedure.name,
+                'kind': SYMBOL_KIND_FUNCTION,
+                'start': procedure.start_line,
+                'end': procedure.end_line,
+                'children': [],
+            })
+        starts = [p['start'] for p in procedures]
+        for r in analysis.chunks:
+            symbol = {
+                'name': f"{r.chunk_id}. {r.chunk.title}",
+                'detail': f"lines {r.start_line}-{r.end_line}, complexity {r.chunk.complexity_score}",
+                'kind': SYMBOL_KIND_MODULE,
+                'range': _line_range(lines, r.start_line, r.end_line),
+                'selectionRange': _line_range(lines, r.start_line, r.start_line),
+            }
+            owner = None
+            for index in range(len(starts) - 1, -1, -1):
+                if starts[index] <= r.start_line:
+                    owner = procedures[index]
+                    break
+            if owner is None:
+                top_level.append(symbol)
+            else:
+                owner['children'].append(symbol)
+                owner['end'] = max(owner['end'], r.end_line)
+
+        symbols = []
+        for p in procedures:
+            symbols.append({
+                'name': p['name'],
+                'detail': f"{len(p['children'])} chunks",
+                'kind': SYMBOL_KIND_FUNCTION,
+                'range': _line_range(lines, p['start'], p['end']),
+                'selectionRange': _line_range(lines, p['start'], p['start']),
+                'children': p['children'],
+            })
+        return top_level + symbols
+
+    @staticmethod
+    def _folding_ranges(analysis: DocumentAnalysis) -> List[Dict[str, Any]]:
+        spans = [(p.start_line, p.end_line) for p in analysis.procedures]
+        spans += [(r.start_line, r.end_line) for r in analysis.chunks]
+        return [{'startLine': start - 1, 'endLine': end - 1, 'kind': 'region'}
+                for start, end in sorted(set(spans)) if end > start]
+
+    def _code_lenses(self, analysis: DocumentAnalysis, lines: List[str]) -> List[Dict[str, Any]]:
+        rating = self._rating
+        lenses = []
+        for r in analysis.chunks:
+            count = len(r.decision_points)
+            title = (f"{count} decision point{'s' if count != 1 else ''}, "
+                     f"complexity {r.decision_complexity} ({rating(r)})" if count else "no decision points")
+            lenses.append({
+                'range': _line_range(lines, r.start_line, r.start_line),
+                'command': {'title': f"Chunk {r.chunk_id}: {title}", 'command': ''},
+            })
+        return lenses
+
+    def _rating(self, chunk_range: ChunkRange) -> str:
+        return self.decision_analyzer._get_complexity_rating(chunk_range.decision_complexity,
+                                                             len(chunk_range.decision_points))
+
+    def _diagnostics(self, analysis: DocumentAnalysis, lines: List[str]) -> List[Dict[str, Any]]:
+        diagnostics = []
+        for r in analysis.chunks:
+            if r.decision_complexity < self.complexity_threshold:
+                continue
+            diagnostics.append({
+                'range': _line_range(lines, r.start_line, r.start_line),
+                'severity': SEVERITY_WARNING,
+                'source': 'sql-analysis',
+                'message': (f"Chunk {r.chunk_id} has decision-point complexity {r.decision_complexity} "
+                            f"({self._rating(r)}): {len(r.decision_points)} decision points, "
+                            f"max nesting {r.max_nesting}"),
+            })
+        return diagnostics
+
+    # Analysis worker
+
+    def _analysis_loop(self):
+        """Analyze the most overdue dirty document, abandoning runs made stale by newer edits"""
+        while True:
+            with self.condition:
+                while True:
+                    if not self.running:
+                        return
+                    due = [(document.changed_at + self.debounce, document)
+                           for document in self.documents.values() if document.dirty]
+                    if not due:
+                        self.condition.wait()
+                        continue
+                    deadline, document = min(due, key=lambda item: item[0])
+                    remaining = deadline - time.monotonic()
+                    if remaining > 0:
+                        self.condition.wait(remaining)
+                        continue
+                    document.dirty = False
+                    version, lines = document.version, document.lines
+                    break
+
+            def stale(document=document, version=version) -> bool:
+                return document.version != version or document.closed or not self.running
+
+            try:
+                analysis = document.engine.update(lines, cancelled=stale)
+            except AnalysisCancelled:
+                if self.verbose:
+                    print(f"cancelled {document.uri} v{version}", file=sys.stderr)
+                continue
+
+            with self.condition:
+                if document.closed:
+                    continue
+                document.analysis = analysis
+                document.analyzed_lines = lines
+                document.analyzed_version = version
+                current = document.version == version
+                waiting, document.waiting = (document.waiting, []) if current else ([], document.waiting)
+
+            if self.verbose:
+                print(f"analyzed {document.uri} v{version}: {len(analysis.chunks)} chunks, "
+                      f"{analysis.reanalyzed_lines} lines, {analysis.rescanned_steps} scan steps, "
+                      f"{analysis.rebuilt_groups} groups, {analysis.timings}", file=sys.stderr)
+            self._send({'method': 'textDocument/publishDiagnostics', 'params': {
+                'uri': document.uri,
+                'version': version,
+                'diagnostics': self._diagnostics(analysis, lines),
+            }})
+            for request_id, method in waiting:
+                self._respond(request_id, self._feature(method, analysis, lines))
+
+def main():
+    """Run the language server on stdio"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Language Server Protocol server for SQL chunking and decision points')
+    parser.add_argument('--stdio', action='store_true', help='Communicate over stdio (the default; accepted for client compatibility)')
+    parser.add_argument('--debounce-ms', type=float, default=DEFAULT_DEBOUNCE_MS,
+                        help='Quiet period after the last edit before re-analyzing')
+    parser.add_argument('--complexity-threshold', type=float, default=DEFAULT_COMPLEXITY_THRESHOLD,
+                        help='Decision-point complexity at which a chunk gets a warning')
+    parser.add_argument('--verbose', action='store_true', help='Log analysis timings to stderr')
+
+    args = parser.parse_args()
+
+    server = LanguageServer(sys.stdin.buffer, sys.stdout.buffer, debounce_ms=args.debounce_ms,
+                            complexity_threshold=args.complexity_threshold, verbose=args.verbose)
+    sys.exit(server.serve())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Shared SQL Line Classifier for the formatters
+Finds every indentation-relevant keyword on a line in one compiled scan, ignoring
+keywords inside string literals and comments, and turns them into (pre, post)
+indentation deltas for either formatter.
+"""
+
+import re
+from functools import lru_cache
+from typing import Tuple
+
+# Keyword flags found on a line (outside strings and comments)
+BEGIN = 1 << 0
+END = 1 << 1               # END not followed by IF/WHILE/FOR/TRY/CATCH/CASE
+ELSE = 1 << 2              # any ELSE
+ELSE_BLOCK = 1 << 3        # ELSE not followed by IF
+ELSEIF = 1 << 4            # ELSEIF / ELSIF
+CATCH = 1 << 5
+IF = 1 << 6
+IF_INLINE = 1 << 7         # IF followed later on the line by SET/SELECT/RETURN/GOTO
+LOOP_OR_TRY = 1 << 8       # WHILE / FOR / TRY
+CASE = 1 << 9
+CREATE_PROCEDURE = 1 << 10
+COMPLEX_CONDITION = 1 << 11  # code is 80+ characters or has more than one '('
+
+# String literals and comments; unterminated ones run to end of line
+_MASK_RE = re.compile(r"'[^']*(?:''[^']*)*'?|--.*|/\*.*?(?:\*/|$)")
+
+_KEYWORD_RE = re.compile(
+    r"\b(?:"
+    r"(?P<END>END)\b(?P<END_QUALIFIED>(?=\s+(?:IF|WHILE|FOR|TRY|CATCH|CASE)))?"
+    r"|(?P<ELSE>ELSE)\b(?P<ELSE_IF>(?=\s+IF))?"
+    r"|(?P<CREATE>CREATE\s+PROCEDURE)\b"
+    r"|(?P<word>BEGIN|ELSEIF|ELSIF|CATCH|IF|WHILE|FOR|TRY|CASE|SET|SELECT|RETURN|GOTO)\b"
+    r")"
+)
+
+_WORD_FLAGS = {
+    'BEGIN': BEGIN,
+    'ELSEIF': ELSEIF,
+    'ELSIF': ELSEIF,
+    'CATCH': CATCH,
+    'IF': IF,
+    'WHILE': LOOP_OR_TRY,
+    'FOR': LOOP_OR_TRY,
+    'TRY': LOOP_OR_TRY,
+    'CASE': CASE,
+}
+
+_INLINE_STATEMENTS = ('SET', 'SELECT', 'RETURN', 'GOTO')
+
+def _blank(match) -> str:
+    return ' ' * len(match.group())
+
+@lru_cache(maxsize=8192)
+def classify_line(line: str) -> int:
+    """Keyword flags for a stripped line, ignoring string literals and comments"""
+    code = line.upper()
+    if "'" in code or '--' in code or '/*' in code:
+        code = _MASK_RE.sub(_blank, code)
+
+    flags = 0
+    for match in _KEYWORD_RE.finditer(code):
+        kind = match.lastgroup
+        if kind == 'END_QUALIFIED':
+            continue
+        if kind == 'END':
+            flags |= END
+        elif kind == 'ELSE_IF':
+            flags |= ELSE
+        elif kind == 'ELSE':
+            flags |= ELSE | ELSE_BLOCK
+        elif kind == 'CREATE':
+            flags |= CREATE_PROCEDURE
+        else:
+            word = match.group('word')
+            if word in _INLINE_STATEMENTS:
+                if flags & IF:
+                    flags |= IF_INLINE
+            else:
+                flags |= _WORD_FLAGS[word]
+
+    code = code.strip()
+    if len(code) >= 80 or code.count('(') > 1:
+        flags |= COMPLEX_CONDITION
+    return flags
+
+def simple_indent_deltas(flags: int) -> Tuple[int, int]:
+    """(pre, post) indentation deltas under SimpleSQLFormatter's rules"""
+    pre = -1 if flags & (END | ELSE_BLOCK | CATCH) else 0
+    post = 1 if (flags & (BEGIN | LOOP_OR_TRY | ELSE | CATCH) or
+                 (flags & (IF | IF_INLINE)) == IF) else 0
+    return pre, post
+
+def block_indent_deltas(flags: int) -> Tuple[int, int]:
+    """(pre, post) indentation deltas under SQLFormatter's rules"""
+    pre = post = 0
+    if flags & END:
+        pre = -1
+    elif flags & (ELSE_BLOCK | ELSEIF | CATCH):
+        pre = -1
+        post = 1
+
+    if flags & BEGIN:
+        post += 1
+    elif flags & IF:
+        # A short IF, or one with its statement on the same line, does not open a block
+        if not flags & IF_INLINE and flags & COMPLEX_CONDITION:
+            post += 1
+    elif flags & (LOOP_OR_TRY | CASE):
+        post += 1
+    return pre, post
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Shared Per-Line Model of a SQL Text
+Every analyzer starts the same way: split over-long lines into virtual lines, then
+strip and upper-case each line before matching keywords. A LineModel does that once
+so the universal analysis, the adaptive chunker and the decision points analyzer can
+all be fed from a single read of the file.
+"""
+
+from typing import List, Optional
+from dataclasses import dataclass, field
+
+from sql_line_splitter import VirtualSource, split_long_lines
+
+@dataclass
+class LineModel:
+    """A SQL text with its virtual lines and their stripped, upper-cased form"""
+    sql_content: str
+    source: VirtualSource
+    _upper_lines: Optional[List[str]] = field(default=None, repr=False)
+
+    @property
+    def lines(self) -> List[str]:
+        return self.source.lines
+
+    @property
+    def upper_lines(self) -> List[str]:
+        """line.strip().upper() for every virtual line, computed on first use"""
+        if self._upper_lines is None:
+            self._upper_lines = [line.strip().upper() for line in self.source.lines]
+        return self._upper_lines
+
+def build_line_model(sql_content: str) -> LineModel:
+    """Split sql_content once into the model every analyzer can share"""
+    return LineModel(sql_content, split_long_lines(sql_content))
+
+def load_line_model(path: str) -> LineModel:
+    """Read a SQL file (undecodable bytes dropped, as the CLIs do) into a LineModel"""
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        return build_line_model(f.read())
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Long-line pre-pass for generated and minified SQL
+Splits over-long physical lines into virtual lines at statement and keyword boundaries
+so the line-oriented analyzers keep bounded per-line regex cost, while remembering
+where every virtual line starts in the original text.
+"""
+
+import re
+from typing import List, Tuple
+from dataclasses import dataclass
+from functools import lru_cache
+
+# Lines longer than this are split; no virtual line is longer than this either
+LONG_LINE_THRESHOLD = 1000
+
+# Keywords that start a new statement (or control-flow clause) in T-SQL
+_STATEMENT_KEYWORDS = (
+    'DECLARE', 'SET', 'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'MERGE', 'EXEC', 'EXECUTE',
+    'IF', 'ELSE', 'WHILE', 'RETURN', 'RAISERROR', 'THROW', 'COMMIT', 'ROLLBACK', 'SAVE',
+    'FETCH', 'OPEN', 'CLOSE', 'DEALLOCATE', 'PRINT', 'GOTO', 'BREAK', 'CONTINUE',
+    'CREATE', 'ALTER', 'DROP', 'TRUNCATE', 'GO',
+)
+
+# Statement keywords that belong to the enclosing statement rather than starting one
+_OWNED_KEYWORDS = {
+    'UPDATE': {'SET', 'SELECT'},
+    'DELETE': {'SELECT'},
+    'INSERT': {'SELECT', 'EXEC', 'EXECUTE', 'SET'},
+    'MERGE': {'UPDATE', 'INSERT', 'DELETE', 'SET', 'SELECT'},
+    'DECLARE': {'SELECT', 'SET'},     # DECLARE c CURSOR FOR SELECT ...
+    'CREATE': {'SELECT', 'SET'},      # CREATE VIEW ... AS SELECT
+    'ALTER': {'SELECT', 'SET'},
+}
+
+@lru_cache(maxsize=None)
+def _token_re() -> 're.Pattern':
+    """Linear tokenizer: literals and comments are consumed whole (unterminated ones run
+    to end of line) so keywords inside them are never seen
+
+    Compiled on first use, since most inputs have no long lines at all.
+    """
+    return re.compile(
+        r"(?P<string>N?'[^']*(?:''[^']*)*'?)"
+        r"|(?P<ident>\[[^\]]*\]?|\"[^\"]*\"?)"
+        r"|(?P<line_comment>--.*)"
+        r"|(?P<block_comment>/\*(?:.*?\*/|.*))"
+        r"|(?P<open>\()"
+        r"|(?P<close>\))"
+        r"|(?P<semicolon>;)"
+        r"|(?P<begin>\bBEGIN(?:\s+(?:TRY|CATCH|DISTRIBUTED\s+TRAN(?:SACTION)?|TRAN(?:SACTION)?)\b)?)"
+        r"|(?P<end>\bEND(?:\s+(?:TRY|CATCH)\b)?)"
+        r"|(?P<case>\bCASE\b)"
+        r"|(?P<union>\b(?:UNION|EXCEPT|INTERSECT)\b)"
+        r"|(?P<keyword>\b(?:" + '|'.join(_STATEMENT_KEYWORDS) + r")\b)"
+        r"|(?P<word>@*[A-Za-z_][\w@#$]*)",
+        re.IGNORECASE | re.DOTALL
+    )
+
+_CONTROL_HEADERS = ('IF', 'ELSE', 'WHILE')
+
+@dataclass
+class VirtualSource:
+    """SQL text as analyzer-ready lines plus the original position of each line"""
+    lines: List[str]
+    origins: List[Tuple[int, int]]  # (1-based original line, 0-based column) per virtual line
+    split_line_count: int           # how many physical lines were split
+
+    @property
+    def text(self) -> str:
+        return '\n'.join(self.lines)
+
+    @property
+    def was_split(self) -> bool:
+        return self.split_line_count > 0
+
+    def origin(self, virtual_line_number: int) -> Tuple[int, int]:
+        """Original (line, column) for a 1-based virtual line number"""
+        return self.origins[virtual_line_number - 1]
+
+    def split_origins(self) -> List[List[int]]:
+        """[virtual_line, original_line, column] for every virtual line that moved"""
+        return [[i, line, column] for i, (line, column) in enumerate(self.origins, 1)
+                if line != i or column != 0]
+
+def _statement_cuts(line: str) -> List[int]:
+    """Offsets at which a long line should be cut into statements"""
+    cuts = []
+    depth = 0
+    case_depth = 0
+    segment_start = 0
+    head = ''          # first keyword of the current segment
+    after_union = False
+
+    def cut(offset: int):
+        nonlocal segment_start, head
+        if offset > segment_start and line[segment_start:offset].strip():
+            cuts.append(offset)
+            segment_start = offset
+            head = ''
+
+    for match in _token_re().finditer(line):
+        kind = match.lastgroup
+        if kind in ('string', 'ident', 'word', 'block_comment'):
+            after_union = False
+            continue
+        if kind == 'line_comment':
+            cut(match.start())
+            break
+        if kind == 'open':
+            depth += 1
+            continue
+        if kind == 'close':
+            depth = max(0, depth - 1)
+            continue
+        if depth > 0:
+            if kind == 'case':
+                case_depth += 1
+            elif kind == 'end' and case_depth:
+                case_depth -= 1
+            continue
+
+        if kind == 'semicolon':
+            if cuts and cuts[-1] == segment_start and not line[segment_start:match.start()].strip():
+                # A terminator right after END / BEGIN stays on that line
+                cuts[-1] = segment_start = match.end()
+            else:
+                cut(match.end())
+        elif kind == 'case':
+            case_depth += 1
+        elif kind == 'union':
+            after_union = True
+            continue
+        elif kind == 'end':
+            if case_depth:
+                case_depth -= 1
+            else:
+                cut(match.start())
+                cut(match.end())
+        elif kind == 'begin':
+            if head not in _CONTROL_HEADERS:
+                cut(match.start())
+            cut(match.end())
+        elif kind == 'keyword':
+            word = match.group().upper()
+            if case_depth and word == 'ELSE':
+                pass
+            elif after_union and word == 'SELECT':
+                pass
+            elif word in _OWNED_KEYWORDS.get(head, ()):
+                pass
+            elif word == 'IF' and head == 'ELSE' and not line[segment_start:match.start()].strip()[4:].strip():
+                pass    # ELSE IF stays on one line
+            else:
+                cut(match.start())
+                if not head:
+                    head = word
+        after_union = False
+
+    return cuts
+
+def _cap_segment(line: str, start: int, end: int, max_length: int) -> List[int]:
+    """Extra cuts so no piece of line[start:end] exceeds max_length"""
+    cuts = []
+    while end - start > max_length:
+        limit = start + max_length
+        # Prefer whitespace, then a comma, then a hard cut
+        cut_at = line.rfind(' ', start + 1, limit)
+        if cut_at <= start:
+            cut_at = line.rfind(',', start + 1, limit) + 1
+        if cut_at <= start:
+            cut_at = limit
+        cuts.append(cut_at)
+        start = cut_at
+    return cuts
+
+def split_long_line(line: str, max_length: int = LONG_LINE_THRESHOLD) -> List[Tuple[int, str]]:
+    """Split one long line into (column, text) pieces, each at most max_length long"""
+    bounds = [0] + _statement_cuts(line) + [len(line)]
+    cuts = []
+    for start, end in zip(bounds, bounds[1:]):
+        cuts.append(start)
+        cuts.extend(_cap_segment(line, start, end, max_length))
+    cuts.append(len(line))
+
+    pieces = []
+    for start, end in zip(cuts, cuts[1:]):
+        text = line[start:end]
+        stripped = text.lstrip()
+        if not stripped.strip():
+            continue
+        pieces.append((start + len(text) - len(stripped), stripped.rstrip()))
+    return pieces or [(0, line)]
+
+def split_long_lines(sql_content: str, max_length: int = LONG_LINE_THRESHOLD) -> VirtualSource:
+    """Split every physical line longer than max_length into virtual lines"""
+    physical = sql_content.split('\n')
+    if max_length <= 0 or all(len(line) <= max_length for line in physical):
+        return VirtualSource(physical, [(i, 0) for i in range(1, len(physical) + 1)], 0)
+
+    lines = []
+    origins = []
+    split_count = 0
+    for line_number, line in enumerate(physical, 1):
+        if len(line) <= max_length:
+            lines.append(line)
+            origins.append((line_number, 0))
+            continue
+        split_count += 1
+        for column, text in split_long_line(line, max_length):
+            lines.append(text)
+            origins.append((line_number, column))
+
+    return VirtualSource(lines, origins, split_count)
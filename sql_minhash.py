@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+MinHash Signatures and LSH Clustering of SQL Code
+Near-duplicate detection for procedure variants that differ by a renamed variable or
+an extra condition, which exact content hashes miss. Code becomes a set of token
+shingles, each set a fixed-length MinHash signature whose agreement estimates the
+Jaccard similarity of two sets. Locality-sensitive hashing over bands of the
+signature only compares items that share a band, so grouping n items stays far
+below the n^2 comparisons of a pairwise scan.
+
+The signature of a union of sets is the element-wise minimum of their signatures,
+so a procedure's signature can be assembled from the signatures of its chunks.
+"""
+
+import re
+import zlib
+from array import array
+from typing import Dict, Hashable, Iterable, List, Sequence, Set, Tuple
+
+# Hash functions per signature, and tokens per shingle
+NUM_PERM = 64
+SHINGLE_SIZE = 5
+
+# Default estimated Jaccard similarity for two items to be near-duplicates
+DEFAULT_THRESHOLD = 0.8
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = _MERSENNE_PRIME - 1
+
+def _permutations(num_perm: int) -> List[Tuple[int, int]]:
+    """Fixed (a, b) pairs of the hash functions (a * x + b) mod p, the same in every process"""
+    import random
+    generator = random.Random(20240611)
+    return [(generator.randrange(1, _MERSENNE_PRIME), generator.randrange(0, _MERSENNE_PRIME))
+            for _ in range(num_perm)]
+
+_PERMUTATIONS = _permutations(NUM_PERM)
+
+_COMMENT_RE = re.compile(r'--[^\n]*|/\*.*?\*/', re.DOTALL)
+_TOKEN_RE = re.compile(r"'(?:[^']|'')*'|[A-Z_@#][\w@#$]*|\d+(?:\.\d+)?|[^\s\w]")
+
+def tokens(code: str) -> List[str]:
+    """Upper-cased tokens of SQL code without comments; literals are single tokens"""
+    return _TOKEN_RE.findall(_COMMENT_RE.sub(' ', code.upper()))
+
+def shingles(code: str, size: int = SHINGLE_SIZE) -> Set[int]:
+    """32-bit hashes of every run of size consecutive tokens (the whole text if shorter)"""
+    words = tokens(code)
+    if not words:
+        return set()
+    if len(words) <= size:
+        return {zlib.crc32(' '.join(words).encode('utf-8', errors='surrogatepass'))}
+    return {zlib.crc32(' '.join(words[i:i + size]).encode('utf-8', errors='surrogatepass'))
+            for i in range(len(words) - size + 1)}
+
+def signature(shingle_hashes: Iterable[int]) -> array:
+    """MinHash signature of a shingle set; all slots are the maximum hash for an empty set"""
+    values = list(shingle_hashes)
+    if not values:
+        return array('Q', [_MAX_HASH] * NUM_PERM)
+    return array('Q', [min((a * x + b) % _MERSENNE_PRIME for x in values) for a, b in _PERMUTATIONS])
+
+def code_signature(code: str) -> array:
+    """MinHash signature of the shingles of code"""
+    return signature(shingles(code))
+
+def merge(signatures: Iterable[Sequence[int]]) -> array:
+    """Signature of the union of the sets behind signatures"""
+    merged = array('Q', [_MAX_HASH] * NUM_PERM)
+    for other in signatures:
+        merged = array('Q', map(min, merged, other))
+    return merged
+
+def is_empty(sig: Sequence[int]) -> bool:
+    """Whether sig is the signature of an empty set (code without tokens)"""
+    return all(value == _MAX_HASH for value in sig)
+
+def similarity(first: Sequence[int], second: Sequence[int]) -> float:
+    """Estimated Jaccard similarity: the fraction of agreeing signature slots"""
+    return sum(1 for a, b in zip(first, second) if a == b) / len(first)
+
+def to_bytes(sig: array) -> bytes:
+    return sig.tobytes()
+
+def from_bytes(data: bytes) -> array:
+    sig = array('Q')
+    sig.frombytes(data)
+    return sig
+
+def band_layout(threshold: float, num_perm: int = NUM_PERM) -> Tuple[int, int]:
+    """(bands, rows) with the LSH threshold (1/bands)^(1/rows) closest to but not above threshold
+
+    Candidates found this way are then verified against threshold, so erring low
+    only costs comparisons, while erring high would miss near-duplicates.
+    """
+    layouts = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    below = [(bands, rows) for bands, rows in layouts if (1 / bands) ** (1 / rows) <= threshold]
+    return max(below, key=lambda layout: (1 / layout[0]) ** (1 / layout[1])) if below else layouts[0]
+
+def cluster(signatures: Dict[Hashable, Sequence[int]],
+            threshold: float = DEFAULT_THRESHOLD) -> List[List[Hashable]]:
+    """Groups of keys whose signatures are near-duplicates, largest first
+
+    Keys with identical signatures are grouped outright. The rest meet only in LSH
+    buckets, where each one is verified against the first member of the bucket, and
+    groups are merged transitively. Keys without a near-duplicate are left out.
+    """
+    identical = {}
+    for key, sig in signatures.items():
+        if not is_empty(sig):
+            identical.setdefault(bytes(array('Q', sig)), []).append(key)
+    distinct = list(identical.values())
+    parent = list(range(len(distinct)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    bands, rows = band_layout(threshold, len(next(iter(signatures.values()), [0] * NUM_PERM)))
+    for band in range(bands):
+        buckets = {}
+        for i, keys in enumerate(distinct):
+            sig = signatures[keys[0]]
+            buckets.setdefault(tuple(sig[band * rows:(band + 1) * rows]), []).append(i)
+        for members in buckets.values():
+            first = members[0]
+            for other in members[1:]:
+                root_first, root_other = find(first), find(other)
+                if root_first != root_other and \
+                        similarity(signatures[distinct[first][0]], signatures[distinct[other][0]]) >= threshold:
+                    parent[root_other] = root_first
+
+    groups = {}
+    for i, keys in enumerate(distinct):
+        groups.setdefault(find(i), []).extend(keys)
+    families = [keys for keys in groups.values() if len(keys) > 1]
+    return sorted(families, key=len, reverse=True)
+
+def representative(keys: List[Hashable], signatures: Dict[Hashable, Sequence[int]],
+                   sample: int = 50) -> Hashable:
+    """The member with the highest mean similarity to (up to sample of) the others"""
+    others = keys[:sample]
+    return max(keys[:sample], key=lambda key: sum(similarity(signatures[key], signatures[other])
+                                                  for other in others))
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Fast SQL Procedure Triage
+Ranks a large corpus of stored procedures using only cheap, streaming metrics so the
+expensive adaptive chunking run and human review can be focused where they matter.
+"""
+
+import re
+import os
+import sys
+import json
+import time
+from typing import List, Iterable, Iterator
+from dataclasses import dataclass, asdict
+from concurrent.futures import ProcessPoolExecutor
+
+from sql_analyzer import rate_complexity_score
+
+# Per-line feature bits, mirroring the checks in UniversalSQLAnalyzer._analyze_complexity
+DECISION = 1    # IF / WHILE / CASE WHEN / AND / OR
+OPEN = 2        # BEGIN / IF / WHILE / TRY / CASE (nesting +1)
+CLOSE = 4       # END (nesting -1, only if nothing opened on the line)
+LOOP = 8        # WHILE
+EXCEPTION = 16  # TRY / CATCH
+DYNAMIC = 32    # EXEC( / sp_executesql
+CURSOR = 64     # CURSOR / FETCH / OPEN / CLOSE
+
+_TOKEN_BITS = {
+    'IF': DECISION | OPEN,
+    'WHILE': DECISION | OPEN | LOOP,
+    'AND': DECISION,
+    'OR': DECISION,
+    'BEGIN': OPEN,
+    'TRY': OPEN | EXCEPTION,
+    'CASE': OPEN,
+    'CASE WHEN': DECISION | OPEN,
+    'END': CLOSE,
+    'CATCH': EXCEPTION,
+    'CURSOR': CURSOR,
+    'FETCH': CURSOR,
+    'OPEN': CURSOR,
+    'CLOSE': CURSOR,
+    'EXEC(': DYNAMIC,
+    'SP_EXECUTESQL': DYNAMIC,
+}
+
+# One scan per block of upper-cased text. The leading lookahead lets the engine
+# reject most positions on a single character test; whitespace inside tokens
+# never crosses a line break.
+_TOKEN_RE = re.compile(
+    r'(?=[ABCEFIOSTW])(?:'
+    r'\b(?:IF|WHILE|AND|OR|BEGIN|TRY|CASE(?:[ \t]+WHEN)?|END|CATCH)\b'
+    r'|CURSOR|FETCH|OPEN|CLOSE|EXEC[ \t]*\(|SP_EXECUTESQL)'
+)
+
+def _token_bits(token: str) -> int:
+    """Feature bits for a matched token, folding internal whitespace"""
+    bits = _TOKEN_BITS.get(token)
+    if bits is None:
+        bits = _TOKEN_BITS['CASE WHEN'] if token.startswith('CASE') else _TOKEN_BITS['EXEC(']
+    return bits
+
+READ_BLOCK_SIZE = 1 << 20
+
+@dataclass
+class TriageResult:
+    """Cheap per-file metrics used to rank procedures"""
+    path: str
+    line_count: int
+    decision_points: int
+    max_nesting_depth: int
+    avg_nesting_depth: float
+    loop_count: int
+    exception_blocks: int
+    cursor_usage: int
+    dynamic_sql_usage: int
+    approx_complexity_score: int
+    complexity_rating: str
+    error: str = ""
+
+def _read_blocks(path: str, block_size: int = READ_BLOCK_SIZE) -> Iterator[str]:
+    """Yield upper-cased blocks of whole lines without loading the file"""
+    carry = ''
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        while True:
+            data = f.read(block_size)
+            if not data:
+                break
+            data = carry + data
+            cut = data.rfind('\n')
+            if cut < 0:
+                carry = data
+                continue
+            carry = data[cut + 1:]
+            yield data[:cut + 1].upper()
+    if carry:
+        yield carry.upper()
+
+def triage_lines(blocks: Iterable[str], path: str = '<stream>') -> TriageResult:
+    """Compute triage metrics over an iterable of upper-cased text blocks"""
+    counts = {DECISION: 0, LOOP: 0, EXCEPTION: 0, DYNAMIC: 0, CURSOR: 0}
+    depth = 0
+    max_depth = 0
+    depth_line_sum = 0   # sum of nesting depth over all lines
+    line_count = 0
+    ends_with_newline = True
+
+    def flush(mask: int):
+        nonlocal depth, max_depth
+        for bit in counts:
+            if mask & bit:
+                counts[bit] += 1
+        if mask & OPEN:
+            depth += 1
+            if depth > max_depth:
+                max_depth = depth
+        elif mask & CLOSE and depth > 0:
+            depth -= 1
+
+    for block in blocks:
+        if not block:
+            continue
+        line = line_count      # 0-based index of the line being scanned
+        mask = 0
+        pos = 0
+        for match in _TOKEN_RE.finditer(block):
+            start = match.start()
+            newlines = block.count('\n', pos, start)
+            if newlines:
+                if mask:
+                    flush(mask)
+                    mask = 0
+                # The line holding the flushed tokens carries the new depth,
+                # untouched lines in between keep it too
+                depth_line_sum += depth * newlines
+                line += newlines
+            pos = start
+            mask |= _token_bits(match.group())
+        if mask:
+            flush(mask)
+        newlines = block.count('\n', pos)
+        ends_with_newline = block.endswith('\n')
+        remaining = newlines if ends_with_newline else newlines + 1
+        depth_line_sum += depth * remaining
+        line_count = line + remaining
+
+    # str.split('\n') semantics: a trailing newline starts one more (empty) line
+    if ends_with_newline:
+        line_count += 1
+        depth_line_sum += depth
+
+    score = (
+        1 + counts[DECISION] +
+        max_depth * 2 +
+        counts[LOOP] * 3 +
+        counts[EXCEPTION] +
+        counts[DYNAMIC] * 2 +
+        counts[CURSOR] * 4
+    )
+
+    return TriageResult(
+        path=path,
+        line_count=line_count,
+        decision_points=counts[DECISION],
+        max_nesting_depth=max_depth,
+        avg_nesting_depth=round(depth_line_sum / line_count, 2) if line_count else 0.0,
+        loop_count=counts[LOOP],
+        exception_blocks=counts[EXCEPTION],
+        cursor_usage=counts[CURSOR],
+        dynamic_sql_usage=counts[DYNAMIC],
+        approx_complexity_score=score,
+        complexity_rating=rate_complexity_score(score)
+    )
+
+def triage_file(path: str) -> TriageResult:
+    """Triage a single SQL file with a streaming scan"""
+    try:
+        return triage_lines(_read_blocks(path), path)
+    except OSError as e:
+        return TriageResult(path, 0, 0, 0, 0.0, 0, 0, 0, 0, 0, 'None', error=str(e))
+
+def iter_sql_files(paths: Iterable[str], pattern: str = '.sql') -> Iterator[str]:
+    """Expand files and directories into SQL file paths"""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(pattern):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+def triage_corpus(paths: Iterable[str], workers: int = None) -> List[TriageResult]:
+    """Triage every SQL file across a process pool and rank by approximate complexity"""
+    files = list(iter_sql_files(paths))
+    if workers == 1 or len(files) < 2:
+        results = [triage_file(path) for path in files]
+    else:
+        workers = workers or os.cpu_count() or 1
+        chunksize = max(1, len(files) // (workers * 8))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(triage_file, files, chunksize=chunksize))
+
+    results.sort(key=lambda r: (-r.approx_complexity_score, -r.line_count, r.path))
+    return results
+
+def generate_triage_table(results: List[TriageResult], output_format: str = 'markdown') -> str:
+    """Render ranked triage results"""
+    if output_format == 'json':
+        return json.dumps([dict(asdict(r), rank=i) for i, r in enumerate(results, 1)], indent=2)
+
+    headers = ['Rank', 'File', 'Lines', 'Score', 'Rating', 'Decision Points', 'Max Nesting',
+               'Avg Nesting', 'Loops', 'Exception Blocks', 'Cursor Usage', 'Dynamic SQL']
+    rows = []
+    for i, r in enumerate(results, 1):
+        rows.append([str(i), r.path, str(r.line_count), str(r.approx_complexity_score),
+                     r.complexity_rating if not r.error else f'Error: {r.error}',
+                     str(r.decision_points), str(r.max_nesting_depth), f'{r.avg_nesting_depth:.2f}',
+                     str(r.loop_count), str(r.exception_blocks), str(r.cursor_usage),
+                     str(r.dynamic_sql_usage)])
+
+    if output_format == 'tsv':
+        return '\n'.join('\t'.join(row) for row in [headers] + rows)
+
+    table = []
+    table.append("# SQL Procedure Triage")
+    table.append("")
+    table.append("| " + " | ".join(headers) + " |")
+    table.append("|" + "|".join("---" for _ in headers) + "|")
+    for row in rows:
+        table.append("| " + " | ".join(row) + " |")
+    return '\n'.join(table)
+
+def main():
+    """Main function for command line usage"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Rank SQL procedures by cheap complexity metrics before deep analysis')
+    parser.add_argument('paths', nargs='+', help='SQL files or directories to scan')
+    parser.add_argument('--output', '-o', help='Output file for the ranked table')
+    parser.add_argument('--format', choices=['markdown', 'tsv', 'json'], default='markdown', help='Output format')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--top', type=int, default=None, help='Only list the N highest-ranked files')
+
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = triage_corpus(args.paths, workers=args.workers)
+    elapsed = time.perf_counter() - start
+
+    total_lines = sum(r.line_count for r in results)
+    shown = results[:args.top] if args.top else results
+    output = generate_triage_table(shown, args.format)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+        print(f"Triage table written to {args.output}")
+    else:
+        print(output)
+
+    rate = total_lines / elapsed if elapsed > 0 else 0
+    print(f"Triaged {len(results)} files ({total_lines:,} lines) in {elapsed:.2f}s ({rate:,.0f} lines/sec)",
+          file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Watch Mode for the SQL Analyzers
+Polls a directory tree with os.scandir, comparing each .sql file's mtime and size with
+the last analyzed version. A file is re-analyzed once it has stayed unchanged for a
+debounce period and its content hash confirms it really changed, so rapid saves and
+touch-only updates cost nothing. The hashes are persisted next to the artifacts, so
+a restarted watcher only regenerates what changed while it was down.
+"""
+
+import os
+import sys
+import json
+import time
+from typing import List, Dict, Tuple, Callable, Iterator, Optional
+from dataclasses import dataclass
+
+DEFAULT_POLL_INTERVAL = 1.0
+DEFAULT_DEBOUNCE = 0.5
+
+@dataclass
+class FileState:
+    """What a file looked like when it was last analyzed"""
+    mtime_ns: int
+    size: int
+    digest: str
+
+def file_digest(path: str) -> str:
+    """sha256 of a file's bytes"""
+    import hashlib
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def write_atomic(path: str, text: str):
+    """Write text to path via a temporary file and rename, so readers never see a partial file"""
+    import tempfile
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix='.sqlwatch-', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+def _scan(root: str, suffix: str) -> Iterator[Tuple[str, int, int]]:
+    """(path, mtime_ns, size) of every file under root ending in suffix"""
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if not entry.name.startswith('.'):
+                        stack.append(entry.path)
+                elif entry.name.lower().endswith(suffix):
+                    stat = entry.stat()
+                    yield entry.path, stat.st_mtime_ns, stat.st_size
+            except OSError:
+                continue    # vanished between listing and stat
+
+class ChangeWatcher:
+    """Detects changed and removed files under a directory by polling"""
+
+    def __init__(self, root: str, suffix: str = '.sql', debounce: float = DEFAULT_DEBOUNCE,
+                 known: Dict[str, FileState] = None):
+        self.root = root
+        self.suffix = suffix
+        self.debounce = debounce
+        self.known = dict(known or {})     # path -> state when last reported
+        self.pending = {}                  # path -> ((mtime_ns, size), first seen with that stat)
+        self._first_poll = True
+
+    def poll(self) -> Tuple[List[str], List[str]]:
+        """(changed, removed) paths that are ready to be acted on now"""
+        now = time.monotonic()
+        # Files found by the first scan have been settled for as long as the watcher was down
+        seen_at = float('-inf') if self._first_poll else now
+        self._first_poll = False
+
+        changed = []
+        current = set()
+        for path, mtime_ns, size in _scan(self.root, self.suffix):
+            current.add(path)
+            stat = (mtime_ns, size)
+            known = self.known.get(path)
+            if known is not None and (known.mtime_ns, known.size) == stat:
+                self.pending.pop(path, None)
+                continue
+
+            pending = self.pending.get(path)
+            if pending is None or pending[0] != stat:
+                # New or still being written: (re)start its quiet period
+                pending = self.pending[path] = (stat, seen_at)
+            if now - pending[1] < self.debounce:
+                continue
+
+            try:
+                digest = file_digest(path)
+                after = os.stat(path)
+            except OSError:
+                continue
+            if (after.st_mtime_ns, after.st_size) != stat:
+                self.pending[path] = ((after.st_mtime_ns, after.st_size), now)
+                continue
+            del self.pending[path]
+            self.known[path] = FileState(mtime_ns, size, digest)
+            if known is None or known.digest != digest:
+                changed.append(path)
+
+        removed = [path for path in self.known if path not in current]
+        for path in removed:
+            del self.known[path]
+        for path in [path for path in self.pending if path not in current]:
+            del self.pending[path]
+        return sorted(changed), sorted(removed)
+
+def add_watch_arguments(parser):
+    """Watch-mode options shared by the analyzer command lines"""
+    parser.add_argument('--watch', metavar='DIR',
+                        help='Watch DIR and regenerate the artifact of every .sql file that changes')
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                        help='Seconds between scans in watch mode')
+    parser.add_argument('--debounce', type=float, default=DEFAULT_DEBOUNCE,
+                        help='Seconds a file must stay unchanged before it is re-analyzed')
+    parser.add_argument('--once', action='store_true',
+                        help='With --watch: bring artifacts up to date once and exit')
+
+def artifact_path(sql_path: str, root: str, artifact_suffix: str, output_dir: str = None) -> str:
+    """Where the artifact for a SQL file goes: next to it, or mirrored under output_dir"""
+    stem = os.path.splitext(os.path.relpath(sql_path, root))[0]
+    return os.path.join(output_dir or root, f"{stem}.{artifact_suffix}")
+
+def _load_state(state_path: str, signature: str) -> Dict[str, FileState]:
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if state.get('signature') != signature:
+        return {}       # different options: every artifact is stale
+    return {path: FileState(*values) for path, values in state.get('files', {}).items()}
+
+def _save_state(state_path: str, signature: str, known: Dict[str, FileState]):
+    files = {path: [s.mtime_ns, s.size, s.digest] for path, s in sorted(known.items())}
+    write_atomic(state_path, json.dumps({'signature': signature, 'files': files}, indent=1))
+
+def watch_and_regenerate(root: str, render: Callable[[str], str], artifact_suffix: str,
+                         output_dir: str = None, signature: str = '',
+                         poll_interval: float = DEFAULT_POLL_INTERVAL, debounce: float = DEFAULT_DEBOUNCE,
+                         once: bool = False, log: Optional[Callable[[str], None]] = None):
+    """Keep one artifact per SQL file under root current, re-rendering only changed files
+
+    render(sql_content) returns the artifact text. signature should capture every
+    option that affects the output, so changing options regenerates everything.
+    """
+    log = log or (lambda message: print(message, file=sys.stderr, flush=True))
+    state_dir = output_dir or root
+    state_path = os.path.join(state_dir, f".sqlwatch-{artifact_suffix}.json")
+    known = _load_state(state_path, signature)
+    # Artifacts deleted by hand are regenerated
+    known = {path: state for path, state in known.items()
+             if os.path.exists(artifact_path(path, root, artifact_suffix, output_dir))}
+    watcher = ChangeWatcher(root, debounce=debounce, known=known)
+
+    log(f"Watching {root} for .sql changes ({artifact_suffix})")
+    while True:
+        changed, removed = watcher.poll()
+        for path in changed:
+            target = artifact_path(path, root, artifact_suffix, output_dir)
+            start = time.perf_counter()
+            try:
+                with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+                    write_atomic(target, render(f.read()))
+            except Exception as e:
+                # Not retried until the file changes again
+                log(f"error: {path}: {type(e).__name__}: {e}")
+                continue
+            log(f"regenerated {target} ({(time.perf_counter() - start) * 1000:.0f} ms)")
+        for path in removed:
+            target = artifact_path(path, root, artifact_suffix, output_dir)
+            if os.path.exists(target):
+                os.unlink(target)
+                log(f"removed {target}")
+        if changed or removed:
+            _save_state(state_path, signature, watcher.known)
+
+        if once and not watcher.pending:
+            return
+        time.sleep(min(poll_interval, debounce) if watcher.pending else poll_interval)
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Unified SQL Analysis Command Line
+One entry point for the universal analysis, the adaptive chunking guide and the
+decision points report. The `all` subcommand reads the file once and feeds the same
+per-line model (sql_line_model.LineModel) to every analyzer, so all three reports
+come from a single process and a single split of the text. `diff` aligns the
+adaptive chunks of two versions of a procedure (see sql_chunk_diff), and `bundle`
+packs the chunks into prompt-sized files (see sql_chunk_bundles). `context` gives each
+chunk the definitions of what it uses instead of whole dependency chunks (see sql_def_use).
+"""
+
+import os
+import sys
+import json
+import argparse
+import contextlib
+from typing import Any, Dict, List, Tuple
+
+from sql_line_model import LineModel, load_line_model
+
+ANALYSIS_SUFFIXES = {'markdown': 'analysis.md', 'json': 'analysis.json'}
+CHUNKS_SUFFIXES = {'markdown': 'adaptive_analysis.md', 'json': 'adaptive_analysis.json'}
+DECISIONS_SUFFIXES = {'text': 'decision_points.txt', 'json': 'decision_points.json'}
+
+def _parse_sections(value: str) -> List[str]:
+    return [s.strip() for s in value.split(',') if s.strip()]
+
+def _add_analysis_arguments(parser):
+    parser.add_argument('--sections', type=_parse_sections, default=None,
+                        help='Comma-separated analysis sections to compute (default: all)')
+
+def _add_chunk_arguments(parser):
+    parser.add_argument('--strategy', choices=['strict_logical', 'size_constrained', 'functional', 'hybrid',
+                                               'token_budget'],
+                        default='hybrid', help='Chunking strategy')
+    parser.add_argument('--target-size', type=int, default=60, help='Target lines per chunk')
+    parser.add_argument('--min-size', type=int, default=10, help='Minimum lines per chunk')
+    parser.add_argument('--max-size', type=int, default=120, help='Maximum lines per chunk')
+    parser.add_argument('--force-subdivision', type=int, default=200, help='Force subdivision threshold')
+    parser.add_argument('--max-complexity', type=int, default=50,
+                        help='Maximum complexity per chunk before forced subdivision')
+    parser.add_argument('--max-tokens', type=int, default=2000,
+                        help='Maximum model tokens per chunk (token_budget strategy)')
+    parser.add_argument('--tokenizer', default='estimate',
+                        help="Token counter of the token_budget strategy: 'estimate' or 'tiktoken[:encoding]'")
+    parser.add_argument('--auto-format', type=lambda x: x.lower() != 'false', default=True,
+                        help='Format SQL before chunking (default: true, use --auto-format=false to disable)')
+
+def _add_decision_arguments(parser):
+    parser.add_argument('--details', action='store_true',
+                        help='Show the detailed breakdown of each decision point')
+
+def run_analysis(model: LineModel, args) -> Tuple[Any, Any]:
+    """Universal analysis of the model: (result, markdown report or JSON-ready dict)"""
+    from sql_analyzer import ANALYSIS_SECTIONS, UniversalSQLAnalyzer, section_to_json, \
+        generate_universal_analysis_report
+    if args.sections is not None:
+        unknown = [s for s in args.sections if s not in ANALYSIS_SECTIONS]
+        if unknown:
+            raise ValueError(f"unknown section(s): {', '.join(unknown)}")
+    result = UniversalSQLAnalyzer().analyze_procedure(model.sql_content, sections=args.sections, model=model)
+    if args.format == 'json':
+        return result, {key: section_to_json(value) for key, value in result.items()}
+    return result, generate_universal_analysis_report(result)
+
+def run_chunks(model: LineModel, args) -> Tuple[Any, Any]:
+    """Adaptive chunks of the model: (chunks, markdown guide or JSON-ready dict)"""
+    from adaptive_chunked_analyzer import AdaptiveSQLAnalyzer, ChunkStrategy, chunk_to_dict, \
+        generate_adaptive_analysis_guide, make_token_estimator
+    strategy = ChunkStrategy(args.strategy)
+    analyzer = AdaptiveSQLAnalyzer(
+        strategy=strategy,
+        target_chunk_size=args.target_size,
+        min_chunk_size=args.min_size,
+        max_chunk_size=args.max_size,
+        force_subdivision_threshold=args.force_subdivision,
+        max_complexity_per_chunk=args.max_complexity,
+        max_chunk_tokens=args.max_tokens,
+        token_estimator=make_token_estimator(args.tokenizer)
+    )
+    config = {
+        'target_chunk_size': args.target_size,
+        'max_chunk_size': args.max_size,
+        'min_chunk_size': args.min_size,
+        'force_subdivision_threshold': args.force_subdivision
+    }
+    if strategy == ChunkStrategy.TOKEN_BUDGET:
+        config.update(max_chunk_tokens=args.max_tokens, tokenizer=args.tokenizer)
+    # The chunker reports its preprocessing steps; keep stdout for the reports
+    with contextlib.redirect_stdout(sys.stderr):
+        chunks = analyzer.chunk_procedure(model.sql_content, auto_format=args.auto_format, model=model)
+    if args.format == 'json':
+        return chunks, {'strategy': strategy.value, 'config': config,
+                        'chunks': [chunk_to_dict(chunk) for chunk in chunks]}
+    return chunks, generate_adaptive_analysis_guide(chunks, strategy, config)
+
+def run_decisions(model: LineModel, args, source_name: str) -> Tuple[Dict[str, Any], Any]:
+    """Decision points of the model: (report, text or JSON-ready dict)"""
+    from decision_points_analyzer import DecisionPointsAnalyzer
+    analyzer = DecisionPointsAnalyzer()
+    report = analyzer.analyze_content(model.sql_content, source_name, model=model)
+    if args.format == 'json':
+        return report, report
+    return report, analyzer.format_analysis(report, args.details)
+
+def run_bundles(model: LineModel, args):
+    """Write the adaptive chunks as prompt bundles to args.output, or list the bundles"""
+    from adaptive_chunked_analyzer import make_token_estimator
+    from sql_chunk_bundles import pack_chunks, write_bundles
+    chunk_args = argparse.Namespace(**vars(args))
+    chunk_args.format = 'json'
+    chunks = run_chunks(model, chunk_args)[0]
+    bundles = pack_chunks(chunks, args.bundle_tokens or None, args.bundle_chars or None,
+                          make_token_estimator(args.tokenizer))
+    if args.output:
+        stem = os.path.splitext(os.path.basename(args.sql_file))[0]
+        paths = write_bundles(bundles, args.output, stem, os.path.basename(args.sql_file))
+        print(f"Written {len(paths)} bundle(s) of {len(chunks)} chunk(s) to {args.output}", file=sys.stderr)
+        return
+    print(f"{'bundle':>6} {'chunks':>9} {'lines':>11} {'tokens':>7} {'chars':>7}  builds on")
+    for bundle in bundles:
+        chunk_ids = f"{bundle.chunks[0].chunk_id}-{bundle.chunks[-1].chunk_id}"
+        print(f"{bundle.index:>6} {chunk_ids:>9} {bundle.start_line:>5}-{bundle.end_line:<5} "
+              f"{bundle.tokens:>7} {bundle.chars:>7}  {', '.join(map(str, bundle.depends_on))}")
+
+def run_split(model: LineModel, args):
+    """Write the adaptive chunks as per-chunk files with a manifest into args.split"""
+    from sql_chunk_files import write_chunk_files
+    chunk_args = argparse.Namespace(**vars(args))
+    chunk_args.format = 'json'
+    chunks, report = run_chunks(model, chunk_args)
+    result = write_chunk_files(chunks, args.split, args.sql_file, report['strategy'], report['config'])
+    print(f"{len(chunks)} chunk(s) in {args.split}: {len(result.written)} file(s) written, "
+          f"{len(result.unchanged)} unchanged, {len(result.removed)} removed", file=sys.stderr)
+
+def run_context(model: LineModel, args) -> Tuple[Any, Any]:
+    """Minimal context of every adaptive chunk: (contexts, markdown or JSON-ready dict)"""
+    from sql_def_use import all_chunk_contexts, context_to_dict, format_chunk_contexts, procedure_lines
+    chunk_args = argparse.Namespace(**vars(args))
+    chunk_args.format = 'json'
+    chunks = run_chunks(model, chunk_args)[0]
+    contexts = all_chunk_contexts(chunks, args.max_assignments)
+    if args.format == 'json':
+        lines = procedure_lines(chunks)
+        found = []
+        for chunk, context in zip(chunks, contexts):
+            found.append(dict(context_to_dict(lines, context), start_line=chunk.start_line,
+                              end_line=chunk.end_line, content_hash=chunk.content_hash))
+            if chunk.original_start_line is not None:
+                found[-1].update(original_start_line=chunk.original_start_line,
+                                 original_end_line=chunk.original_end_line)
+        return contexts, {'chunks': found}
+    return contexts, format_chunk_contexts(chunks, contexts, os.path.basename(args.sql_file))
+
+def load_chunk_dicts(path: str, args) -> List[Dict[str, Any]]:
+    """Adaptive chunks of a SQL file, or of a saved adaptive JSON report, as dicts"""
+    if path.lower().endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)['chunks']
+    chunk_args = argparse.Namespace(**vars(args))
+    chunk_args.format = 'json'
+    return run_chunks(load_line_model(path), chunk_args)[1]['chunks']
+
+def _to_text(output: Any) -> str:
+    return output if isinstance(output, str) else json.dumps(output, indent=2)
+
+def _write(path: str, output: Any):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(_to_text(output))
+    print(f"Written {path}", file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description='Analyze SQL stored procedures: universal analysis, '
+                                                 'adaptive chunks and decision points')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    analysis = subparsers.add_parser('analysis', help='Universal business logic analysis')
+    _add_analysis_arguments(analysis)
+    analysis.add_argument('--format', choices=['markdown', 'json'], default='markdown', help='Output format')
+
+    chunks = subparsers.add_parser('chunks', help='Adaptive chunking guide')
+    _add_chunk_arguments(chunks)
+    chunks.add_argument('--format', choices=['markdown', 'json'], default='markdown', help='Output format')
+    chunks.add_argument('--split', metavar='DIR',
+                        help='Write one file per chunk and a manifest.json into DIR instead of one guide')
+
+    decisions = subparsers.add_parser('decisions', help='Decision points and branching complexity')
+    _add_decision_arguments(decisions)
+    decisions.add_argument('--format', choices=['text', 'json'], default='text', help='Output format')
+
+    everything = subparsers.add_parser('all', help='All three reports from one read of the file')
+    _add_analysis_arguments(everything)
+    _add_chunk_arguments(everything)
+    _add_decision_arguments(everything)
+    everything.add_argument('--format', choices=['markdown', 'json'], default='markdown',
+                            help='Output format (json: one object with analysis, chunks and decision_points)')
+
+    diff = subparsers.add_parser('diff', help='Added, removed, modified and moved chunks between two versions')
+    _add_chunk_arguments(diff)
+    diff.add_argument('--format', choices=['text', 'json'], default='text', help='Output format')
+    diff.add_argument('--code', action='store_true', help='Show a line diff of every changed chunk')
+    diff.add_argument('old_file', help='Old version: SQL file or adaptive JSON report')
+    diff.add_argument('new_file', help='New version: SQL file or adaptive JSON report')
+    diff.add_argument('--output', '-o', help='Output file')
+
+    bundle = subparsers.add_parser('bundle', help='Chunk guide packed into prompt-sized bundle files')
+    _add_chunk_arguments(bundle)
+    bundle.add_argument('--bundle-tokens', type=int, default=8000,
+                        help='Maximum estimated tokens per bundle (0: no token limit)')
+    bundle.add_argument('--bundle-chars', type=int, default=0,
+                        help='Maximum characters per bundle (0: no character limit)')
+
+    context = subparsers.add_parser('context', help='Every chunk with the definitions of the variables '
+                                                    'and tables it uses')
+    _add_chunk_arguments(context)
+    context.add_argument('--max-assignments', type=int, default=3,
+                         help='Latest assignments of a variable shown before a chunk')
+    context.add_argument('--format', choices=['markdown', 'json'], default='markdown', help='Output format')
+
+    for subparser in (analysis, chunks, decisions, everything, bundle, context):
+        subparser.add_argument('sql_file', help='Path to SQL file to analyze')
+        subparser.add_argument('--output', '-o',
+                               help="Output file ('all', 'bundle': directory for the files)")
+
+    args = parser.parse_args()
+
+    if args.command == 'diff':
+        from sql_chunk_diff import diff_chunks, diff_to_json, format_diff
+        try:
+            old_chunks = load_chunk_dicts(args.old_file, args)
+            new_chunks = load_chunk_dicts(args.new_file, args)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error reading chunks: {e}", file=sys.stderr)
+            sys.exit(1)
+        entries = diff_chunks(old_chunks, new_chunks)
+        if args.format == 'json':
+            output = diff_to_json(entries)
+        else:
+            output = format_diff(entries, args.code, args.old_file, args.new_file)
+        if args.output:
+            _write(args.output, output)
+        else:
+            print(_to_text(output))
+        return
+
+    try:
+        model = load_line_model(args.sql_file)
+    except OSError as e:
+        print(f"Error reading file: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        if args.command == 'analysis':
+            outputs = {ANALYSIS_SUFFIXES[args.format]: run_analysis(model, args)[1]}
+        elif args.command == 'chunks' and args.split:
+            run_split(model, args)
+            return
+        elif args.command == 'chunks':
+            outputs = {CHUNKS_SUFFIXES[args.format]: run_chunks(model, args)[1]}
+        elif args.command == 'decisions':
+            outputs = {DECISIONS_SUFFIXES[args.format]: run_decisions(model, args, args.sql_file)[1]}
+        elif args.command == 'context':
+            outputs = {'chunk_context': run_context(model, args)[1]}
+        elif args.command == 'bundle':
+            run_bundles(model, args)
+            return
+        else:
+            decision_args = argparse.Namespace(**vars(args))
+            if args.format != 'json':
+                decision_args.format = 'text'
+            outputs = {
+                ANALYSIS_SUFFIXES[args.format]: run_analysis(model, args)[1],
+                CHUNKS_SUFFIXES[args.format]: run_chunks(model, args)[1],
+                DECISIONS_SUFFIXES[decision_args.format]: run_decisions(model, decision_args, args.sql_file)[1],
+            }
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.command != 'all':
+        output, = outputs.values()
+        if args.output:
+            _write(args.output, output)
+        else:
+            print(_to_text(output))
+        return
+
+    if args.output:
+        # One file per report, named like the --watch artifacts
+        os.makedirs(args.output, exist_ok=True)
+        stem = os.path.splitext(os.path.basename(args.sql_file))[0]
+        for suffix, output in outputs.items():
+            _write(os.path.join(args.output, f"{stem}.{suffix}"), output)
+    elif args.format == 'json':
+        analysis_output, chunks_output, decisions_output = outputs.values()
+        print(json.dumps({'analysis': analysis_output, 'chunks': chunks_output,
+                          'decision_points': decisions_output}, indent=2))
+    else:
+        analysis_output, chunks_output, decisions_output = outputs.values()
+        print(analysis_output)
+        print('\n---\n')
+        print(chunks_output)
+        print('\n---\n')
+        print('# Decision Points\n')
+        print('```text')
+        print(decisions_output)
+        print('```')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+from sql_chunk_diff import _longest_increasing, diff_chunks, summarize
+
+
+def make_chunk(chunk_id, lines, chunk_type='sql_operation', tables=()):
+    return {'chunk_id': chunk_id, 'title': f'Chunk {chunk_id}', 'lines': lines,
+            'start_line': chunk_id * 10, 'end_line': chunk_id * 10 + len(lines) - 1,
+            'chunk_type': chunk_type, 'complexity_score': 1, 'tables_accessed': list(tables),
+            'dependencies': []}
+
+
+DECLARE = ['DECLARE @Total INT = 0;']
+SELECT = ['SELECT @Total = COUNT(*) FROM dbo.Orders;']
+UPDATE = ['UPDATE dbo.Customers', 'SET Visits = Visits + 1;']
+UPDATE_CHANGED = ['UPDATE dbo.Customers', 'SET Visits = Visits + 2, Seen = 1;']
+LOG = ['INSERT INTO dbo.AuditLog (Message) VALUES (@Message);']
+DELETE = ['DELETE FROM dbo.Carts WHERE Expired = 1;']
+RETURN = ['RETURN @Total;']
+NOTIFY = ['EXEC dbo.usp_Notify @Total;']
+
+
+def test_longest_increasing():
+    assert _longest_increasing([]) == []
+    assert _longest_increasing([0, 3, 2, 5]) == [0, 2, 3]
+    assert _longest_increasing([4, 3, 2, 1]) == [3]
+
+
+def test_identical_versions_are_unchanged():
+    chunks = [make_chunk(1, DECLARE, 'declaration'), make_chunk(2, SELECT)]
+    entries = diff_chunks(chunks, [dict(chunk) for chunk in chunks])
+    assert [entry.status for entry in entries] == ['unchanged', 'unchanged']
+    assert all(not entry.changes for entry in entries)
+
+
+def test_moved_added_removed_and_modified_chunks():
+    old = [make_chunk(1, DECLARE, 'declaration'), make_chunk(2, SELECT),
+           make_chunk(3, UPDATE, tables=['Customers']), make_chunk(4, LOG),
+           make_chunk(5, DELETE), make_chunk(6, RETURN, 'control_flow')]
+    new = [make_chunk(1, DECLARE, 'declaration'), make_chunk(2, UPDATE_CHANGED, tables=['Customers', 'Seen']),
+           make_chunk(3, DELETE), make_chunk(4, SELECT), make_chunk(5, NOTIFY),
+           make_chunk(6, RETURN, 'control_flow')]
+
+    entries = diff_chunks(old, new)
+
+    described = [(entry.status, entry.old and entry.old['chunk_id'], entry.new and entry.new['chunk_id'])
+                 for entry in entries]
+    assert described == [('unchanged', 1, 1), ('modified', 3, 2), ('removed', 4, None),
+                         ('unchanged', 5, 3), ('moved', 2, 4), ('added', None, 5), ('unchanged', 6, 6)]
+    assert summarize(entries) == {'unchanged': 3, 'moved': 1, 'modified': 1, 'added': 1, 'removed': 1}
+    assert entries[1].changes['tables_accessed'] == {'added': ['Seen'], 'removed': []}
+    # Unchanged chunks that shifted report their old and new lines
+    assert entries[3].changes['lines'] == {'old': [50, 50], 'new': [30, 30]}
+
+
+def test_copies_pair_in_order_and_whitespace_is_ignored():
+    old = [make_chunk(1, SELECT), make_chunk(2, SELECT)]
+    new = [make_chunk(1, ['SELECT  @Total = COUNT(*)   FROM dbo.Orders;']), make_chunk(2, SELECT),
+           make_chunk(3, SELECT)]
+    entries = diff_chunks(old, new)
+    assert [entry.status for entry in entries] == ['unchanged', 'unchanged', 'added']
+    assert entries[0].old['chunk_id'] == 1 and entries[1].old['chunk_id'] == 2
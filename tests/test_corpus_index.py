@@ -0,0 +1,62 @@
+import pytest
+
+from sql_corpus_index import CorpusIndex, extract_file_index
+
+PROCEDURES = """
+CREATE PROCEDURE dbo.usp_Ping @Depth INT
+AS
+BEGIN
+    IF @Depth > 0
+        EXEC dbo.usp_Pong @Depth;
+END
+GO
+
+CREATE PROCEDURE dbo.usp_Pong @Depth INT
+AS
+BEGIN
+    DECLARE @Next INT = @Depth - 1;
+    EXEC dbo.usp_Ping @Next;
+END
+GO
+
+CREATE PROCEDURE dbo.usp_Countdown @Depth INT
+AS
+BEGIN
+    IF @Depth > 0
+    BEGIN
+        SET @Depth = @Depth - 1;
+        EXEC dbo.usp_Countdown @Depth;
+    END
+END
+GO
+
+CREATE PROCEDURE dbo.usp_Start
+AS
+BEGIN
+    DECLARE @Status INT;
+    EXEC @Status = dbo.usp_Ping 3;
+    EXEC usp_Countdown 5;
+END
+"""
+
+
+@pytest.fixture
+def index(tmp_path):
+    root = tmp_path / 'sql'
+    root.mkdir()
+    (root / 'procedures.sql').write_text(PROCEDURES, encoding='utf-8')
+    corpus = CorpusIndex(str(tmp_path / 'index.db'))
+    corpus.update(str(root), workers=1)
+    yield corpus
+    corpus.close()
+
+
+def test_cycles_finds_mutual_recursion_and_self_calls(index):
+    assert index.cycles() == [['DBO.USP_COUNTDOWN'], ['DBO.USP_PING', 'DBO.USP_PONG']]
+
+
+def test_calls_include_exec_with_return_status():
+    calls = {(call.caller, call.callee) for call in extract_file_index(PROCEDURES).calls}
+    assert calls == {('DBO.USP_PING', 'DBO.USP_PONG'), ('DBO.USP_PONG', 'DBO.USP_PING'),
+                     ('DBO.USP_COUNTDOWN', 'DBO.USP_COUNTDOWN'), ('DBO.USP_START', 'DBO.USP_PING'),
+                     ('DBO.USP_START', 'DBO.USP_COUNTDOWN')}
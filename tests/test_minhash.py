@@ -0,0 +1,63 @@
+from sql_minhash import (NUM_PERM, band_layout, cluster, code_signature, from_bytes, merge,
+                         similarity, to_bytes)
+
+ORDER_TOTALS = """
+CREATE PROCEDURE dbo.usp_OrderTotals @CustomerId INT
+AS
+BEGIN
+    DECLARE @Total DECIMAL(18, 2) = 0;
+    SELECT @Total = SUM(Quantity * UnitPrice) FROM dbo.OrderLines WHERE CustomerId = @CustomerId;
+    IF @Total > 1000
+        UPDATE dbo.Customers SET Tier = 'Gold' WHERE CustomerId = @CustomerId;
+    ELSE
+        UPDATE dbo.Customers SET Tier = 'Standard' WHERE CustomerId = @CustomerId;
+    INSERT INTO dbo.AuditLog (CustomerId, Total, LoggedAt) VALUES (@CustomerId, @Total, GETDATE());
+    RETURN @Total;
+END
+"""
+
+# The same procedure with one threshold changed
+ORDER_TOTALS_VARIANT = ORDER_TOTALS.replace('1000', '2500')
+
+INVENTORY = """
+CREATE PROCEDURE dbo.usp_Restock @WarehouseId INT
+AS
+BEGIN
+    DECLARE @Missing TABLE (ProductId INT, Needed INT);
+    INSERT INTO @Missing SELECT ProductId, MinimumStock - OnHand FROM dbo.Stock
+        WHERE WarehouseId = @WarehouseId AND OnHand < MinimumStock;
+    WHILE EXISTS (SELECT 1 FROM @Missing)
+    BEGIN
+        EXEC dbo.usp_OrderFromSupplier @WarehouseId;
+        DELETE TOP (1) FROM @Missing;
+    END
+END
+"""
+
+
+def test_band_layout_stays_at_or_below_threshold():
+    for threshold in (0.5, 0.7, 0.8, 0.9):
+        bands, rows = band_layout(threshold)
+        assert bands * rows == NUM_PERM
+        assert (1 / bands) ** (1 / rows) <= threshold
+
+
+def test_signatures_estimate_similarity():
+    original, variant, other = (code_signature(code) for code in (ORDER_TOTALS, ORDER_TOTALS_VARIANT, INVENTORY))
+    assert similarity(original, code_signature(ORDER_TOTALS)) == 1.0
+    assert similarity(original, variant) >= 0.8
+    assert similarity(original, other) < 0.3
+    assert from_bytes(to_bytes(original)) == original
+    # Merging a signature with itself changes nothing
+    assert merge([original, original]) == original
+
+
+def test_cluster_groups_near_duplicates_only():
+    signatures = {'totals': code_signature(ORDER_TOTALS),
+                  'totals_variant': code_signature(ORDER_TOTALS_VARIANT),
+                  'totals_copy': code_signature(ORDER_TOTALS),
+                  'restock': code_signature(INVENTORY)}
+    families = cluster(signatures, threshold=0.8)
+    assert [sorted(family) for family in families] == [['totals', 'totals_copy', 'totals_variant']]
+    # Above the pair's similarity only the exact copies stay together
+    assert [sorted(family) for family in cluster(signatures, threshold=1.0)] == [['totals', 'totals_copy']]